@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+智能任务Agent离线基准测试
+
+使用确定性的替身模型和本地替身MCP服务端到端运行root_agent，不需要API密钥和网络。
+统计不同计划规模和并发会话数下的吞吐量、延迟分位数、内存和模型/工具调用次数，
+并可与基线结果比较以发现性能回退。
+
+用法:
+    python deployment/benchmark.py --steps 1,10,100 --sessions 1,10,100
+    python deployment/benchmark.py --output results.json
+    python deployment/benchmark.py --baseline results.json --tolerance 0.2
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import re
+import resource
+import sys
+import time
+from typing import Any, AsyncGenerator, Dict, List
+
+# 添加路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 计划的依赖形状：chain 顺序依赖，parallel 全部独立，layered 每层依赖上一层
+DAG_SHAPES = ("chain", "parallel", "layered")
+LAYER_WIDTH = 8
+
+# 替身MCP服务提供的工具，名称与真实服务一致
+STAND_IN_TOOLS: Dict[str, List[str]] = {
+    "brave-search": ["brave_web_search", "brave_local_search"],
+    "fetch": ["fetch"],
+    "filesystem": ["read_file", "write_file", "list_directory"],
+    "time": ["get_current_time", "convert_time"],
+    "office-word": ["create_document"],
+    "office-excel": ["create_workbook"],
+    "sequential-thinking": ["sequentialthinking"],
+}
+
+STEPS_PATTERN = re.compile(r"步骤数(\d+)")
+TASK_ID_PATTERN = re.compile(r"任务 (\d+):")
+
+
+def parse_int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="智能任务Agent离线基准测试")
+    parser.add_argument("--steps", type=parse_int_list, default=[1, 10, 100], help="计划步骤数列表，例如 1,10,100,500")
+    parser.add_argument("--sessions", type=parse_int_list, default=[1, 10, 100], help="并发会话数列表，例如 1,10,100,1000")
+    parser.add_argument("--dag", choices=DAG_SHAPES, default="layered", help="计划的依赖形状")
+    parser.add_argument("--model-latency", type=float, default=0.05, help="替身模型每次调用的延迟（秒）")
+    parser.add_argument("--tool-latency", type=float, default=0.05, help="替身MCP工具每次调用的延迟（秒）")
+    parser.add_argument("--task-concurrency", type=int, default=None, help="每个会话同时执行的任务数上限")
+    parser.add_argument("--light-steps", action="store_true", help="计划由可合并执行的轻量步骤组成")
+    parser.add_argument("--with-cache", action="store_true", help="保留拆解、问答和工具调用缓存（默认关闭以测量完整路径）")
+    parser.add_argument("--verbose", action="store_true", help="显示agent运行时的输出")
+    parser.add_argument("--output", help="将结果写入JSON文件")
+    parser.add_argument("--baseline", help="与基线JSON结果比较，出现回退时以非零状态退出")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的相对回退幅度")
+    return parser.parse_args(argv)
+
+
+def build_plan_text(steps: int, shape: str, light: bool = False) -> str:
+    """生成符合拆解输出格式的计划文本"""
+    lines = ["## 任务分析", "基准测试计划", "", "## 执行步骤"]
+    for i in range(1, steps + 1):
+        if shape == "chain":
+            depends_on = [i - 1] if i > 1 else []
+        elif shape == "parallel":
+            depends_on = []
+        else:
+            layer_start = (i - 1) // LAYER_WIDTH * LAYER_WIDTH + 1
+            depends_on = list(range(max(1, layer_start - LAYER_WIDTH), layer_start))
+        deps = ", ".join(map(str, depends_on)) or "无"
+        action = f"记录第{i}部分的编号" if light else f"搜索并整理第{i}部分的资料"
+        lines.append(f"{i}. **步骤{i}**: {action}（依赖: {deps}）")
+    lines += ["", "## 预期结果", "完成基准测试计划"]
+    return "\n".join(lines)
+
+
+def run_benchmark(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    # 任务并发数在导入时读取，需在导入agent之前设置
+    if args.task_concurrency is not None:
+        os.environ["TASK_MAX_CONCURRENCY"] = str(args.task_concurrency)
+
+    from intelligent_task.shared_libraries.warning_config import setup_clean_environment
+    setup_clean_environment()
+
+    from google.adk.models.base_llm import BaseLlm
+    from google.adk.models.llm_response import LlmResponse
+    from google.adk.runners import Runner
+    from google.adk.sessions import InMemorySessionService
+    from google.adk.tools.base_tool import BaseTool
+    from google.adk.tools.base_toolset import BaseToolset
+    from google.genai import types
+
+    from intelligent_task.agent import root_agent
+    from intelligent_task.shared_libraries.mcp_pool import mcp_pool
+    from intelligent_task.shared_libraries.prompt_cache import create_agent_app, prompt_token_stats
+    from intelligent_task.shared_libraries.response_cache import answer_cache, decomposition_cache
+    from intelligent_task.shared_libraries.tool_cache import tool_cache
+    from intelligent_task.sub_agents.task_decomposer.agent import task_decomposer_agent
+    from intelligent_task.sub_agents.task_executor.agent import task_executor_agent
+    from intelligent_task.sub_agents.task_monitor.agent import task_monitor_agent
+
+    counters = {"model_calls": 0, "tool_calls": 0, "mcp_calls": 0}
+    tool_latency, dag_shape, light_steps = args.tool_latency, args.dag, args.light_steps
+
+    class StandInTool(BaseTool):
+        """按固定延迟返回的替身MCP工具"""
+
+        def _get_declaration(self) -> types.FunctionDeclaration:
+            return types.FunctionDeclaration(
+                name=self.name,
+                description=self.description,
+                parameters=types.Schema(
+                    type=types.Type.OBJECT,
+                    properties={"query": types.Schema(type=types.Type.STRING)},
+                ),
+            )
+
+        async def run_async(self, *, args, tool_context) -> Any:
+            counters["mcp_calls"] += 1
+            await asyncio.sleep(tool_latency)
+            return {"content": [{"type": "text", "text": f"{self.name}结果: {args.get('query', '')}"}]}
+
+    class StandInToolset(BaseToolset):
+        def __init__(self, tool_names: List[str]):
+            super().__init__()
+            self.tools = [StandInTool(name=name, description=f"替身工具 {name}") for name in tool_names]
+
+        async def get_tools(self, readonly_context=None) -> List[BaseTool]:
+            return self.tools
+
+        async def close(self) -> None:
+            return None
+
+    class ScriptedLlm(BaseLlm):
+        """按agent角色返回固定响应的替身模型"""
+
+        role: str
+        latency: float = 0.0
+
+        def _respond(self, llm_request) -> List[types.Part]:
+            last = llm_request.contents[-1] if llm_request.contents else None
+            # 动态指令可能附加在工具结果之后，因此检查整个请求中的工具结果
+            responded = {
+                part.function_response.name
+                for content in llm_request.contents
+                for part in (content.parts or [])
+                if part.function_response
+            }
+
+            def call(name: str, call_args: Dict[str, Any]) -> List[types.Part]:
+                return [types.Part(function_call=types.FunctionCall(name=name, args=call_args))]
+
+            if self.role == "coordinator":
+                if task_monitor_agent.name in responded:
+                    return [types.Part(text="所有任务已执行完成。")]
+                if task_decomposer_agent.name in responded:
+                    return call(task_monitor_agent.name, {"request": "开始执行任务"})
+                text = "".join(part.text or "" for part in (last.parts or []))
+                return call(task_decomposer_agent.name, {"request": text})
+            if self.role == "decomposer":
+                text = "".join(
+                    part.text or ""
+                    for content in llm_request.contents if content.role == "user"
+                    for part in (content.parts or [])
+                )
+                match = STEPS_PATTERN.search(text)
+                steps = int(match.group(1)) if match else 1
+                return [types.Part(text=build_plan_text(steps, dag_shape, light_steps))]
+            # executor：先搜索一次，再为本次执行的每个任务上报结果
+            if "brave_web_search" in responded:
+                request = "".join(
+                    part.text or ""
+                    for content in llm_request.contents if content.role == "user"
+                    for part in (content.parts or [])
+                )
+                return [
+                    part
+                    for task_id in dict.fromkeys(TASK_ID_PATTERN.findall(request))
+                    for part in call("report_task_result", {
+                        "task_id": int(task_id), "status": "completed", "summary": "已完成", "failure_reason": "",
+                    })
+                ]
+            return call("brave_web_search", {"query": "基准测试"})
+
+        async def generate_content_async(self, llm_request, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+            counters["model_calls"] += 1
+            await asyncio.sleep(self.latency)
+            parts = self._respond(llm_request)
+            counters["tool_calls"] += sum(1 for part in parts if part.function_call)
+            # 按字符数粗略估算token数，使token统计和追踪与真实模型一致
+            system_instruction = llm_request.config.system_instruction if llm_request.config else None
+            prompt_tokens = (len(str(system_instruction or "")) + sum(
+                len(part.text or "") for content in llm_request.contents for part in (content.parts or [])
+            )) // 2
+            completion_tokens = sum(len(part.text or "") for part in parts) // 2 + 1
+            yield LlmResponse(
+                content=types.Content(role="model", parts=parts),
+                usage_metadata=types.GenerateContentResponseUsageMetadata(
+                    prompt_token_count=prompt_tokens,
+                    candidates_token_count=completion_tokens,
+                    total_token_count=prompt_tokens + completion_tokens,
+                ),
+            )
+
+    for agent, role in (
+        (root_agent, "coordinator"),
+        (task_decomposer_agent, "decomposer"),
+        (task_executor_agent, "executor"),
+    ):
+        agent.model = ScriptedLlm(model=f"scripted-{role}", role=role, latency=args.model_latency)
+    for server_name, tool_names in STAND_IN_TOOLS.items():
+        mcp_pool.set_toolset(server_name, StandInToolset(tool_names))
+
+    if not args.with_cache:
+        for cache in (decomposition_cache, answer_cache, tool_cache):
+            cache.max_entries = 0
+
+    async def run_session(runner, index: int, steps: int) -> float:
+        session = await runner.session_service.create_session(app_name="benchmark", user_id=f"user-{index}")
+        message = types.Content(
+            role="user",
+            parts=[types.Part(text=f"请帮我开发一个完整的电商网站系统，会话{index}，步骤数{steps}")],
+        )
+        start = time.perf_counter()
+        async for _ in runner.run_async(user_id=session.user_id, session_id=session.id, new_message=message):
+            pass
+        return time.perf_counter() - start
+
+    async def run_scenario(steps: int, sessions: int) -> Dict[str, Any]:
+        runner = Runner(app=create_agent_app("benchmark", root_agent), session_service=InMemorySessionService())
+        for key in counters:
+            counters[key] = 0
+        start = time.perf_counter()
+        latencies = sorted(await asyncio.gather(*(run_session(runner, i, steps) for i in range(sessions))))
+        elapsed = time.perf_counter() - start
+
+        def percentile(p: float) -> float:
+            return latencies[min(len(latencies) - 1, int(round(p * (len(latencies) - 1))))]
+
+        return {
+            "steps": steps,
+            "sessions": sessions,
+            "elapsed_s": elapsed,
+            "sessions_per_s": sessions / elapsed,
+            "steps_per_s": sessions * steps / elapsed,
+            "p50_s": percentile(0.5),
+            "p99_s": percentile(0.99),
+            "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            **counters,
+        }
+
+    results = []
+    for steps in args.steps:
+        for sessions in args.sessions:
+            agent_output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+            with agent_output:
+                result = asyncio.run(run_scenario(steps, sessions))
+            results.append(result)
+            print(
+                f"步骤数 {steps:>4} | 会话数 {sessions:>5} | "
+                f"吞吐 {result['sessions_per_s']:8.2f} 会话/s {result['steps_per_s']:9.1f} 步骤/s | "
+                f"p50 {result['p50_s']:.3f}s p99 {result['p99_s']:.3f}s | "
+                f"内存峰值 {result['max_rss_mb']:.0f}MB | "
+                f"模型调用 {result['model_calls']} 工具调用 {result['tool_calls']} MCP调用 {result['mcp_calls']}"
+            )
+    print("\n提示词token统计（估算的静态指令/动态内容与替身模型报告的用量）:")
+    print(prompt_token_stats.format_report())
+    return results
+
+
+def compare_with_baseline(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], tolerance: float) -> List[str]:
+    """
+    与基线结果比较
+
+    Returns:
+        回退说明列表，为空表示没有回退
+    """
+    baseline_by_scenario = {(item["steps"], item["sessions"]): item for item in baseline}
+    regressions = []
+    for result in results:
+        base = baseline_by_scenario.get((result["steps"], result["sessions"]))
+        if base is None:
+            continue
+        scenario = f"步骤数{result['steps']}/会话数{result['sessions']}"
+        for key in ("p50_s", "p99_s"):
+            if result[key] > base[key] * (1 + tolerance):
+                regressions.append(f"{scenario} {key}: {base[key]:.3f} -> {result[key]:.3f}")
+        if result["sessions_per_s"] < base["sessions_per_s"] * (1 - tolerance):
+            regressions.append(f"{scenario} sessions_per_s: {base['sessions_per_s']:.2f} -> {result['sessions_per_s']:.2f}")
+        for key in ("model_calls", "tool_calls", "mcp_calls"):
+            if result[key] > base[key]:
+                regressions.append(f"{scenario} {key}: {base[key]} -> {result[key]}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    from intelligent_task.shared_libraries.tracing import setup_tracing
+
+    setup_tracing()
+    print("=== 智能任务Agent离线基准测试 ===")
+    print(f"依赖形状: {args.dag} | 模型延迟: {args.model_latency}s | 工具延迟: {args.tool_latency}s")
+    results = run_benchmark(args)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare_with_baseline(results, json.load(f), args.tolerance)
+        if regressions:
+            print("❌ 发现性能回退:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print("✅ 与基线相比没有性能回退")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
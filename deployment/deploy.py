@@ -4,6 +4,7 @@
 """
 
 import os
+import subprocess
 import sys
 
 # 添加路径
@@ -65,6 +66,35 @@ def test_agent_structure():
         print(f"❌ 导入失败: {e}")
 
 
+# 导入root_agent的启动时间预算（秒），可通过环境变量 STARTUP_BUDGET_SECONDS 配置
+# MCP客户端等重依赖均为延迟导入，导入root_agent的耗时主要是google.adk和google.genai本身
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "1.0"))
+
+
+def test_startup_time():
+    """测试在全新进程中导入root_agent的耗时是否在预算内"""
+    print("\n=== 测试启动耗时 ===")
+    
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = (
+        "import time; start = time.perf_counter(); "
+        "from intelligent_task.agent import root_agent; "
+        "import sys; "
+        "print(time.perf_counter() - start, 'mcp' in sys.modules)"
+    )
+    output = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", code],
+        cwd=project_root, capture_output=True, text=True, check=True,
+    ).stdout.split()
+    elapsed, mcp_loaded = float(output[-2]), output[-1] == "True"
+    
+    status_icon = "✅" if elapsed <= STARTUP_BUDGET_SECONDS else "❌"
+    print(f"{status_icon} 导入root_agent耗时: {elapsed:.2f}s (预算 {STARTUP_BUDGET_SECONDS:.2f}s)")
+    if mcp_loaded:
+        print("❌ 导入时加载了MCP客户端，工具集应延迟初始化")
+    return elapsed <= STARTUP_BUDGET_SECONDS and not mcp_loaded
+
+
 if __name__ == "__main__":
     print("开始部署智能任务Agent...")
     
@@ -74,6 +104,9 @@ if __name__ == "__main__":
     # 测试结构
     test_agent_structure()
     
+    # 测试启动耗时
+    test_startup_time()
+    
     print(f"\n✅ 部署完成! 根Agent '{agent.name}' 已就绪")
     print("\n🎯 架构特点:")
     print("1. ✅ 标准ADK多agent架构")
@@ -6,30 +6,188 @@
 from .shared_libraries.warning_config import configure_warnings
 configure_warnings()
 
+import os
+from typing import Optional
+
 from google.adk.agents import LlmAgent
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import llm_request as llm_request_module
+from google.adk.models import llm_response as llm_response_module
 from google.adk.tools.agent_tool import AgentTool
+from google.genai import types
 
 from . import prompt
+from .shared_libraries.complexity_analyzer import ComplexityAnalyzer
+from .shared_libraries.model_router import MODEL_TIERS, TieredLlm, apply_budget, model_for, record_model_usage
+from .shared_libraries.prompt_cache import account_prompt_tokens, account_usage_tokens
+from .shared_libraries.response_cache import answer_cache
+from .shared_libraries.task_store import TaskStore
+from .shared_libraries.tracing import (
+    trace_agent_end,
+    trace_agent_start,
+    trace_model_end,
+    trace_model_error,
+    trace_model_start,
+    trace_tool_end,
+    trace_tool_error,
+    trace_tool_start,
+)
 from .sub_agents.task_decomposer.agent import task_decomposer_agent
 from .sub_agents.task_monitor.agent import task_monitor_agent
 
-MODEL = "gemini-2.0-flash"
+MODEL = model_for("coordinator")
+
+# 高置信度简单任务使用的低成本模型
+FAST_MODEL = os.getenv("FAST_ANSWER_MODEL", MODEL_TIERS["fast"])
+
+# 本地快速分发所需的最低置信度，低于该值时交由LLM判断
+FAST_ROUTE_CONFIDENCE = float(os.getenv("FAST_ROUTE_CONFIDENCE", "0.8"))
+
+# 回答中出现这些说法时视为在向用户提问或要求补充信息，不写入简单问答缓存
+CLARIFYING_PHRASES = ["请问", "您是指", "你是指", "请提供", "请告诉我", "能否告诉", "可以告诉我", "需要您", "需要你"]
+
+# 任务监控/执行请求的标识，这类请求始终交由LLM判断
+MONITOR_KEYWORDS = ["执行", "进度", "开始任务", "运行", "继续"]
+
+
+def _get_new_user_input(llm_request: llm_request_module.LlmRequest) -> str:
+    """获取请求末尾的用户新输入，最后一条不是用户文本消息时返回空字符串"""
+    if not llm_request.contents:
+        return ""
+    last_content = llm_request.contents[-1]
+    if last_content.role != "user" or not last_content.parts:
+        return ""
+    return "".join(part.text for part in last_content.parts if part.text)
+
+
+def serve_cached_answer(
+    callback_context: CallbackContext,
+    llm_request: llm_request_module.LlmRequest,
+) -> Optional[llm_response_module.LlmResponse]:
+    """
+    会话的第一个问题与缓存的简单问答相同时直接返回缓存的回答
+
+    只处理会话中的第一条消息，后续消息的含义可能依赖上下文，不适合复用回答
+    """
+    callback_context.state["temp:answer_cache_input"] = None
+    if len(llm_request.contents) != 1:
+        return None
+    user_input = _get_new_user_input(llm_request)
+    if not user_input:
+        return None
+    
+    cached_answer = answer_cache.get(user_input)
+    if cached_answer is None:
+        # 记录输入，回答生成后由cache_simple_answer写入缓存
+        callback_context.state["temp:answer_cache_input"] = user_input
+        return None
+    
+    callback_context.state["routing_decision"] = "cached_answer"
+    return llm_response_module.LlmResponse(
+        content=types.Content(role="model", parts=[types.Part(text=cached_answer)])
+    )
+
+
+def _asks_user(answer: str) -> bool:
+    """回答是否在向用户提问，例如请用户澄清需求或补充信息"""
+    if any(phrase in answer for phrase in CLARIFYING_PHRASES):
+        return True
+    return any(line.rstrip().endswith(("?", "？")) for line in answer.splitlines())
+
+
+def cache_simple_answer(
+    callback_context: CallbackContext,
+    llm_response: llm_response_module.LlmResponse,
+) -> Optional[llm_response_module.LlmResponse]:
+    """
+    经本地快速分发判定为简单问题、由低成本模型直接回答的结果写入简单问答缓存
+
+    回答向用户提问时不缓存，这类回答依赖当时的对话，不能直接用来回答其他用户
+    """
+    user_input = callback_context.state.get("temp:answer_cache_input")
+    if not user_input or not llm_response.content or not llm_response.content.parts:
+        return None
+    if callback_context.state.get("routing_decision") != "fast_simple":
+        return None
+    if any(part.function_call for part in llm_response.content.parts):
+        return None
+    
+    answer = "".join(part.text for part in llm_response.content.parts if part.text)
+    if answer and not llm_response.partial and not _asks_user(answer):
+        answer_cache.put(user_input, answer)
+    return None
+
+
+def route_by_complexity(
+    callback_context: CallbackContext,
+    llm_request: llm_request_module.LlmRequest,
+) -> Optional[llm_response_module.LlmResponse]:
+    """
+    在调用协调器LLM之前使用复杂度分析器进行本地快速分发
+
+    - 高置信度简单任务：改用低成本模型直接回答，不再携带子agent工具
+    - 高置信度复杂任务：直接生成调用task_decomposer_agent的函数调用，跳过一次LLM判断
+    - 其他情况：保持原请求，由协调器LLM判断
+    """
+    # 只处理用户新输入的消息，工具调用返回后的总结仍由LLM完成
+    user_input = _get_new_user_input(llm_request)
+    if not user_input or any(keyword in user_input for keyword in MONITOR_KEYWORDS):
+        return None
+    
+    complexity, confidence = ComplexityAnalyzer.analyze_with_confidence(user_input)
+    if confidence < FAST_ROUTE_CONFIDENCE:
+        return None
+    
+    if complexity == "simple":
+        llm_request.model = FAST_MODEL
+        llm_request.tools_dict = {}
+        if llm_request.config:
+            llm_request.config.tools = None
+        callback_context.state["routing_decision"] = "fast_simple"
+        return None
+    
+    # 已有任务列表时用户可能在调整拆解结果，交由LLM结合上下文处理
+    if TaskStore.exists(callback_context.state):
+        return None
+    
+    callback_context.state["routing_decision"] = "fast_complex"
+    return llm_response_module.LlmResponse(
+        content=types.Content(
+            role="model",
+            parts=[
+                types.Part(
+                    function_call=types.FunctionCall(
+                        name=task_decomposer_agent.name,
+                        args={"request": user_input},
+                    )
+                )
+            ],
+        )
+    )
 
 # 主Agent - 使用AgentTool模式调用子agent
 intelligent_task_coordinator = LlmAgent(
     name="intelligent_task_coordinator",
-    model=MODEL,
+    model=TieredLlm(model=MODEL),
     description=(
         "智能任务处理协调器，负责判断任务复杂度并分发给合适的处理器。"
         "对于简单任务直接回答，对于复杂任务调用任务拆解子agent进行处理，"
         "对于任务监控调用监控agent自动执行任务。"
     ),
-    instruction=prompt.MAIN_AGENT_PROMPT,
+    static_instruction=prompt.MAIN_AGENT_PROMPT,
     output_key="task_analysis_result",
     tools=[
         AgentTool(agent=task_decomposer_agent),
         AgentTool(agent=task_monitor_agent),
     ],
+    before_agent_callback=trace_agent_start,
+    after_agent_callback=trace_agent_end,
+    before_model_callback=[serve_cached_answer, route_by_complexity, apply_budget, account_prompt_tokens, trace_model_start],
+    after_model_callback=[trace_model_end, account_usage_tokens, record_model_usage, cache_simple_answer],
+    on_model_error_callback=trace_model_error,
+    before_tool_callback=trace_tool_start,
+    after_tool_callback=trace_tool_end,
+    on_tool_error_callback=trace_tool_error,
 )
 
 # 设置为根agent
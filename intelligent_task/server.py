@@ -0,0 +1,285 @@
+"""
+智能任务Agent服务 - 在一个事件循环中并发托管多个会话，支持准入控制、排队背压和优雅停机
+
+用法:
+    python -m intelligent_task.server --host 0.0.0.0 --port 8080
+"""
+
+import argparse
+import asyncio
+import os
+import weakref
+from typing import Any, Dict, Optional
+
+from google.adk.agents import BaseAgent
+from google.genai import types
+
+from .shared_libraries.bounded_llm import BoundedLlm, model_limiter
+from .shared_libraries.mcp_pool import mcp_pool
+from .shared_libraries.prompt_cache import create_agent_app
+from .shared_libraries.tool_fanout import tool_fanout
+from .shared_libraries.tracing import setup_tracing
+
+# 同时运行的会话请求数上限和排队等待的请求数上限
+DEFAULT_MAX_ACTIVE = int(os.getenv("SERVER_MAX_ACTIVE", "64"))
+DEFAULT_MAX_QUEUE = int(os.getenv("SERVER_MAX_QUEUE", "256"))
+
+# 停机时等待进行中请求完成的最长时间（秒）
+DEFAULT_DRAIN_TIMEOUT = float(os.getenv("SERVER_DRAIN_TIMEOUT", "30"))
+
+APP_NAME = "intelligent_task"
+
+
+class ServerBusyError(RuntimeError):
+    """排队请求数已达上限"""
+
+
+class ServerDrainingError(RuntimeError):
+    """服务正在停机，不再接收新请求"""
+
+
+def _collect_agents(agent: BaseAgent, found: Dict[str, BaseAgent]) -> None:
+    """收集agent树中的所有agent，包括通过AgentTool调用的子agent"""
+    if agent.name in found:
+        return
+    found[agent.name] = agent
+    for sub_agent in agent.sub_agents:
+        _collect_agents(sub_agent, found)
+    for tool in getattr(agent, "tools", None) or []:
+        if hasattr(tool, "agent"):
+            _collect_agents(tool.agent, found)
+
+
+def install_model_limits(root: BaseAgent) -> None:
+    """为agent树中所有LLM agent的模型加上全局并发限制"""
+    from .sub_agents.task_executor.agent import task_executor_agent
+
+    agents: Dict[str, BaseAgent] = {}
+    _collect_agents(root, agents)
+    # 执行器由监控agent通过独立Runner调用，不在agent树中
+    _collect_agents(task_executor_agent, agents)
+    for agent in agents.values():
+        if getattr(agent, "model", None):
+            agent.model = BoundedLlm.wrap(agent.model)
+
+
+class AgentServer:
+    """
+    多会话并发服务
+
+    所有会话共享一个事件循环、一个会话服务和进程级的MCP服务池。同时运行的
+    请求数和排队请求数都有上限，队列已满时立即拒绝新请求以形成背压；同一会话
+    的请求按到达顺序依次执行。模型调用和工具调用分别受全局的按模型、按服务
+    并发上限约束。
+    """
+
+    def __init__(
+        self,
+        agent: Optional[BaseAgent] = None,
+        session_service=None,
+        max_active: int = DEFAULT_MAX_ACTIVE,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        model_concurrency: Optional[Dict[str, int]] = None,
+        tool_concurrency: Optional[Dict[str, int]] = None,
+    ):
+        if agent is None:
+            from .agent import root_agent
+            agent = root_agent
+        if session_service is None:
+            from google.adk.sessions import InMemorySessionService
+            session_service = InMemorySessionService()
+        from google.adk.runners import Runner
+
+        self.agent = agent
+        self.runner = Runner(app=create_agent_app(APP_NAME, agent), session_service=session_service)
+        self.max_active = max(1, max_active)
+        self.max_queue = max(0, max_queue)
+        model_limiter.concurrency_limits.update(model_concurrency or {})
+        tool_fanout.concurrency_limits.update(tool_concurrency or {})
+
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._session_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        self._idle: Optional[asyncio.Event] = None
+        self._draining = False
+        self.active = 0
+        self.waiting = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    async def start(self) -> None:
+        """在当前事件循环中启动服务"""
+        self._slots = asyncio.Semaphore(self.max_active)
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._draining = False
+        install_model_limits(self.agent)
+        mcp_pool.start_health_check()
+        print(f"智能任务服务已启动，并发上限 {self.max_active}，排队上限 {self.max_queue}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "draining": self._draining,
+        }
+
+    async def run(self, user_id: str, message: str, session_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        处理一条用户消息
+
+        Args:
+            user_id: 用户ID
+            message: 用户消息
+            session_id: 会话ID，为空时创建新会话
+
+        Returns:
+            {"session_id": 会话ID, "response": 最终回复文本}
+
+        Raises:
+            ServerDrainingError: 服务正在停机
+            ServerBusyError: 排队请求数已达上限
+        """
+        if self._slots is None:
+            raise RuntimeError("服务尚未启动，请先调用start()")
+        if self._draining:
+            raise ServerDrainingError("服务正在停机")
+        if self.active + self.waiting >= self.max_active + self.max_queue:
+            self.rejected += 1
+            raise ServerBusyError(f"排队请求数已达上限({self.max_queue})")
+
+        # 在第一个await之前登记为排队中，并发到达的请求不会同时通过上面的容量检查
+        self.waiting += 1
+        self._idle.clear()
+        admitted = False
+        try:
+            session_service = self.runner.session_service
+            session = None
+            if session_id is not None:
+                session = await session_service.get_session(app_name=APP_NAME, user_id=user_id, session_id=session_id)
+            if session is None:
+                session = await session_service.create_session(app_name=APP_NAME, user_id=user_id, session_id=session_id)
+
+            session_lock = self._session_locks.get(session.id)
+            if session_lock is None:
+                session_lock = self._session_locks[session.id] = asyncio.Lock()
+
+            # 同一会话的请求依次执行，等待会话锁期间不占用并发名额
+            async with session_lock:
+                async with self._slots:
+                    self.waiting -= 1
+                    admitted = True
+                    self.active += 1
+                    try:
+                        response = await self._run_session(user_id, session.id, message)
+                    except BaseException:
+                        self.failed += 1
+                        raise
+                    else:
+                        self.completed += 1
+                    finally:
+                        self.active -= 1
+        finally:
+            if not admitted:
+                self.waiting -= 1
+            if not self.active and not self.waiting:
+                self._idle.set()
+        return {"session_id": session.id, "response": response}
+
+    async def _run_session(self, user_id: str, session_id: str, message: str) -> str:
+        response_text = ""
+        async for event in self.runner.run_async(
+            user_id=user_id,
+            session_id=session_id,
+            new_message=types.Content(role="user", parts=[types.Part(text=message)]),
+        ):
+            if event.is_final_response() and event.content and event.content.parts:
+                text = "".join(part.text for part in event.content.parts if part.text)
+                if text:
+                    response_text = text
+        return response_text
+
+    async def drain(self, timeout: float = DEFAULT_DRAIN_TIMEOUT) -> bool:
+        """
+        优雅停机：不再接收新请求，等待进行中和排队中的请求完成后关闭MCP服务
+
+        Returns:
+            是否在超时前处理完所有请求
+        """
+        self._draining = True
+        print(f"服务停机中，等待 {self.active + self.waiting} 个请求完成")
+        drained = True
+        if self._idle is not None:
+            try:
+                await asyncio.wait_for(self._idle.wait(), timeout)
+            except asyncio.TimeoutError:
+                drained = False
+                print(f"停机等待超时，仍有 {self.active + self.waiting} 个请求未完成")
+        await mcp_pool.close_all()
+        return drained
+
+
+def create_app(server: Optional[AgentServer] = None):
+    """
+    创建HTTP应用
+
+    POST /run  {"user_id", "message", "session_id"} -> {"session_id", "response"}；队列已满返回429，停机中返回503
+    GET  /health -> 服务状态
+    """
+    # HTTP框架只在以HTTP方式提供服务时才需要
+    from contextlib import asynccontextmanager
+
+    from fastapi import FastAPI, HTTPException
+    from pydantic import BaseModel
+
+    server = server or AgentServer()
+
+    class RunRequest(BaseModel):
+        user_id: str
+        message: str
+        session_id: Optional[str] = None
+
+    @asynccontextmanager
+    async def lifespan(app):
+        await server.start()
+        yield
+        await server.drain()
+
+    app = FastAPI(title="智能任务Agent服务", lifespan=lifespan)
+
+    @app.post("/run")
+    async def run(request: RunRequest) -> Dict[str, Any]:
+        try:
+            return await server.run(request.user_id, request.message, request.session_id)
+        except ServerBusyError as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+        except ServerDrainingError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+
+    @app.get("/health")
+    async def health() -> Dict[str, Any]:
+        return server.stats()
+
+    return app
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="智能任务Agent服务")
+    parser.add_argument("--host", default=os.getenv("SERVER_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("SERVER_PORT", "8080")))
+    parser.add_argument("--max-active", type=int, default=DEFAULT_MAX_ACTIVE)
+    parser.add_argument("--max-queue", type=int, default=DEFAULT_MAX_QUEUE)
+    args = parser.parse_args(argv)
+
+    import uvicorn
+
+    setup_tracing()
+    app = create_app(AgentServer(max_active=args.max_active, max_queue=args.max_queue))
+    uvicorn.run(app, host=args.host, port=args.port, timeout_graceful_shutdown=int(DEFAULT_DRAIN_TIMEOUT))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+本地blob存储 - 按内容的SHA-256保存大段内容，state和模型上下文中只保留ID或引用，读取时通过mmap映射文件
+"""
+
+import hashlib
+import mmap
+import os
+import re
+import tempfile
+import time
+from typing import Any, Dict, Optional, Union
+
+# blob文件的保存目录，启用检查点时应设为重启后仍然保留的目录（默认的临时目录可能在重启时被清空）
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", os.path.join(tempfile.gettempdir(), "intelligent_task_blobs"))
+
+# state中超过该字节数的文本字段保存到blob存储，state中只保留引用，设为0时不转存
+BLOB_OFFLOAD_MIN_BYTES = int(os.getenv("BLOB_OFFLOAD_MIN_BYTES", "1024"))
+
+# blob自最后一次写入起保留的时间（秒），过期的blob由定期清理删除，设为0时永不删除。
+# state和检查点中的引用在这段时间内保证可读；启用检查点时应大于检查点需要恢复的时间范围
+BLOB_RETENTION_SECONDS = float(os.getenv("BLOB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+
+# 两次清理过期blob之间的最短间隔（秒），清理在写入blob时顺带进行
+BLOB_GC_INTERVAL = float(os.getenv("BLOB_GC_INTERVAL", "3600"))
+
+# 引用中保留的内容开头字符数
+BLOB_PREVIEW_CHARS = 100
+
+# 引用的blob无法读取时附加在内容开头之后的标记，让模型和报告知道内容不完整
+BLOB_MISSING_MARKER = "\n[完整内容已无法读取（blob {blob_id}），以上只是内容开头]"
+
+# state中blob引用的标识键，引用的结构为 {"blob_ref": ID, "size": 字节数, "preview": 内容开头}
+BLOB_REF_KEY = "blob_ref"
+
+_BLOB_ID = re.compile(r"^[0-9a-f]{64}$")
+
+
+class BlobStore:
+    """
+    内容寻址的blob存储
+
+    blob的ID就是内容的SHA-256，相同内容只保存一次；文件先写入临时文件再原子替换，
+    多个进程可以共享同一个目录。文件按ID的前两位分目录保存。
+
+    再次写入已存在的内容会刷新文件的修改时间；修改时间早于保留期限的blob在
+    写入时按BLOB_GC_INTERVAL的间隔清理。
+    """
+
+    def __init__(
+        self,
+        root: str = BLOB_STORE_DIR,
+        retention: float = BLOB_RETENTION_SECONDS,
+        gc_interval: float = BLOB_GC_INTERVAL,
+    ):
+        self.root = root
+        self.retention = retention
+        self.gc_interval = gc_interval
+        self._last_gc = 0.0
+
+    def _path(self, blob_id: str) -> str:
+        if not _BLOB_ID.match(blob_id or ""):
+            raise KeyError(f"无效的blob ID: {blob_id}")
+        return os.path.join(self.root, blob_id[:2], blob_id[2:])
+
+    def put(self, data: Union[str, bytes]) -> str:
+        """保存内容，返回blob ID"""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        blob_id = hashlib.sha256(data).hexdigest()
+        path = self._path(blob_id)
+        try:
+            # 已存在的内容只刷新修改时间，重新计算保留期限
+            os.utime(path)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(temp_path, path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+        self._maybe_gc()
+        return blob_id
+
+    def _maybe_gc(self) -> None:
+        now = time.time()
+        if self.retention > 0 and now - self._last_gc >= self.gc_interval:
+            self._last_gc = now
+            self.gc(now)
+
+    def gc(self, now: Optional[float] = None) -> int:
+        """
+        删除修改时间早于保留期限的blob和写入中断留下的临时文件
+
+        Returns:
+            删除的文件数
+        """
+        if self.retention <= 0:
+            return 0
+        cutoff = (time.time() if now is None else now) - self.retention
+        removed = 0
+        try:
+            subdirs = os.scandir(self.root)
+        except FileNotFoundError:
+            return 0
+        with subdirs:
+            for subdir in subdirs:
+                if not subdir.is_dir():
+                    continue
+                with os.scandir(subdir.path) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.stat().st_mtime < cutoff:
+                                os.unlink(entry.path)
+                                removed += 1
+                        except FileNotFoundError:
+                            # 其他进程已删除
+                            continue
+        if removed:
+            print(f"已清理 {removed} 个过期blob")
+        return removed
+
+    def exists(self, blob_id: str) -> bool:
+        try:
+            return os.path.exists(self._path(blob_id))
+        except KeyError:
+            return False
+
+    def read_bytes(self, blob_id: str, start: int = 0, end: int = -1) -> bytes:
+        """
+        读取blob中[start, end)范围的字节，end为-1时读到末尾
+
+        Raises:
+            KeyError: blob不存在
+        """
+        try:
+            f = open(self._path(blob_id), "rb")
+        except FileNotFoundError:
+            raise KeyError(f"blob不存在: {blob_id}")
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            end = size if end < 0 else min(end, size)
+            if size == 0 or start >= end:
+                return b""
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return mm[start:end]
+
+    def get(self, blob_id: str) -> str:
+        """读取blob的文本内容"""
+        return self.read_bytes(blob_id).decode("utf-8", "replace")
+
+
+# 进程级共享的blob存储
+blob_store = BlobStore()
+
+
+def is_blob_ref(value: Any) -> bool:
+    return isinstance(value, dict) and isinstance(value.get(BLOB_REF_KEY), str)
+
+
+def offload_text(text: Any, min_bytes: int = BLOB_OFFLOAD_MIN_BYTES, store: BlobStore = blob_store) -> Any:
+    """
+    较大的文本保存到blob存储并返回引用，其他值原样返回
+
+    写入state的大段文本经过该函数后，会话服务每次序列化state时只需处理很小的引用。
+    写入blob存储失败时保留原文本，不丢失内容
+    """
+    if not isinstance(text, str) or min_bytes <= 0:
+        return text
+    data = text.encode("utf-8")
+    if len(data) < min_bytes:
+        return text
+    try:
+        blob_id = store.put(data)
+    except OSError as e:
+        print(f"写入blob存储失败，{len(data)}字节的内容保留在state中: {e}")
+        return text
+    return {BLOB_REF_KEY: blob_id, "size": len(data), "preview": text[:BLOB_PREVIEW_CHARS]}
+
+
+def load_text(value: Any, store: BlobStore = blob_store) -> Any:
+    """
+    读取blob引用指向的文本，其他值原样返回
+
+    只在真正需要内容时调用；blob超过保留期限被清理或无法读取时，返回引用中保留的
+    内容开头并附上BLOB_MISSING_MARKER标记
+    """
+    if not is_blob_ref(value):
+        return value
+    ref: Dict[str, Any] = value
+    blob_id = ref[BLOB_REF_KEY]
+    try:
+        return store.get(blob_id)
+    except (KeyError, OSError) as e:
+        print(f"读取blob {blob_id} 失败，只能使用保留的内容开头: {e}")
+        return ref.get("preview", "") + BLOB_MISSING_MARKER.format(blob_id=blob_id)
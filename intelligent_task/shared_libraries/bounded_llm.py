@@ -0,0 +1,74 @@
+"""
+模型并发限制 - 按模型名限制同时进行的模型调用数，所有会话共享
+"""
+
+import asyncio
+import os
+import weakref
+from typing import AsyncGenerator, Dict, Optional
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+
+# 每个模型同时进行的调用数上限，未单独配置的模型使用默认值
+DEFAULT_MODEL_CONCURRENCY = int(os.getenv("MODEL_MAX_CONCURRENCY", "16"))
+
+
+class ModelLimiter:
+    """按模型名分配的并发上限"""
+
+    def __init__(
+        self,
+        default_concurrency: int = DEFAULT_MODEL_CONCURRENCY,
+        concurrency_limits: Optional[Dict[str, int]] = None,
+    ):
+        self.default_concurrency = max(1, default_concurrency)
+        self.concurrency_limits = dict(concurrency_limits or {})
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def semaphore(self, model_name: str) -> asyncio.Semaphore:
+        # 信号量绑定事件循环，每个事件循环各自创建
+        semaphores = self._semaphores.setdefault(asyncio.get_running_loop(), {})
+        semaphore = semaphores.get(model_name)
+        if semaphore is None:
+            limit = self.concurrency_limits.get(model_name, self.default_concurrency)
+            semaphore = semaphores[model_name] = asyncio.Semaphore(max(1, limit))
+        return semaphore
+
+
+# 全局模型并发限制
+model_limiter = ModelLimiter()
+
+
+class BoundedLlm(BaseLlm):
+    """
+    限制并发的模型包装
+
+    调用前按请求实际使用的模型名（回调可能已将请求改为其他模型）获取并发名额，
+    流式输出结束后释放。
+    """
+
+    inner: BaseLlm
+
+    @classmethod
+    def wrap(cls, model) -> "BoundedLlm":
+        """包装模型名或模型实例，已包装的模型原样返回"""
+        if isinstance(model, BoundedLlm):
+            return model
+        if isinstance(model, str):
+            from google.adk.models.registry import LLMRegistry
+            model = LLMRegistry.new_llm(model)
+        return cls(model=model.model, inner=model)
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        async with model_limiter.semaphore(llm_request.model or self.inner.model):
+            async for llm_response in self.inner.generate_content_async(llm_request, stream=stream):
+                yield llm_response
+
+    def connect(self, llm_request: LlmRequest):
+        return self.inner.connect(llm_request)
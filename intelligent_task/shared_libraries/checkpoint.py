@@ -0,0 +1,220 @@
+"""
+执行检查点 - 持久化任务计划和每个任务的执行结果，进程崩溃或重启后从检查点继续执行
+"""
+
+import abc
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from .execution_context import EXECUTION_CONTEXT_KEY
+from .task_result import TASK_RESULTS_KEY
+from .task_store import TASK_PLAN_ID_KEY, TaskStore, task_status_key
+
+# 检查点SQLite文件路径，未设置时不保存检查点
+CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", "")
+
+FINISHED_STATUSES = ("completed", "failed")
+
+
+@dataclass
+class TaskCheckpoint:
+    """单个任务的检查点"""
+
+    status: str
+    execution_record: Optional[Dict[str, Any]] = None
+    summary: Optional[Dict[str, Any]] = None
+    task_result: Optional[Dict[str, Any]] = None
+
+
+@dataclass
+class PlanCheckpoint:
+    """任务计划的检查点"""
+
+    plan_id: str
+    rows: List[list]
+    tasks: Dict[int, TaskCheckpoint] = field(default_factory=dict)
+
+
+class CheckpointStore(abc.ABC):
+    """检查点存储接口，可替换为其他持久化实现"""
+
+    @abc.abstractmethod
+    def save_plan(self, plan_id: str, rows: List[list]) -> None:
+        """保存任务计划"""
+
+    @abc.abstractmethod
+    def save_task(self, plan_id: str, task_id: int, checkpoint: TaskCheckpoint) -> None:
+        """保存单个任务的检查点"""
+
+    @abc.abstractmethod
+    def load(self, plan_id: str) -> Optional[PlanCheckpoint]:
+        """读取任务计划及其任务的检查点，不存在时返回None"""
+
+    @abc.abstractmethod
+    def delete(self, plan_id: str) -> None:
+        """删除任务计划的检查点"""
+
+
+class SQLiteCheckpointStore(CheckpointStore):
+    """基于SQLite(WAL模式)的检查点存储，每次写入立即提交"""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS plans "
+            "(plan_id TEXT PRIMARY KEY, rows TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS tasks "
+            "(plan_id TEXT NOT NULL, task_id INTEGER NOT NULL, status TEXT NOT NULL, "
+            "checkpoint TEXT NOT NULL, updated_at REAL NOT NULL, PRIMARY KEY (plan_id, task_id))"
+        )
+        self._db.commit()
+
+    def save_plan(self, plan_id: str, rows: List[list]) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO plans (plan_id, rows, updated_at) VALUES (?, ?, ?)",
+                (plan_id, json.dumps(rows, ensure_ascii=False), time.time()),
+            )
+            self._db.commit()
+
+    def save_task(self, plan_id: str, task_id: int, checkpoint: TaskCheckpoint) -> None:
+        data = {
+            "execution_record": checkpoint.execution_record,
+            "summary": checkpoint.summary,
+            "task_result": checkpoint.task_result,
+        }
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO tasks (plan_id, task_id, status, checkpoint, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (plan_id, task_id, checkpoint.status, json.dumps(data, ensure_ascii=False, default=str), time.time()),
+            )
+            self._db.commit()
+
+    def load(self, plan_id: str) -> Optional[PlanCheckpoint]:
+        with self._lock:
+            plan = self._db.execute("SELECT rows FROM plans WHERE plan_id = ?", (plan_id,)).fetchone()
+            if plan is None:
+                return None
+            task_rows = self._db.execute(
+                "SELECT task_id, status, checkpoint FROM tasks WHERE plan_id = ?", (plan_id,)
+            ).fetchall()
+        tasks = {}
+        for task_id, status, data in task_rows:
+            tasks[task_id] = TaskCheckpoint(status=status, **json.loads(data))
+        return PlanCheckpoint(plan_id=plan_id, rows=json.loads(plan[0]), tasks=tasks)
+
+    def delete(self, plan_id: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM tasks WHERE plan_id = ?", (plan_id,))
+            self._db.execute("DELETE FROM plans WHERE plan_id = ?", (plan_id,))
+            self._db.commit()
+
+
+_checkpoint_store: Optional[CheckpointStore] = SQLiteCheckpointStore(CHECKPOINT_DB_PATH) if CHECKPOINT_DB_PATH else None
+
+
+def get_checkpoint_store() -> Optional[CheckpointStore]:
+    return _checkpoint_store
+
+
+def set_checkpoint_store(store: Optional[CheckpointStore]) -> None:
+    """替换检查点存储，为None时不保存检查点"""
+    global _checkpoint_store
+    _checkpoint_store = store
+
+
+def checkpoint_plan(state) -> None:
+    """保存当前任务计划，计划ID由TaskStore.save生成"""
+    plan_id = state.get(TASK_PLAN_ID_KEY)
+    if _checkpoint_store is None or not plan_id:
+        return
+    _checkpoint_store.save_plan(plan_id, TaskStore.from_state(state).to_rows())
+
+
+def checkpoint_task(state, task_id: int, status: str, execution_record: Optional[Dict[str, Any]] = None) -> None:
+    """
+    任务状态变化后保存该任务的检查点
+
+    结果摘要和结构化结果从state中读取，恢复时原样写回
+    """
+    plan_id = state.get(TASK_PLAN_ID_KEY)
+    if _checkpoint_store is None or not plan_id:
+        return
+    _checkpoint_store.save_task(plan_id, task_id, TaskCheckpoint(
+        status=status,
+        execution_record=execution_record,
+        summary=(state.get(EXECUTION_CONTEXT_KEY) or {}).get(str(task_id)),
+        task_result=(state.get(TASK_RESULTS_KEY) or {}).get(str(task_id)),
+    ))
+
+
+def restore_checkpoint(state, plan_id: Optional[str] = None) -> List[int]:
+    """
+    从检查点恢复已完成任务的状态和结果
+
+    state中没有任务计划时先恢复计划。只恢复检查点中已完成的任务；失败的任务
+    和崩溃时正在执行的任务（包括state中已记录为失败的任务）重置为待执行，会被重新执行。
+
+    Args:
+        state: session.state或普通字典
+        plan_id: 要恢复的计划ID，为None时使用state中的计划ID
+
+    Returns:
+        恢复的任务ID列表
+    """
+    plan_id = plan_id or state.get(TASK_PLAN_ID_KEY)
+    if _checkpoint_store is None or not plan_id:
+        return []
+    checkpoint = _checkpoint_store.load(plan_id)
+    if checkpoint is None:
+        return []
+
+    if not TaskStore.exists(state) or state.get(TASK_PLAN_ID_KEY) != plan_id:
+        TaskStore.from_rows(checkpoint.rows).save(state)
+        state[TASK_PLAN_ID_KEY] = plan_id
+
+    restored = []
+    execute_results = list(state.get("execute_result") or [])
+    summaries = dict(state.get(EXECUTION_CONTEXT_KEY) or {})
+    task_results = dict(state.get(TASK_RESULTS_KEY) or {})
+    for task_id in sorted(checkpoint.tasks):
+        task_checkpoint = checkpoint.tasks[task_id]
+        if task_checkpoint.status != "completed":
+            continue
+        if state.get(task_status_key(task_id)) in FINISHED_STATUSES:
+            continue
+        state[task_status_key(task_id)] = task_checkpoint.status
+        if task_checkpoint.execution_record:
+            execute_results.append(task_checkpoint.execution_record)
+        if task_checkpoint.summary:
+            summaries[str(task_id)] = task_checkpoint.summary
+        if task_checkpoint.task_result:
+            task_results[str(task_id)] = task_checkpoint.task_result
+        restored.append(task_id)
+
+    # 失败的任务和崩溃时正在执行的任务恢复为待执行，并去掉失败时留下的结果，重新执行后再写入
+    retried = [task.id for task in TaskStore.from_state(state).with_status("failed", "running")]
+    for task_id in retried:
+        state[task_status_key(task_id)] = "pending"
+        summaries.pop(str(task_id), None)
+        task_results.pop(str(task_id), None)
+    if retried:
+        execute_results = [record for record in execute_results if record.get("task_id") not in retried]
+
+    if restored or retried:
+        state["execute_result"] = execute_results
+        state[EXECUTION_CONTEXT_KEY] = summaries
+        state[TASK_RESULTS_KEY] = task_results
+    if restored:
+        print(f"已从检查点恢复{len(restored)}个已完成的任务: {restored}")
+    return restored
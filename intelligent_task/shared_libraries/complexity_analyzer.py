@@ -2,6 +2,19 @@
 任务复杂度分析器 - 共享库
 """
 
+import json
+import os
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+from .keyword_matcher import KeywordAutomaton
+
+try:
+    from .complexity_model import ComplexityModel
+except ImportError:
+    # numpy未安装时只使用关键词规则
+    ComplexityModel = None
+
 
 class ComplexityAnalyzer:
     """任务复杂度分析器"""
@@ -17,39 +30,205 @@ class ComplexityAnalyzer:
         "项目", "流程", "策略", "计划", "方案"
     ]
     
+    STEP_MARKERS = ["然后", "接着", "同时", "另外", "并且", "以及"]
+    
+    # 关键词权重，未列出的关键词权重为1
+    KEYWORD_WEIGHTS: Dict[str, float] = {}
+    
+    # 关键词配置文件（JSON），文件修改后会自动重新加载
+    KEYWORDS_CONFIG_PATH: Optional[str] = os.getenv("COMPLEXITY_KEYWORDS_PATH")
+    
+    # 检查配置文件是否修改的最小间隔（秒）
+    RELOAD_CHECK_INTERVAL = 5.0
+    
+    # 训练好的复杂度分类模型（.npz），配置后优先使用模型判断，关键词规则作为回退
+    MODEL_PATH: Optional[str] = os.getenv("COMPLEXITY_MODEL_PATH")
+    
+    _matcher: Optional[KeywordAutomaton] = None
+    _model = None
+    _config_mtime: Optional[float] = None
+    _last_reload_check = 0.0
+    
     @classmethod
-    def analyze_complexity(cls, user_input: str) -> str:
+    def build_matcher(cls) -> None:
+        """根据当前关键词集合重新构建关键词自动机"""
+        keywords = []
+        for category, words in (("simple", cls.SIMPLE_KEYWORDS),
+                                ("complex", cls.COMPLEX_KEYWORDS),
+                                ("step", cls.STEP_MARKERS)):
+            for word in words:
+                keywords.append((word, category, cls.KEYWORD_WEIGHTS.get(word, 1.0)))
+        cls._matcher = KeywordAutomaton(keywords)
+    
+    @classmethod
+    def load_keywords(cls, path: str) -> None:
         """
-        分析用户输入的复杂度
+        从JSON配置文件加载关键词并重建自动机
+        
+        配置格式::
+        
+            {
+                "simple": ["什么是", ...] 或 {"什么是": 1.5, ...},
+                "complex": [...] 或 {...},
+                "step_markers": [...] 或 {...}
+            }
+        
+        未出现在配置中的类别保持不变。
+        """
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+        
+        weights: Dict[str, float] = {}
+        
+        def parse(words: Union[List[str], Dict[str, float]]) -> List[str]:
+            if isinstance(words, dict):
+                weights.update({word: float(weight) for word, weight in words.items()})
+                return list(words)
+            return list(words)
+        
+        if "simple" in config:
+            cls.SIMPLE_KEYWORDS = parse(config["simple"])
+        if "complex" in config:
+            cls.COMPLEX_KEYWORDS = parse(config["complex"])
+        if "step_markers" in config:
+            cls.STEP_MARKERS = parse(config["step_markers"])
+        cls.KEYWORD_WEIGHTS = weights
+        cls.KEYWORDS_CONFIG_PATH = path
+        cls._config_mtime = os.path.getmtime(path)
+        cls.build_matcher()
+        print(f"复杂度关键词已从 {path} 加载")
+    
+    @classmethod
+    def set_model(cls, model) -> None:
+        """设置复杂度分类模型，传入None时恢复为关键词规则"""
+        cls._model = model
+    
+    @classmethod
+    def load_model(cls, path: str) -> bool:
+        """
+        加载训练好的复杂度分类模型
+        
+        Returns:
+            是否加载成功，失败时继续使用关键词规则
+        """
+        if ComplexityModel is None:
+            print("未安装numpy，复杂度分析使用关键词规则")
+            return False
+        try:
+            cls.set_model(ComplexityModel.load(path))
+        except (OSError, ValueError, KeyError) as e:
+            print(f"复杂度分类模型加载失败，使用关键词规则: {e}")
+            return False
+        cls.MODEL_PATH = path
+        return True
+    
+    @staticmethod
+    def _from_probability(probability: float) -> Tuple[str, float]:
+        """将模型预测的复杂任务概率转换为(复杂度, 置信度)"""
+        if probability >= 0.5:
+            return "complex", float(probability)
+        return "simple", float(1.0 - probability)
+    
+    @classmethod
+    def _reload_if_changed(cls) -> None:
+        """配置文件有修改时重新加载关键词"""
+        if not cls.KEYWORDS_CONFIG_PATH:
+            return
+        now = time.monotonic()
+        if now - cls._last_reload_check < cls.RELOAD_CHECK_INTERVAL:
+            return
+        cls._last_reload_check = now
+        try:
+            mtime = os.path.getmtime(cls.KEYWORDS_CONFIG_PATH)
+            if mtime != cls._config_mtime:
+                cls.load_keywords(cls.KEYWORDS_CONFIG_PATH)
+        except (OSError, ValueError) as e:
+            print(f"复杂度关键词加载失败: {e}")
+    
+    @classmethod
+    def analyze_with_confidence(cls, user_input: str) -> Tuple[str, float]:
+        """
+        分析用户输入的复杂度并给出置信度
         
         Args:
             user_input: 用户输入的任务描述
             
         Returns:
-            "simple" 或 "complex"
+            ("simple" 或 "complex", 0~1之间的置信度)
         """
-        user_input_lower = user_input.lower()
+        if cls._model is not None:
+            return cls._from_probability(cls._model.predict_proba([user_input])[0])
         
-        # 检查简单关键词
-        simple_score = sum(1 for keyword in cls.SIMPLE_KEYWORDS 
-                          if keyword in user_input_lower)
+        return cls._analyze_keywords(user_input)
+    
+    @classmethod
+    def _analyze_keywords(cls, user_input: str) -> Tuple[str, float]:
+        """基于关键词规则的复杂度分析"""
+        cls._reload_if_changed()
         
-        # 检查复杂关键词
-        complex_score = sum(1 for keyword in cls.COMPLEX_KEYWORDS 
-                           if keyword in user_input_lower)
+        # 一次扫描得到简单关键词、复杂关键词和步骤标识的得分
+        scores = cls._matcher.scores(user_input)
+        simple_score = scores.get("simple", 0.0)
+        complex_score = scores.get("complex", 0.0)
         
         # 长度判断 - 超过100字符可能是复杂任务
         length_factor = len(user_input) > 100
         
         # 多个句子或步骤判断
-        multiple_steps = any(marker in user_input_lower 
-                           for marker in ["然后", "接着", "同时", "另外", "并且", "以及"])
+        multiple_steps = scores.get("step", 0.0) > 0
         
         # 综合判断
         if complex_score > simple_score or length_factor or multiple_steps:
-            return "complex"
+            # 复杂信号越多、越压过简单信号，置信度越高
+            evidence = complex_score - simple_score + length_factor + multiple_steps
+            return "complex", min(1.0, 0.5 + 0.15 * max(evidence, 1))
         elif simple_score > 0 and complex_score == 0:
-            return "simple"
+            return "simple", min(1.0, 0.6 + 0.2 * simple_score)
         else:
             # 默认情况，如果不确定，当作复杂任务处理
-            return "complex"
\ No newline at end of file
+            return "complex", 0.5
+    
+    @classmethod
+    def analyze_complexity(cls, user_input: str) -> str:
+        """
+        分析用户输入的复杂度
+        
+        Args:
+            user_input: 用户输入的任务描述
+            
+        Returns:
+            "simple" 或 "complex"
+        """
+        return cls.analyze_with_confidence(user_input)[0]
+    
+    @classmethod
+    def analyze_many(
+        cls, user_inputs: List[str], with_confidence: bool = False
+    ) -> Union[List[str], List[Tuple[str, float]]]:
+        """
+        批量分析多个输入的复杂度，用于排队请求的分发和离线分析
+        
+        Args:
+            user_inputs: 用户输入列表
+            with_confidence: 是否同时返回置信度
+            
+        Returns:
+            与输入一一对应的复杂度列表，with_confidence为True时为(复杂度, 置信度)列表
+        """
+        if cls._model is not None:
+            # 模型对整批输入一次性向量化打分
+            results = [cls._from_probability(p) for p in cls._model.predict_proba(user_inputs)]
+        else:
+            results = [cls._analyze_keywords(user_input) for user_input in user_inputs]
+        if with_confidence:
+            return results
+        return [complexity for complexity, _ in results]
+
+
+# 类加载时构建关键词自动机，并加载配置的分类模型
+if ComplexityAnalyzer.KEYWORDS_CONFIG_PATH:
+    ComplexityAnalyzer.load_keywords(ComplexityAnalyzer.KEYWORDS_CONFIG_PATH)
+else:
+    ComplexityAnalyzer.build_matcher()
+if ComplexityAnalyzer.MODEL_PATH:
+    ComplexityAnalyzer.load_model(ComplexityAnalyzer.MODEL_PATH)
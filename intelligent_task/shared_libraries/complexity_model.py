@@ -0,0 +1,138 @@
+"""
+复杂度分类模型 - 字符n-gram哈希特征 + 线性模型（逻辑回归），基于NumPy批量打分
+
+需要安装可选依赖numpy；未安装时ComplexityAnalyzer会回退到关键词规则。
+"""
+
+import json
+import zlib
+from typing import Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+
+def load_routing_log(path: str) -> Tuple[List[str], List[str]]:
+    """
+    读取记录的分发决策日志（JSONL），每行格式为 {"input": "...", "label": "simple" | "complex"}
+
+    Returns:
+        (输入列表, 标签列表)
+    """
+    texts, labels = [], []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if record.get("label") in ("simple", "complex"):
+                texts.append(record["input"])
+                labels.append(record["label"])
+    return texts, labels
+
+
+class ComplexityModel:
+    """
+    轻量级复杂度分类器
+
+    将输入文本的字符n-gram哈希到固定维度的稀疏特征，使用逻辑回归预测任务为
+    复杂任务的概率。训练和预测都在整批输入上以向量化方式完成。
+    """
+
+    def __init__(self, n_features: int = 2 ** 18, ngram_range: Tuple[int, int] = (1, 3)):
+        self.n_features = n_features
+        self.ngram_range = ngram_range
+        self.weights = np.zeros(n_features, dtype=np.float32)
+        self.bias = 0.0
+
+    def _hash_ngrams(self, text: str) -> List[int]:
+        text = text.lower()
+        min_n, max_n = self.ngram_range
+        return [
+            zlib.crc32(text[i:i + n].encode("utf-8")) % self.n_features
+            for n in range(min_n, max_n + 1)
+            for i in range(len(text) - n + 1)
+        ]
+
+    def vectorize(self, texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        将一批文本转换为稀疏特征
+
+        Returns:
+            (行号数组, 特征下标数组, 特征值数组)，每个文本的特征值按n-gram数量做L2归一化
+        """
+        rows, cols = [], []
+        for row, text in enumerate(texts):
+            indices = self._hash_ngrams(text)
+            rows.extend([row] * len(indices))
+            cols.extend(indices)
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        counts = np.bincount(rows, minlength=len(texts)).astype(np.float32)
+        values = 1.0 / np.sqrt(np.maximum(counts, 1.0))[rows]
+        return rows, cols, values
+
+    def _predict_features(self, rows: np.ndarray, cols: np.ndarray, values: np.ndarray, n_rows: int) -> np.ndarray:
+        scores = np.bincount(rows, weights=self.weights[cols] * values, minlength=n_rows) + self.bias
+        return 1.0 / (1.0 + np.exp(-scores))
+
+    def predict_proba(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        批量预测每个输入为复杂任务的概率
+
+        Returns:
+            形状为 (len(texts),) 的概率数组
+        """
+        if not texts:
+            return np.zeros(0, dtype=np.float64)
+        rows, cols, values = self.vectorize(texts)
+        return self._predict_features(rows, cols, values, len(texts))
+
+    def fit(
+        self,
+        texts: Sequence[str],
+        labels: Iterable[str],
+        epochs: int = 200,
+        learning_rate: float = 1.0,
+        l2: float = 1e-4,
+    ) -> "ComplexityModel":
+        """
+        使用全批量梯度下降训练逻辑回归
+
+        Args:
+            texts: 输入文本
+            labels: 对应的标签 "simple" 或 "complex"
+        """
+        y = np.asarray([1.0 if label == "complex" else 0.0 for label in labels])
+        if len(y) != len(texts) or not len(y):
+            raise ValueError("训练数据为空或输入与标签数量不一致")
+
+        # 哈希特征只计算一次，训练过程中使用float64权重保证数值稳定
+        rows, cols, values = self.vectorize(texts)
+        self.weights = self.weights.astype(np.float64)
+        for _ in range(epochs):
+            error = self._predict_features(rows, cols, values, len(y)) - y
+            gradient = np.bincount(cols, weights=error[rows] * values, minlength=self.n_features) / len(y)
+            self.weights -= learning_rate * (gradient + l2 * self.weights)
+            self.bias -= learning_rate * float(error.mean())
+        self.weights = self.weights.astype(np.float32)
+        return self
+
+    def save(self, path: str) -> None:
+        """保存模型参数到 .npz 文件"""
+        np.savez_compressed(
+            path,
+            weights=self.weights,
+            bias=np.asarray(self.bias),
+            n_features=np.asarray(self.n_features),
+            ngram_range=np.asarray(self.ngram_range),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "ComplexityModel":
+        """从 .npz 文件加载模型参数"""
+        data = np.load(path)
+        model = cls(int(data["n_features"]), tuple(int(n) for n in data["ngram_range"]))
+        model.weights = data["weights"].astype(np.float32)
+        model.bias = float(data["bias"])
+        return model
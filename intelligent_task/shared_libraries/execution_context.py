@@ -0,0 +1,130 @@
+"""
+执行上下文 - 增量记录已完成任务的结果摘要，按依赖关系和token预算构建执行指令中的上下文
+"""
+
+import os
+import re
+from typing import List, Tuple
+
+from .blob_store import load_text, offload_text
+from .task_store import TASK_PLAN_KEY, TaskRecord
+
+# 执行指令中"前面步骤结果"部分的token预算
+DEFAULT_CONTEXT_TOKEN_BUDGET = int(os.getenv("EXECUTION_CONTEXT_TOKEN_BUDGET", "1500"))
+
+# 每个任务结果摘要的token上限
+DEFAULT_SUMMARY_TOKENS = int(os.getenv("EXECUTION_SUMMARY_TOKENS", "300"))
+
+# session.state中保存任务结果摘要的键
+EXECUTION_CONTEXT_KEY = "execution_context"
+
+_CJK_CHARS = re.compile(r"[\u3000-\u9fff\uff00-\uffef]")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数：中文字符按每字1个token，其他字符按每4个字符1个token"""
+    cjk_count = len(_CJK_CHARS.findall(text))
+    return cjk_count + (len(text) - cjk_count + 3) // 4
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """将文本截断到不超过max_tokens个token"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    # 先按字符数粗截，再逐步收缩到预算内
+    end = min(len(text), max_tokens * 4)
+    while end > 0 and estimate_tokens(text[:end]) > max_tokens:
+        end = int(end * 0.9)
+    return text[:end] + "..."
+
+
+def summarize_result(result_text: str, max_tokens: int = DEFAULT_SUMMARY_TOKENS) -> str:
+    """
+    生成任务结果摘要
+
+    执行结果按Think-Act-Observe格式输出，最后一个观察阶段通常包含最终结论，
+    优先保留该部分
+    """
+    marker = result_text.rfind("观察阶段")
+    if marker != -1:
+        result_text = result_text[marker + len("观察阶段"):]
+    return truncate_to_tokens(result_text.strip(), max_tokens)
+
+
+def record_task_summary(state, task: TaskRecord, status: str, result_text: str) -> None:
+    """
+    任务结束时记录其结果摘要，每个任务只在完成时计算一次
+
+    Args:
+        state: session.state
+        task: 已结束的任务
+        status: 任务状态 "completed" 或 "failed"
+        result_text: 任务执行结果文本
+    """
+    summaries = dict(state.get(EXECUTION_CONTEXT_KEY) or {})
+    summaries[str(task.id)] = {
+        "title": task.title,
+        "status": status,
+        "summary": offload_text(summarize_result(result_text)),
+    }
+    state[EXECUTION_CONTEXT_KEY] = summaries
+
+
+def ancestor_ids(state, depends_on: List[int]) -> List[int]:
+    """
+    按依赖关系由近到远列出所有直接和间接依赖的任务ID
+
+    同一距离的任务ID大的排在前面。未标注依赖的步骤默认依赖上一步，
+    因此链式计划中会得到前面所有步骤
+    """
+    plan_deps = {row[0]: row[3] for row in state.get(TASK_PLAN_KEY) or []}
+    seen = set(depends_on)
+    level = sorted(seen, reverse=True)
+    ordered: List[int] = []
+    while level:
+        ordered.extend(level)
+        next_level = set()
+        for task_id in level:
+            next_level.update(dep for dep in plan_deps.get(task_id, ()) if dep not in seen)
+        seen |= next_level
+        level = sorted(next_level, reverse=True)
+    return ordered
+
+
+def build_previous_context(
+    state,
+    current_task: TaskRecord,
+    token_budget: int = DEFAULT_CONTEXT_TOKEN_BUDGET,
+) -> str:
+    """
+    构建当前任务所需的前面步骤执行结果上下文
+
+    包含当前任务直接和间接依赖的任务，按与当前任务由近到远的顺序加入，总长度不超过
+    token预算，超出预算时先舍弃较远的步骤。转存到blob存储的摘要只在加入上下文时读取
+
+    Returns:
+        上下文文本，没有可用结果时返回空字符串
+    """
+    summaries = state.get(EXECUTION_CONTEXT_KEY) or {}
+    if not summaries:
+        return ""
+
+    header = "**前面步骤的执行结果上下文**："
+    remaining = token_budget - estimate_tokens(header)
+    sections: List[Tuple[int, str]] = []
+    for task_id in ancestor_ids(state, current_task.depends_on):
+        record = summaries.get(str(task_id))
+        if not record:
+            continue
+        status_icon = "✅" if record.get("status") == "completed" else "❌"
+        section = f"步骤{task_id} - {record.get('title', '')} {status_icon}:\n执行结果: {load_text(record.get('summary', ''))}"
+        cost = estimate_tokens(section)
+        if cost > remaining:
+            break
+        sections.append((task_id, section))
+        remaining -= cost
+
+    if not sections:
+        return ""
+    sections.sort()
+    return header + "\n" + "\n\n".join(section for _, section in sections)
@@ -0,0 +1,83 @@
+"""
+多模式关键词匹配器 - 基于Aho-Corasick自动机，一次扫描匹配全部关键词
+"""
+
+from collections import deque
+from typing import Dict, Iterable, List, Set, Tuple
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick关键词自动机
+
+    构建一次后可重复使用，匹配耗时只与输入长度相关，与关键词数量无关。
+    每个关键词属于一个类别并带有权重，同一关键词在一次匹配中只计一次。
+    """
+
+    def __init__(self, keywords: Iterable[Tuple[str, str, float]]):
+        """
+        Args:
+            keywords: (关键词, 类别, 权重) 序列，关键词按小写匹配
+        """
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+        self.keywords: List[Tuple[str, str, float]] = []
+
+        for keyword, category, weight in keywords:
+            keyword = keyword.lower()
+            if not keyword:
+                continue
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[state][char] = next_state
+                state = next_state
+            self._output[state].append(len(self.keywords))
+            self.keywords.append((keyword, category, weight))
+
+        self._build_fail_links()
+
+    def _build_fail_links(self) -> None:
+        # 按广度优先顺序计算失败链接，并把失败链接展开为完整的状态转移表(DFA)，
+        # 匹配时每个字符只需一次字典查找
+        self._delta: List[Dict[str, int]] = [dict(self._goto[0])] + [{} for _ in self._goto[1:]]
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            fail = self._fail[state]
+            # 失败状态的转移表已先于当前状态计算完成
+            self._delta[state] = {**self._delta[fail], **self._goto[state]}
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                self._fail[next_state] = self._delta[fail].get(char, 0) if state else 0
+                # 合并失败链上的输出，匹配时无需再沿失败链回溯
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def find(self, text: str) -> Set[int]:
+        """
+        返回文本中出现的所有关键词编号（对应 self.keywords 的下标）
+        """
+        delta, output = self._delta, self._output
+        matched: Set[int] = set()
+        state = 0
+        for char in text.lower():
+            state = delta[state].get(char, 0)
+            if output[state]:
+                matched.update(output[state])
+        return matched
+
+    def scores(self, text: str) -> Dict[str, float]:
+        """
+        计算文本在各类别上的得分，即匹配到的不同关键词的权重之和
+        """
+        result: Dict[str, float] = {}
+        for index in self.find(text):
+            _, category, weight = self.keywords[index]
+            result[category] = result.get(category, 0.0) + weight
+        return result
@@ -0,0 +1,192 @@
+"""
+MCP服务进程池 - 进程内共享MCP服务连接，每个服务只启动一次
+"""
+
+import asyncio
+import os
+from typing import Callable, Dict, List, Optional
+
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.base_toolset import BaseToolset
+
+from .tool_fanout import tool_fanout
+
+# 所有MCP服务的启动参数，按服务名注册
+MCP_SERVERS: Dict[str, List[str]] = {
+    "brave-search": ["@modelcontextprotocol/server-brave-search"],
+    "fetch": ["@modelcontextprotocol/server-fetch"],
+    "filesystem": ["@modelcontextprotocol/server-filesystem"],
+    "time": ["@modelcontextprotocol/server-time"],
+    "office-word": ["@modelcontextprotocol/server-office-word"],
+    "office-excel": ["@modelcontextprotocol/server-office-excel"],
+    "sequential-thinking": ["-y", "@modelcontextprotocol/server-sequential-thinking"],
+}
+
+# 使用进程内原生实现、不启动npx进程的服务，逗号分隔，设为空时全部使用MCP服务
+NATIVE_TOOLS = [name.strip() for name in os.getenv("NATIVE_TOOLS", "time,filesystem,fetch,sequential-thinking").split(",") if name.strip()]
+
+# 进程内允许启动的MCP服务进程数上限
+DEFAULT_MAX_SERVERS = int(os.getenv("MCP_MAX_SERVERS", str(len(MCP_SERVERS))))
+
+# 健康检查的超时时间和间隔（秒）
+HEALTH_CHECK_TIMEOUT = float(os.getenv("MCP_HEALTH_CHECK_TIMEOUT", "10"))
+HEALTH_CHECK_INTERVAL = float(os.getenv("MCP_HEALTH_CHECK_INTERVAL", "60"))
+
+
+class MCPServerPool:
+    """
+    MCP服务池
+
+    每个服务在进程内只对应一个MCPToolset实例，所有agent和并发会话共享同一个
+    stdio服务进程和MCP会话，避免每个agent、每个worker重复启动npx进程。
+    NATIVE_TOOLS中有进程内实现的服务直接使用原生工具集，不启动进程。
+    """
+
+    def __init__(self, max_servers: int = DEFAULT_MAX_SERVERS):
+        self.max_servers = max_servers
+        self._toolsets: Dict[str, BaseToolset] = {}
+        self._health_check_task: Optional[asyncio.Task] = None
+
+    def _create_toolset(self, name: str) -> BaseToolset:
+        if name in NATIVE_TOOLS:
+            from .native_tools import NATIVE_TOOLSETS
+
+            if name in NATIVE_TOOLSETS:
+                return NATIVE_TOOLSETS[name]()
+
+        # 导入MCP客户端开销较大，只在真正创建MCP工具集时导入
+        from google.adk.tools.mcp_tool.mcp_toolset import MCPToolset, StdioConnectionParams, StdioServerParameters
+
+        return MCPToolset(
+            connection_params=StdioConnectionParams(
+                server_params=StdioServerParameters(
+                    command="npx",
+                    args=MCP_SERVERS[name],
+                ),
+            ),
+        )
+
+    def get_toolset(self, name: str) -> BaseToolset:
+        """
+        获取指定服务的共享工具集，首次获取时创建
+
+        Args:
+            name: MCP_SERVERS 中注册的服务名
+
+        Returns:
+            共享的MCPToolset或原生工具集实例
+
+        Raises:
+            KeyError: 服务未注册
+            RuntimeError: 服务数已达到进程上限
+        """
+        if name not in self._toolsets:
+            if name not in MCP_SERVERS:
+                raise KeyError(f"未注册的MCP服务: {name}")
+            if len(self._toolsets) >= self.max_servers:
+                raise RuntimeError(f"MCP服务数已达上限({self.max_servers})，无法启动 {name}")
+            self._toolsets[name] = self._create_toolset(name)
+        return self._toolsets[name]
+
+    def set_toolset(self, name: str, toolset: BaseToolset) -> None:
+        """替换指定服务的工具集，用于基准测试等场景中使用本地替身服务"""
+        if name not in MCP_SERVERS:
+            raise KeyError(f"未注册的MCP服务: {name}")
+        self._toolsets[name] = toolset
+
+    async def _close(self, name: str) -> None:
+        toolset = self._toolsets.get(name)
+        if toolset is None:
+            return
+        try:
+            await toolset.close()
+        except Exception as e:
+            print(f"关闭MCP服务 {name} 失败: {e}")
+
+    async def restart(self, name: str) -> None:
+        """关闭指定服务的连接和进程，下次使用时重新启动"""
+        # 保留同一个实例，已挂载到agent上的工具集引用仍然有效
+        await self._close(name)
+        print(f"MCP服务 {name} 将在下次使用时重新启动")
+
+    async def health_check(self, timeout: float = HEALTH_CHECK_TIMEOUT) -> Dict[str, bool]:
+        """
+        检查所有已启动服务的健康状态，并重启无响应或已崩溃的服务
+
+        Returns:
+            服务名到健康状态的映射
+        """
+        results = {}
+        for name, toolset in list(self._toolsets.items()):
+            try:
+                await asyncio.wait_for(toolset.get_tools(), timeout=timeout)
+                results[name] = True
+            except Exception as e:
+                print(f"MCP服务 {name} 健康检查失败: {e}")
+                results[name] = False
+                await self.restart(name)
+        return results
+
+    def start_health_check(self, interval: float = HEALTH_CHECK_INTERVAL) -> asyncio.Task:
+        """在当前事件循环中启动周期性健康检查"""
+
+        async def loop():
+            while True:
+                await asyncio.sleep(interval)
+                await self.health_check()
+
+        if self._health_check_task is None or self._health_check_task.done():
+            self._health_check_task = asyncio.ensure_future(loop())
+        return self._health_check_task
+
+    async def close_all(self) -> None:
+        """停止健康检查并关闭所有服务进程"""
+        if self._health_check_task is not None:
+            self._health_check_task.cancel()
+            self._health_check_task = None
+        for name in list(self._toolsets):
+            await self._close(name)
+
+
+# 进程级共享的服务池
+mcp_pool = MCPServerPool()
+
+
+class LazyMCPToolset(BaseToolset):
+    """
+    延迟初始化的MCP工具集
+
+    创建时不导入MCP客户端、不创建工具集，直到agent第一次需要该服务的工具时才
+    从服务池获取共享工具集并启动服务进程。可以通过 should_load 判断当前上下文
+    是否真正需要该服务，不需要时不暴露工具，也不启动进程。
+
+    返回的工具经过并发上限和超时限制的包装。
+    """
+
+    def __init__(
+        self,
+        server_name: str,
+        should_load: Optional[Callable[[ReadonlyContext], bool]] = None,
+        pool: MCPServerPool = mcp_pool,
+    ):
+        super().__init__()
+        if server_name not in MCP_SERVERS:
+            raise KeyError(f"未注册的MCP服务: {server_name}")
+        self.server_name = server_name
+        self.should_load = should_load
+        self.pool = pool
+
+    async def get_tools(self, readonly_context: Optional[ReadonlyContext] = None) -> List[BaseTool]:
+        if (
+            self.should_load is not None
+            and readonly_context is not None
+            and not self.should_load(readonly_context)
+        ):
+            return []
+        tools = await self.pool.get_toolset(self.server_name).get_tools(readonly_context)
+        return [tool_fanout.wrap(tool, self.server_name) for tool in tools]
+
+    async def close(self) -> None:
+        # 共享的服务进程由服务池统一管理，这里不关闭
+        return None
@@ -0,0 +1,199 @@
+"""
+模型分级路由 - 按agent角色和步骤开销选择模型，超时自动降级到更快的模型，并按会话限制模型耗时和费用
+"""
+
+import asyncio
+import os
+import time
+from typing import AsyncGenerator, Dict, Optional
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+
+# 模型分级，从快到慢、从便宜到昂贵
+TIER_ORDER = ("fast", "standard", "strong")
+
+MODEL_TIERS: Dict[str, str] = {
+    "fast": os.getenv("MODEL_TIER_FAST", "gemini-2.0-flash-lite"),
+    "standard": os.getenv("MODEL_TIER_STANDARD", "gemini-2.0-flash"),
+    "strong": os.getenv("MODEL_TIER_STRONG", "gemini-2.5-pro"),
+}
+
+# 各agent使用的模型分级（监控agent直接调度任务，不调用模型）
+AGENT_TIERS: Dict[str, str] = {
+    "coordinator": os.getenv("COORDINATOR_MODEL_TIER", "standard"),
+    "decomposer": os.getenv("DECOMPOSER_MODEL_TIER", "standard"),
+    "executor": os.getenv("EXECUTOR_MODEL_TIER", "standard"),
+}
+
+# 各分级等待模型首个响应的超时时间（秒），超时后改用低一级的模型重试，设为0时不限制。
+# 强分级用于需要深度推理的请求，首个响应本来就慢，默认不因超时降级；最快的分级没有可降级的模型
+MODEL_TIMEOUT = float(os.getenv("MODEL_TIMEOUT", "30"))
+MODEL_TIMEOUTS: Dict[str, float] = {
+    "fast": float(os.getenv("MODEL_TIMEOUT_FAST", "0")),
+    "standard": float(os.getenv("MODEL_TIMEOUT_STANDARD", str(MODEL_TIMEOUT))),
+    "strong": float(os.getenv("MODEL_TIMEOUT_STRONG", "0")),
+}
+
+# 每个会话的模型费用（美元）和模型耗时（秒）预算，超出后只使用最快的分级，设为0时不限制
+SESSION_COST_BUDGET = float(os.getenv("SESSION_COST_BUDGET", "0"))
+SESSION_LATENCY_BUDGET = float(os.getenv("SESSION_LATENCY_BUDGET", "0"))
+
+# 每百万token的输入、输出价格（美元），未列出的模型按0计算
+MODEL_PRICES: Dict[str, tuple] = {
+    "gemini-2.0-flash-lite": (0.075, 0.30),
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-pro": (1.25, 10.00),
+}
+
+# session.state中保存会话模型用量的键，值为 {"calls", "cost", "latency_s"}
+MODEL_USAGE_KEY = "model_usage"
+
+_llms: Dict[str, BaseLlm] = {}
+
+
+def model_for(role: str) -> str:
+    """获取agent角色对应的模型名"""
+    return MODEL_TIERS[AGENT_TIERS.get(role, "standard")]
+
+
+def fallback_model(model: str) -> Optional[str]:
+    """获取比给定模型低一级的模型，已是最快分级或不在分级中时返回None"""
+    tiers = [tier for tier in TIER_ORDER if MODEL_TIERS[tier] == model]
+    if not tiers:
+        return None
+    for tier in reversed(TIER_ORDER[:TIER_ORDER.index(tiers[0])]):
+        if MODEL_TIERS[tier] != model:
+            return MODEL_TIERS[tier]
+    return None
+
+
+def timeout_for(model: str) -> float:
+    """获取模型所在分级的首个响应超时时间，不在分级中的模型不限制"""
+    for tier in TIER_ORDER:
+        if MODEL_TIERS[tier] == model:
+            return MODEL_TIMEOUTS.get(tier, 0.0)
+    return 0.0
+
+
+def over_budget(state) -> bool:
+    """会话的模型费用或耗时是否已超出预算"""
+    usage = state.get(MODEL_USAGE_KEY) or {}
+    if SESSION_COST_BUDGET and usage.get("cost", 0.0) >= SESSION_COST_BUDGET:
+        return True
+    if SESSION_LATENCY_BUDGET and usage.get("latency_s", 0.0) >= SESSION_LATENCY_BUDGET:
+        return True
+    return False
+
+
+def select_model(state, tier: str) -> str:
+    """按分级选择模型，会话超出预算时使用最快的分级"""
+    return MODEL_TIERS["fast"] if over_budget(state) else MODEL_TIERS[tier]
+
+
+def add_model_usage(state, calls: int = 0, cost: float = 0.0, latency_s: float = 0.0) -> None:
+    """累加会话的模型用量"""
+    usage = dict(state.get(MODEL_USAGE_KEY) or {})
+    usage["calls"] = usage.get("calls", 0) + calls
+    usage["cost"] = usage.get("cost", 0.0) + cost
+    usage["latency_s"] = usage.get("latency_s", 0.0) + latency_s
+    state[MODEL_USAGE_KEY] = usage
+
+
+def merge_model_usage(parent_state, before: Optional[dict], after: Optional[dict]) -> None:
+    """将子会话中新增的模型用量合并到父会话"""
+    before, after = before or {}, after or {}
+    add_model_usage(
+        parent_state,
+        calls=after.get("calls", 0) - before.get("calls", 0),
+        cost=after.get("cost", 0.0) - before.get("cost", 0.0),
+        latency_s=after.get("latency_s", 0.0) - before.get("latency_s", 0.0),
+    )
+
+
+def apply_budget(callback_context, llm_request: LlmRequest) -> None:
+    """before_model_callback：会话超出预算时将请求改用最快的分级"""
+    if over_budget(callback_context.state) and llm_request.model != MODEL_TIERS["fast"]:
+        print(f"会话模型预算已用完，{callback_context.agent_name} 改用 {MODEL_TIERS['fast']}")
+        llm_request.model = MODEL_TIERS["fast"]
+    return None
+
+
+def record_model_usage(callback_context, llm_response: LlmResponse) -> None:
+    """after_model_callback：按token数和模型耗时累加会话的模型用量"""
+    if llm_response.partial:
+        return None
+    metadata = llm_response.custom_metadata or {}
+    usage = llm_response.usage_metadata
+    input_price, output_price = MODEL_PRICES.get(metadata.get("model", ""), (0.0, 0.0))
+    cost = 0.0
+    if usage:
+        cost = ((usage.prompt_token_count or 0) * input_price
+                + (usage.candidates_token_count or 0) * output_price) / 1e6
+    add_model_usage(callback_context.state, calls=1, cost=cost, latency_s=metadata.get("latency_s", 0.0))
+    return None
+
+
+class TieredLlm(BaseLlm):
+    """
+    分级路由的模型
+
+    按请求中的模型名（回调可能已按步骤开销或预算改为其他分级）创建并复用对应的
+    模型实例。等待首个响应超过所在分级的超时时间（MODEL_TIMEOUTS）时改用低一级的模型重试，
+    已经开始输出的响应不再重试。
+    最终响应的custom_metadata中记录实际使用的模型和耗时。
+
+    stream_responses为True时始终向模型请求流式输出。框架在非流式运行时（例如作为
+    AgentTool调用时）同样会把部分响应交给after_model_callback，只是不作为事件输出，
+    回调因此可以在完整响应到达前处理已生成的内容。
+    """
+
+    stream_responses: bool = False
+
+    @staticmethod
+    def resolve(model: str) -> BaseLlm:
+        llm = _llms.get(model)
+        if llm is None:
+            from google.adk.models.registry import LLMRegistry
+            llm = _llms[model] = LLMRegistry.new_llm(model)
+        return llm
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        model = llm_request.model or self.model
+        stream = stream or self.stream_responses
+        while True:
+            llm_request.model = model
+            fallback = fallback_model(model)
+            timeout = timeout_for(model) if fallback else 0
+            started = time.monotonic()
+            responses = self.resolve(model).generate_content_async(llm_request, stream=stream)
+            try:
+                llm_response = await asyncio.wait_for(responses.__anext__(), timeout or None)
+            except asyncio.TimeoutError:
+                await responses.aclose()
+                print(f"模型 {model} 超过 {timeout:g} 秒未响应，改用 {fallback}")
+                model = fallback
+                continue
+            except StopAsyncIteration:
+                return
+            break
+
+        while True:
+            if not llm_response.partial:
+                llm_response.custom_metadata = {
+                    **(llm_response.custom_metadata or {}),
+                    "model": model,
+                    "latency_s": time.monotonic() - started,
+                }
+            yield llm_response
+            try:
+                llm_response = await responses.__anext__()
+            except StopAsyncIteration:
+                return
+
+    def connect(self, llm_request: LlmRequest):
+        return self.resolve(llm_request.model or self.model).connect(llm_request)
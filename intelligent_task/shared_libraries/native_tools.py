@@ -0,0 +1,674 @@
+"""
+进程内原生工具 - 以异步Python实现time、filesystem、fetch和sequential-thinking服务的工具，工具名和参数与对应的MCP服务一致
+"""
+
+import asyncio
+import fnmatch
+import json
+import mmap
+import os
+import shutil
+import weakref
+from collections import OrderedDict
+from datetime import datetime
+from html.parser import HTMLParser
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.base_toolset import BaseToolset
+from google.genai import types
+
+# 文件系统工具允许访问的目录，多个目录用系统路径分隔符分隔。与filesystem MCP服务一样必须显式配置，
+# 未配置时文件系统工具一律返回错误
+FILESYSTEM_ALLOWED_DIRS = [
+    os.path.realpath(os.path.expanduser(path))
+    for path in os.getenv("FILESYSTEM_ALLOWED_DIRS", "").split(os.pathsep) if path
+]
+
+# 单次读取文件返回的最大字节数，更大的文件只返回开头部分，可通过head/tail分段读取
+FILESYSTEM_MAX_READ_BYTES = int(os.getenv("FILESYSTEM_MAX_READ_BYTES", str(1024 * 1024)))
+
+# directory_tree和search_files返回的最大条目数
+FILESYSTEM_MAX_ENTRIES = int(os.getenv("FILESYSTEM_MAX_ENTRIES", "1000"))
+
+# 网页获取的超时时间（秒）、连接池大小和单个响应读取的最大字节数
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "30"))
+FETCH_MAX_CONNECTIONS = int(os.getenv("FETCH_MAX_CONNECTIONS", "20"))
+FETCH_MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", str(5 * 1024 * 1024)))
+FETCH_USER_AGENT = os.getenv("FETCH_USER_AGENT", "Mozilla/5.0 (compatible; IntelligentTaskAgent/1.0)")
+
+# 内存中最多保留思考历史的会话数，超过后丢弃最久未使用的会话
+SEQUENTIAL_THINKING_MAX_SESSIONS = int(os.getenv("SEQUENTIAL_THINKING_MAX_SESSIONS", "1000"))
+
+_STRING = types.Schema(type=types.Type.STRING)
+
+
+def _parameters(required: List[str], **properties: types.Schema) -> types.Schema:
+    return types.Schema(type=types.Type.OBJECT, properties=properties, required=required)
+
+
+def _string(description: str) -> types.Schema:
+    return types.Schema(type=types.Type.STRING, description=description)
+
+
+def _integer(description: str) -> types.Schema:
+    return types.Schema(type=types.Type.INTEGER, description=description)
+
+
+def _boolean(description: str) -> types.Schema:
+    return types.Schema(type=types.Type.BOOLEAN, description=description)
+
+
+class ToolError(Exception):
+    """工具调用失败，错误信息作为工具结果返回给模型"""
+
+
+class NativeTool(BaseTool):
+    """
+    进程内实现的工具
+
+    返回与MCP工具调用结果相同的结构 {"content": [...], "isError": bool}，
+    因此工具调用缓存和结果处理不需要区分原生工具和MCP工具。
+    with_context为True时，工具函数的第一个参数是tool_context
+    """
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        parameters: Optional[types.Schema],
+        func: Callable[..., Awaitable[str]],
+        with_context: bool = False,
+    ):
+        super().__init__(name=name, description=description)
+        self.parameters = parameters
+        self.func = func
+        self.with_context = with_context
+
+    def _get_declaration(self) -> Optional[types.FunctionDeclaration]:
+        return types.FunctionDeclaration(name=self.name, description=self.description, parameters=self.parameters)
+
+    async def run_async(self, *, args: Dict[str, Any], tool_context) -> Any:
+        try:
+            if self.with_context:
+                text = await self.func(tool_context, **(args or {}))
+            else:
+                text = await self.func(**(args or {}))
+        except (ToolError, OSError, ValueError, TypeError) as e:
+            return {"content": [{"type": "text", "text": f"Error: {e}"}], "isError": True}
+        return {"content": [{"type": "text", "text": text}], "isError": False}
+
+
+class NativeToolset(BaseToolset):
+    """一组进程内工具，close时释放工具持有的资源"""
+
+    def __init__(self, tools: List[NativeTool], on_close: Optional[Callable[[], Awaitable[None]]] = None):
+        super().__init__()
+        self.tools = tools
+        self.on_close = on_close
+
+    async def get_tools(self, readonly_context=None) -> List[BaseTool]:
+        return list(self.tools)
+
+    async def close(self) -> None:
+        if self.on_close is not None:
+            await self.on_close()
+
+
+# ---------------------------------------------------------------- time
+
+
+def _zone(name: str):
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ToolError(f"无效的时区: {name}")
+
+
+def _time_result(timezone: str, moment: datetime) -> Dict[str, Any]:
+    return {"timezone": timezone, "datetime": moment.isoformat(timespec="seconds"), "is_dst": bool(moment.dst())}
+
+
+async def get_current_time(timezone: str) -> str:
+    return json.dumps(_time_result(timezone, datetime.now(_zone(timezone))), ensure_ascii=False, indent=2)
+
+
+async def convert_time(source_timezone: str, time: str, target_timezone: str) -> str:
+    source_zone, target_zone = _zone(source_timezone), _zone(target_timezone)
+    try:
+        hour, minute = (int(value) for value in time.split(":"))
+        source = datetime.now(source_zone).replace(hour=hour, minute=minute, second=0, microsecond=0)
+    except ValueError:
+        raise ToolError("时间格式无效，应为24小时制的HH:MM")
+    target = source.astimezone(target_zone)
+    hours = (target.utcoffset() - source.utcoffset()).total_seconds() / 3600
+    return json.dumps({
+        "source": _time_result(source_timezone, source),
+        "target": _time_result(target_timezone, target),
+        "time_difference": f"{hours:+.1f}h",
+    }, ensure_ascii=False, indent=2)
+
+
+def create_time_toolset() -> NativeToolset:
+    return NativeToolset([
+        NativeTool(
+            "get_current_time",
+            "获取指定时区的当前时间",
+            _parameters(["timezone"], timezone=_string("IANA时区名，例如 'Asia/Shanghai'、'America/New_York'")),
+            get_current_time,
+        ),
+        NativeTool(
+            "convert_time",
+            "在两个时区之间转换时间",
+            _parameters(
+                ["source_timezone", "time", "target_timezone"],
+                source_timezone=_string("源时区的IANA时区名"),
+                time=_string("要转换的时间，24小时制 HH:MM"),
+                target_timezone=_string("目标时区的IANA时区名"),
+            ),
+            convert_time,
+        ),
+    ])
+
+
+# ---------------------------------------------------------------- filesystem
+
+
+def _resolve(path: str) -> str:
+    """解析路径并检查是否位于允许访问的目录中，相对路径相对于第一个允许的目录"""
+    if not FILESYSTEM_ALLOWED_DIRS:
+        raise ToolError("没有配置允许访问的目录，请通过环境变量FILESYSTEM_ALLOWED_DIRS指定")
+    path = os.path.expanduser(path)
+    if not os.path.isabs(path):
+        path = os.path.join(FILESYSTEM_ALLOWED_DIRS[0], path)
+    real = os.path.realpath(path)
+    for allowed in FILESYSTEM_ALLOWED_DIRS:
+        if real == allowed or real.startswith(allowed + os.sep):
+            return real
+    raise ToolError(f"拒绝访问，路径不在允许的目录中: {path}")
+
+
+def _decode(view) -> str:
+    return str(view, "utf-8", "replace")
+
+
+def _read_text(path: str, head: Optional[int] = None, tail: Optional[int] = None) -> str:
+    """
+    通过mmap读取文本文件
+
+    直接从映射的内存解码，不先复制整个文件；head/tail只扫描需要的行，
+    超过FILESYSTEM_MAX_READ_BYTES的文件只返回开头部分
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return ""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                start, end = 0, size
+                if head is not None:
+                    end = 0
+                    for _ in range(max(0, head)):
+                        newline = mm.find(b"\n", end)
+                        if newline < 0:
+                            end = size
+                            break
+                        end = newline + 1
+                elif tail is not None:
+                    start = size - 1 if mm[size - 1:size] == b"\n" else size
+                    for _ in range(max(0, tail)):
+                        newline = mm.rfind(b"\n", 0, start)
+                        start = newline if newline >= 0 else -1
+                        if start < 0:
+                            break
+                    start += 1
+                truncated = end - start > FILESYSTEM_MAX_READ_BYTES
+                text = _decode(view[start:min(end, start + FILESYSTEM_MAX_READ_BYTES)])
+            finally:
+                view.release()
+    if truncated:
+        text += f"\n\n[文件共 {size} 字节，只返回了前 {FILESYSTEM_MAX_READ_BYTES} 字节，可使用head或tail参数分段读取]"
+    return text
+
+
+async def read_file(path: str, head: Optional[int] = None, tail: Optional[int] = None) -> str:
+    if head is not None and tail is not None:
+        raise ToolError("head和tail参数不能同时使用")
+    return await asyncio.to_thread(_read_text, _resolve(path), head, tail)
+
+
+async def read_multiple_files(paths: List[str]) -> str:
+    async def read_one(path: str) -> str:
+        try:
+            return f"{path}:\n{await read_file(path)}\n"
+        except (ToolError, OSError) as e:
+            return f"{path}: Error - {e}"
+
+    return "\n---\n".join(await asyncio.gather(*(read_one(path) for path in paths)))
+
+
+def _write(path: str, content: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+async def write_file(path: str, content: str) -> str:
+    await asyncio.to_thread(_write, _resolve(path), content)
+    return f"Successfully wrote to {path}"
+
+
+async def edit_file(path: str, edits: List[Dict[str, str]], dryRun: bool = False) -> str:
+    import difflib
+
+    real = _resolve(path)
+    original = await asyncio.to_thread(_read_text, real)
+    modified = original
+    for edit in edits:
+        old_text, new_text = edit.get("oldText", ""), edit.get("newText", "")
+        if old_text not in modified:
+            raise ToolError(f"找不到要替换的内容:\n{old_text}")
+        modified = modified.replace(old_text, new_text, 1)
+    diff = "".join(difflib.unified_diff(
+        original.splitlines(keepends=True), modified.splitlines(keepends=True), path, path,
+    ))
+    if not dryRun:
+        await asyncio.to_thread(_write, real, modified)
+    return f"```diff\n{diff}```"
+
+
+async def create_directory(path: str) -> str:
+    await asyncio.to_thread(os.makedirs, _resolve(path), exist_ok=True)
+    return f"Successfully created directory {path}"
+
+
+def _list_directory(path: str) -> str:
+    with os.scandir(path) as entries:
+        lines = [
+            f"{'[DIR]' if entry.is_dir() else '[FILE]'} {entry.name}"
+            for entry in sorted(entries, key=lambda entry: entry.name)
+        ]
+    return "\n".join(lines)
+
+
+async def list_directory(path: str) -> str:
+    return await asyncio.to_thread(_list_directory, _resolve(path))
+
+
+def _directory_tree(path: str) -> list:
+    count = 0
+
+    def walk(directory: str) -> list:
+        nonlocal count
+        tree = []
+        with os.scandir(directory) as entries:
+            for entry in sorted(entries, key=lambda entry: entry.name):
+                count += 1
+                if count > FILESYSTEM_MAX_ENTRIES:
+                    break
+                if entry.is_dir(follow_symlinks=False):
+                    tree.append({"name": entry.name, "type": "directory", "children": walk(entry.path)})
+                else:
+                    tree.append({"name": entry.name, "type": "file"})
+        return tree
+
+    return walk(path)
+
+
+async def directory_tree(path: str) -> str:
+    tree = await asyncio.to_thread(_directory_tree, _resolve(path))
+    return json.dumps(tree, ensure_ascii=False, indent=2)
+
+
+async def move_file(source: str, destination: str) -> str:
+    real_source, real_destination = _resolve(source), _resolve(destination)
+    if os.path.exists(real_destination):
+        raise ToolError(f"目标已存在: {destination}")
+    await asyncio.to_thread(shutil.move, real_source, real_destination)
+    return f"Successfully moved {source} to {destination}"
+
+
+def _search_files(root: str, pattern: str, exclude_patterns: List[str]) -> str:
+    pattern = pattern.lower()
+    results = []
+    for directory, dirnames, filenames in os.walk(root):
+        relative_dir = os.path.relpath(directory, root)
+        dirnames[:] = [
+            name for name in dirnames
+            if not any(fnmatch.fnmatch(os.path.join(relative_dir, name), exclude) for exclude in exclude_patterns)
+        ]
+        for name in dirnames + filenames:
+            if pattern in name.lower():
+                results.append(os.path.join(directory, name))
+                if len(results) >= FILESYSTEM_MAX_ENTRIES:
+                    return "\n".join(results)
+    return "\n".join(results) or "No matches found"
+
+
+async def search_files(path: str, pattern: str, excludePatterns: Optional[List[str]] = None) -> str:
+    return await asyncio.to_thread(_search_files, _resolve(path), pattern, excludePatterns or [])
+
+
+async def get_file_info(path: str) -> str:
+    real = _resolve(path)
+    info = await asyncio.to_thread(os.stat, real)
+    return "\n".join([
+        f"size: {info.st_size}",
+        f"created: {datetime.fromtimestamp(info.st_ctime).isoformat()}",
+        f"modified: {datetime.fromtimestamp(info.st_mtime).isoformat()}",
+        f"accessed: {datetime.fromtimestamp(info.st_atime).isoformat()}",
+        f"isDirectory: {os.path.isdir(real)}",
+        f"isFile: {os.path.isfile(real)}",
+        f"permissions: {oct(info.st_mode)[-3:]}",
+    ])
+
+
+async def list_allowed_directories() -> str:
+    if not FILESYSTEM_ALLOWED_DIRS:
+        raise ToolError("没有配置允许访问的目录，请通过环境变量FILESYSTEM_ALLOWED_DIRS指定")
+    return "Allowed directories:\n" + "\n".join(FILESYSTEM_ALLOWED_DIRS)
+
+
+def create_filesystem_toolset() -> NativeToolset:
+    path = _string("文件或目录路径")
+    read_parameters = _parameters(
+        ["path"],
+        path=path,
+        head=_integer("只返回文件开头的N行"),
+        tail=_integer("只返回文件末尾的N行"),
+    )
+    edit = types.Schema(
+        type=types.Type.OBJECT,
+        properties={"oldText": _string("要替换的原文本，需完全一致"), "newText": _string("替换后的文本")},
+        required=["oldText", "newText"],
+    )
+    return NativeToolset([
+        NativeTool("read_file", "读取文本文件的完整内容", read_parameters, read_file),
+        NativeTool("read_text_file", "读取文本文件的完整内容", read_parameters, read_file),
+        NativeTool(
+            "read_multiple_files",
+            "同时读取多个文件的内容，单个文件读取失败不影响其他文件",
+            _parameters(["paths"], paths=types.Schema(type=types.Type.ARRAY, items=_STRING)),
+            read_multiple_files,
+        ),
+        NativeTool(
+            "write_file",
+            "创建新文件或覆盖已有文件",
+            _parameters(["path", "content"], path=path, content=_string("文件内容")),
+            write_file,
+        ),
+        NativeTool(
+            "edit_file",
+            "按行替换文件中的文本，返回git风格的差异",
+            _parameters(
+                ["path", "edits"],
+                path=path,
+                edits=types.Schema(type=types.Type.ARRAY, items=edit),
+                dryRun=_boolean("只预览差异，不写入文件"),
+            ),
+            edit_file,
+        ),
+        NativeTool("create_directory", "创建目录，包括不存在的上级目录", _parameters(["path"], path=path), create_directory),
+        NativeTool("list_directory", "列出目录中的文件和子目录", _parameters(["path"], path=path), list_directory),
+        NativeTool("directory_tree", "以JSON树形结构返回目录的递归内容", _parameters(["path"], path=path), directory_tree),
+        NativeTool(
+            "move_file",
+            "移动或重命名文件和目录",
+            _parameters(["source", "destination"], source=_string("源路径"), destination=_string("目标路径")),
+            move_file,
+        ),
+        NativeTool(
+            "search_files",
+            "在目录中递归查找名称包含指定文本的文件和目录",
+            _parameters(
+                ["path", "pattern"],
+                path=path,
+                pattern=_string("名称中包含的文本，不区分大小写"),
+                excludePatterns=types.Schema(type=types.Type.ARRAY, items=_STRING),
+            ),
+            search_files,
+        ),
+        NativeTool("get_file_info", "获取文件或目录的元数据", _parameters(["path"], path=path), get_file_info),
+        NativeTool("list_allowed_directories", "列出允许访问的目录", None, list_allowed_directories),
+    ])
+
+
+# ---------------------------------------------------------------- fetch
+
+
+class _TextExtractor(HTMLParser):
+    """从HTML中提取正文文本，跳过脚本、样式等不可见内容"""
+
+    SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "head"}
+    BLOCK_TAGS = {
+        "p", "div", "br", "li", "ul", "ol", "tr", "table", "section", "article",
+        "h1", "h2", "h3", "h4", "h5", "h6", "pre", "blockquote", "header", "footer",
+    }
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+
+def html_to_text(html: str) -> str:
+    """将HTML转换为去掉标签的正文文本"""
+    extractor = _TextExtractor()
+    extractor.feed(html)
+    extractor.close()
+    lines = (" ".join(line.split()) for line in "".join(extractor.parts).splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+class HttpClientPool:
+    """按事件循环复用的keep-alive HTTP客户端"""
+
+    def __init__(self):
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+
+    def get(self):
+        # HTTP客户端只在真正获取网页时才需要
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            client = self._clients[loop] = httpx.AsyncClient(
+                timeout=FETCH_TIMEOUT,
+                follow_redirects=True,
+                headers={"User-Agent": FETCH_USER_AGENT},
+                limits=httpx.Limits(max_connections=FETCH_MAX_CONNECTIONS, max_keepalive_connections=FETCH_MAX_CONNECTIONS),
+            )
+        return client
+
+    async def close(self) -> None:
+        loop = asyncio.get_running_loop()
+        client = self._clients.pop(loop, None)
+        if client is not None:
+            await client.aclose()
+
+
+http_clients = HttpClientPool()
+
+
+async def fetch(url: str, max_length: int = 5000, start_index: int = 0, raw: bool = False) -> str:
+    import httpx
+
+    body = bytearray()
+    try:
+        async with http_clients.get().stream("GET", url) as response:
+            if response.status_code >= 400:
+                raise ToolError(f"获取 {url} 失败，状态码 {response.status_code}")
+            async for chunk in response.aiter_bytes():
+                body += chunk
+                if len(body) >= FETCH_MAX_BYTES:
+                    break
+            content_type = response.headers.get("content-type", "")
+            encoding = response.encoding or "utf-8"
+    except httpx.HTTPError as e:
+        raise ToolError(f"获取 {url} 失败: {e}")
+
+    text = body.decode(encoding, "replace")
+    if not raw and ("text/html" in content_type or text.lstrip()[:100].lower().startswith(("<!doctype html", "<html"))):
+        text = html_to_text(text)
+    content = text[start_index:start_index + max_length]
+    if not content and start_index:
+        return "<error>没有更多内容</error>"
+    next_index = start_index + len(content)
+    if next_index < len(text):
+        content += f"\n\n<error>内容已截断，请以start_index={next_index}再次调用fetch获取后续内容</error>"
+    return f"Contents of {url}:\n{content}"
+
+
+def create_fetch_toolset() -> NativeToolset:
+    return NativeToolset(
+        [
+            NativeTool(
+                "fetch",
+                "获取网址的内容，网页会被转换为正文文本。内容较长时可通过start_index分段获取",
+                _parameters(
+                    ["url"],
+                    url=_string("要获取的网址"),
+                    max_length=_integer("返回的最大字符数，默认5000"),
+                    start_index=_integer("从第几个字符开始返回，默认0"),
+                    raw=_boolean("返回原始内容，不转换HTML"),
+                ),
+                fetch,
+            ),
+        ],
+        on_close=http_clients.close,
+    )
+
+
+# ---------------------------------------------------------------- sequential-thinking
+
+
+class ThoughtHistory:
+    """一个会话的思考历史，以及按分支ID记录的分支思考"""
+
+    __slots__ = ("thoughts", "branches")
+
+    def __init__(self):
+        self.thoughts: List[Dict[str, Any]] = []
+        self.branches: Dict[str, List[Dict[str, Any]]] = {}
+
+
+class SequentialThinking:
+    """
+    顺序思考引擎
+
+    与sequential-thinking MCP服务的sequentialthinking工具契约一致：记录每一步思考，
+    支持修订之前的思考和从某一步开始分支，思考步数超过预计总数时自动调大总数。
+    思考历史按会话保存在内存中，不启动子进程。
+    """
+
+    def __init__(self, max_sessions: int = SEQUENTIAL_THINKING_MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, ThoughtHistory]" = OrderedDict()
+
+    def history(self, session_id: str) -> ThoughtHistory:
+        """获取会话的思考历史，不存在时创建"""
+        history = self._sessions.get(session_id)
+        if history is None:
+            history = self._sessions[session_id] = ThoughtHistory()
+            while self.max_sessions and len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(session_id)
+        return history
+
+    def clear(self, session_id: str) -> None:
+        self._sessions.pop(session_id, None)
+
+    def process(self, session_id: str, thought: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        记录一步思考
+
+        Raises:
+            ToolError: 必填参数缺失或类型不正确
+        """
+        if not isinstance(thought.get("thought"), str) or not thought["thought"]:
+            raise ToolError("thought必须是非空字符串")
+        for field in ("thoughtNumber", "totalThoughts"):
+            if not isinstance(thought.get(field), int) or thought[field] < 1:
+                raise ToolError(f"{field}必须是正整数")
+        if not isinstance(thought.get("nextThoughtNeeded"), bool):
+            raise ToolError("nextThoughtNeeded必须是布尔值")
+
+        thought = dict(thought)
+        if thought["thoughtNumber"] > thought["totalThoughts"]:
+            thought["totalThoughts"] = thought["thoughtNumber"]
+
+        history = self.history(session_id)
+        history.thoughts.append(thought)
+        if thought.get("branchFromThought") and thought.get("branchId"):
+            history.branches.setdefault(thought["branchId"], []).append(thought)
+
+        return {
+            "thoughtNumber": thought["thoughtNumber"],
+            "totalThoughts": thought["totalThoughts"],
+            "nextThoughtNeeded": thought["nextThoughtNeeded"],
+            "branches": list(history.branches),
+            "thoughtHistoryLength": len(history.thoughts),
+        }
+
+
+# 进程级共享的顺序思考引擎
+sequential_thinking = SequentialThinking()
+
+
+async def sequentialthinking(tool_context, **thought: Any) -> str:
+    session_id = tool_context.session.id
+    return json.dumps(sequential_thinking.process(session_id, thought), ensure_ascii=False, indent=2)
+
+
+def create_sequential_thinking_toolset() -> NativeToolset:
+    return NativeToolset([
+        NativeTool(
+            "sequentialthinking",
+            "通过逐步思考分析和解决问题。每次调用记录一步思考，可以随着理解加深调整预计的总步数、"
+            "修订之前的思考（isRevision、revisesThought）或从某一步开始另一条思路（branchFromThought、branchId），"
+            "直到得出满意的答案时将nextThoughtNeeded设为false",
+            _parameters(
+                ["thought", "nextThoughtNeeded", "thoughtNumber", "totalThoughts"],
+                thought=_string("当前这一步的思考内容"),
+                nextThoughtNeeded=_boolean("是否还需要下一步思考"),
+                thoughtNumber=_integer("当前思考的序号，从1开始"),
+                totalThoughts=_integer("预计需要的思考步数，可以随时调整"),
+                isRevision=_boolean("这一步是否修订之前的思考"),
+                revisesThought=_integer("被修订的思考序号"),
+                branchFromThought=_integer("分支起点的思考序号"),
+                branchId=_string("分支ID"),
+                needsMoreThoughts=_boolean("已到预计步数但还需要更多思考"),
+            ),
+            sequentialthinking,
+            with_context=True,
+        ),
+    ])
+
+
+# 有进程内实现的服务
+NATIVE_TOOLSETS: Dict[str, Callable[[], NativeToolset]] = {
+    "time": create_time_toolset,
+    "filesystem": create_filesystem_toolset,
+    "fetch": create_fetch_toolset,
+    "sequential-thinking": create_sequential_thinking_toolset,
+}
@@ -0,0 +1,135 @@
+"""
+任务计划解析器 - 增量解析拆解结果中的"## 执行步骤"，支持流式输出的部分响应
+"""
+
+import asyncio
+import re
+from typing import List, Optional
+
+from .task_store import TaskRecord
+
+STEPS_HEADER = "## 执行步骤"
+
+# 步骤行格式: "1. **步骤标题**: 步骤描述"
+STEP_PATTERN = re.compile(r'\d+\.\s*\*\*([^*]+)\*\*:\s*([^\n]+)')
+
+# 步骤描述末尾的依赖标注，例如 "（依赖: 1, 2）" 或 "(依赖：无)"
+DEPENDS_ON_PATTERN = re.compile(r'[（(]\s*依赖\s*[:：]\s*([^）)]*)[）)]\s*$')
+
+
+def parse_step_dependencies(step_id: int, step_description: str):
+    """
+    解析步骤描述中的依赖标注
+
+    Args:
+        step_id: 当前步骤编号
+        step_description: 步骤描述文本
+
+    Returns:
+        (去除依赖标注后的描述, 依赖的步骤ID列表)。未标注依赖时默认依赖上一步骤，
+        保持原有的顺序执行语义
+    """
+    match = DEPENDS_ON_PATTERN.search(step_description)
+    if not match:
+        return step_description, ([step_id - 1] if step_id > 1 else [])
+
+    depends_on = [
+        int(dep) for dep in re.findall(r'\d+', match.group(1))
+        if 0 < int(dep) < step_id
+    ]
+    return step_description[:match.start()].strip(), sorted(set(depends_on))
+
+
+class IncrementalPlanParser:
+    """
+    增量任务计划解析器
+
+    按文本片段输入，每当一行步骤文本完整后立即解析出对应的任务，已处理的
+    文本不会被重复扫描。
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._in_steps = False
+        self.received_text = False
+        self.tasks: List[TaskRecord] = []
+
+    def feed(self, chunk: str) -> List[TaskRecord]:
+        """
+        输入一段新的文本
+
+        Returns:
+            本次新解析出的任务
+        """
+        if chunk:
+            self.received_text = True
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split("\n")
+        new_tasks: List[TaskRecord] = []
+        for line in lines:
+            new_tasks.extend(self._parse_line(line))
+        return new_tasks
+
+    def finish(self) -> List[TaskRecord]:
+        """文本结束，解析最后一行未以换行结尾的内容"""
+        line, self._buffer = self._buffer, ""
+        return self._parse_line(line)
+
+    def _parse_line(self, line: str) -> List[TaskRecord]:
+        if not self._in_steps:
+            header = line.find(STEPS_HEADER)
+            if header == -1:
+                return []
+            self._in_steps = True
+            line = line[header + len(STEPS_HEADER):]
+
+        new_tasks = []
+        for step_title, step_description in STEP_PATTERN.findall(line):
+            task_id = len(self.tasks) + 1
+            description, depends_on = parse_step_dependencies(task_id, step_description.strip())
+            task = TaskRecord(
+                id=task_id,
+                title=step_title.strip(),
+                description=description,
+                depends_on=depends_on,  # 依赖的步骤ID列表
+                status="pending",  # 初始状态为待完成
+            )
+            self.tasks.append(task)
+            new_tasks.append(task)
+        return new_tasks
+
+
+class PlanStream:
+    """
+    任务步骤流
+
+    拆解agent每解析出一个步骤就推送到流中，调度器可以边接收步骤边执行，
+    不必等待整个计划输出完毕。
+    """
+
+    def __init__(self):
+        self.closed = False
+        self._queue: "asyncio.Queue[Optional[TaskRecord]]" = asyncio.Queue()
+
+    def push(self, task: Optional[TaskRecord]) -> None:
+        """推送一个步骤，task为None表示计划已输出完毕"""
+        if not self.closed:
+            self._queue.put_nowait(task)
+
+    async def next(self) -> Optional[TaskRecord]:
+        """等待下一个步骤，计划输出完毕后返回None"""
+        if self.closed:
+            return None
+        task = await self._queue.get()
+        if task is None:
+            self.closed = True
+        return task
+
+    def next_nowait(self) -> Optional[TaskRecord]:
+        """获取已到达的下一个步骤，没有已到达的步骤或计划已结束时返回None"""
+        if self.closed or self._queue.empty():
+            return None
+        task = self._queue.get_nowait()
+        if task is None:
+            self.closed = True
+        return task
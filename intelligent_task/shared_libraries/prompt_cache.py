@@ -0,0 +1,125 @@
+"""
+提示词缓存 - 静态指令前缀的显式上下文缓存配置，以及按agent统计提示词token
+"""
+
+import json
+import os
+from typing import Dict
+
+from .execution_context import estimate_tokens
+
+# 显式上下文缓存的有效期（秒），设为0时不创建显式缓存，只依赖模型服务的隐式前缀缓存
+CONTEXT_CACHE_TTL = int(os.getenv("CONTEXT_CACHE_TTL", "0"))
+
+# 上一次请求的提示词token数达到该值才创建显式缓存，Gemini 2.5要求至少2048个token
+CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("CONTEXT_CACHE_MIN_TOKENS", "2048"))
+
+# 同一个显式缓存最多被复用的调用次数，超过后重新创建
+CONTEXT_CACHE_INTERVALS = int(os.getenv("CONTEXT_CACHE_INTERVALS", "10"))
+
+
+def context_cache_config():
+    """显式上下文缓存配置，未启用时返回None"""
+    if CONTEXT_CACHE_TTL <= 0:
+        return None
+    from google.adk.agents.context_cache_config import ContextCacheConfig
+    return ContextCacheConfig(
+        ttl_seconds=CONTEXT_CACHE_TTL,
+        min_tokens=CONTEXT_CACHE_MIN_TOKENS,
+        cache_intervals=min(100, max(1, CONTEXT_CACHE_INTERVALS)),
+    )
+
+
+def create_agent_app(name: str, agent):
+    """创建带显式上下文缓存配置的App，供Runner使用"""
+    from google.adk.apps import App
+    return App(name=name, root_agent=agent, context_cache_config=context_cache_config())
+
+
+def _content_tokens(content) -> int:
+    tokens = 0
+    for part in (content.parts or []) if content else []:
+        if part.text:
+            tokens += estimate_tokens(part.text)
+        elif part.function_call:
+            tokens += estimate_tokens(json.dumps(part.function_call.args or {}, ensure_ascii=False, default=str))
+        elif part.function_response:
+            tokens += estimate_tokens(json.dumps(part.function_response.response or {}, ensure_ascii=False, default=str))
+    return tokens
+
+
+class PromptTokenStats:
+    """
+    按agent统计的提示词token
+
+    本地估算每次请求中静态系统指令和其余内容（动态指令、对话历史、工具结果）的
+    token数，并记录模型服务返回的实际提示词token数和命中缓存的token数
+    """
+
+    FIELDS = ("requests", "static_tokens", "dynamic_tokens", "prompt_tokens", "cached_tokens", "completion_tokens")
+
+    def __init__(self):
+        self.agents: Dict[str, Dict[str, int]] = {}
+
+    def _stats(self, agent_name: str) -> Dict[str, int]:
+        return self.agents.setdefault(agent_name, dict.fromkeys(self.FIELDS, 0))
+
+    def record_request(self, agent_name: str, static_tokens: int, dynamic_tokens: int) -> None:
+        stats = self._stats(agent_name)
+        stats["requests"] += 1
+        stats["static_tokens"] += static_tokens
+        stats["dynamic_tokens"] += dynamic_tokens
+
+    def record_usage(self, agent_name: str, prompt_tokens: int, cached_tokens: int, completion_tokens: int) -> None:
+        stats = self._stats(agent_name)
+        stats["prompt_tokens"] += prompt_tokens
+        stats["cached_tokens"] += cached_tokens
+        stats["completion_tokens"] += completion_tokens
+
+    def reset(self) -> None:
+        self.agents.clear()
+
+    def format_report(self) -> str:
+        """生成按agent统计的提示词token报告"""
+        lines = ["agent                          请求数   静态指令   动态内容   实际提示词   缓存命中   输出"]
+        for agent_name, stats in sorted(self.agents.items()):
+            cached_ratio = stats["cached_tokens"] / stats["prompt_tokens"] if stats["prompt_tokens"] else 0.0
+            lines.append(
+                f"{agent_name:<30} {stats['requests']:>6} {stats['static_tokens']:>10} {stats['dynamic_tokens']:>10} "
+                f"{stats['prompt_tokens']:>12} {stats['cached_tokens']:>8}({cached_ratio:4.0%}) {stats['completion_tokens']:>6}"
+            )
+        return "\n".join(lines)
+
+
+# 进程级提示词token统计
+prompt_token_stats = PromptTokenStats()
+
+
+def account_prompt_tokens(callback_context, llm_request) -> None:
+    """
+    before_model_callback：估算请求中静态系统指令和其余内容的token数
+
+    需放在缓存、路由等回调之后，被缓存等回调直接返回的请求不计入
+    """
+    system_instruction = llm_request.config.system_instruction if llm_request.config else None
+    if isinstance(system_instruction, str):
+        static_tokens = estimate_tokens(system_instruction)
+    else:
+        static_tokens = _content_tokens(system_instruction)
+    dynamic_tokens = sum(_content_tokens(content) for content in llm_request.contents)
+    prompt_token_stats.record_request(callback_context.agent_name, static_tokens, dynamic_tokens)
+    return None
+
+
+def account_usage_tokens(callback_context, llm_response) -> None:
+    """after_model_callback：记录模型服务返回的提示词、缓存命中和输出token数"""
+    usage = llm_response.usage_metadata
+    if llm_response.partial or usage is None:
+        return None
+    prompt_token_stats.record_usage(
+        callback_context.agent_name,
+        usage.prompt_token_count or 0,
+        usage.cached_content_token_count or 0,
+        usage.candidates_token_count or 0,
+    )
+    return None
@@ -0,0 +1,162 @@
+"""
+响应缓存 - 按归一化输入缓存任务拆解结果和简单问答，支持相似输入匹配
+"""
+
+import copy
+import hashlib
+import os
+import re
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+# 缓存条目数上限、过期时间（秒）和相似匹配阈值，可通过环境变量配置
+DEFAULT_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1000"))
+DEFAULT_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+DEFAULT_SIMILARITY_THRESHOLD = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.9"))
+# 简单问答缓存默认只做精确匹配：相似问题的答案可能不同，不能拿给其他用户
+ANSWER_SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_CACHE_SIMILARITY", "1"))
+
+_IGNORED_CHARS = re.compile(r"[\s\W_]+")
+# 改变句意的关键词：数字和否定词不同的输入即使字面相似也不视为同一请求
+_KEY_TOKENS = re.compile(r"\d+|[不没否非无别未勿莫]|\b(?:not|no|never)\b|n't")
+
+
+def normalize_text(text: str) -> str:
+    """归一化输入：转小写并去掉空白和标点"""
+    return _IGNORED_CHARS.sub("", text.lower())
+
+
+def _key_tokens(text: str) -> Tuple[str, ...]:
+    return tuple(_KEY_TOKENS.findall(text.lower()))
+
+
+def _bigrams(normalized: str) -> Set[str]:
+    if len(normalized) < 2:
+        return {normalized} if normalized else set()
+    return {normalized[i:i + 2] for i in range(len(normalized) - 1)}
+
+
+class _CacheEntry:
+    __slots__ = ("value", "expires_at", "bigrams", "key_tokens")
+
+    def __init__(self, value: Any, expires_at: float, bigrams: Set[str], key_tokens: Tuple[str, ...]):
+        self.value = value
+        self.expires_at = expires_at
+        self.bigrams = bigrams
+        self.key_tokens = key_tokens
+
+
+class ResponseCache:
+    """
+    带过期时间和LRU淘汰的响应缓存
+
+    先按归一化输入的哈希精确匹配；未命中时通过字符bigram倒排索引查找
+    Jaccard相似度不低于阈值的已缓存输入，数字或否定词不同的输入不参与相似匹配
+    （例如"3月5日"和"3月6日"、"是否可以"和"是否不可以"）。阈值设为1或以上时只做精确匹配。
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_CACHE_SIZE,
+        ttl_seconds: float = DEFAULT_CACHE_TTL,
+        similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._index: Dict[str, Set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(normalized: str) -> str:
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for bigram in entry.bigrams:
+            keys = self._index.get(bigram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._index[bigram]
+
+    def _find_similar(self, bigrams: Set[str], key_tokens: Tuple[str, ...]) -> Optional[str]:
+        if self.similarity_threshold >= 1 or not bigrams:
+            return None
+        shared = Counter()
+        for bigram in bigrams:
+            shared.update(self._index.get(bigram, ()))
+        best_key, best_score = None, self.similarity_threshold
+        for key, count in shared.items():
+            entry = self._entries[key]
+            if entry.key_tokens != key_tokens:
+                continue
+            entry_size = len(entry.bigrams)
+            score = count / (len(bigrams) + entry_size - count)
+            if score >= best_score:
+                best_key, best_score = key, score
+        return best_key
+
+    def get(self, text: str) -> Optional[Any]:
+        """
+        查找与输入相同或足够相似的缓存结果
+
+        Returns:
+            缓存值的副本，未命中时返回None
+        """
+        normalized = normalize_text(text)
+        if not normalized:
+            return None
+        key = self._key(normalized)
+        if key not in self._entries:
+            key = self._find_similar(_bigrams(normalized), _key_tokens(text))
+
+        entry = self._entries.get(key) if key else None
+        if entry is not None and entry.expires_at < time.monotonic():
+            self._remove(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return copy.deepcopy(entry.value)
+
+    def put(self, text: str, value: Any) -> None:
+        """缓存输入对应的结果，超出容量时淘汰最久未使用的条目"""
+        normalized = normalize_text(text)
+        if not normalized:
+            return
+        key = self._key(normalized)
+        self._remove(key)
+
+        bigrams = _bigrams(normalized)
+        self._entries[key] = _CacheEntry(
+            copy.deepcopy(value), time.monotonic() + self.ttl_seconds, bigrams, _key_tokens(text)
+        )
+        for bigram in bigrams:
+            self._index.setdefault(bigram, set()).add(key)
+
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self._entries.clear()
+        self._index.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# 任务拆解结果缓存：拆解请求 -> {"response_text": ..., "tasks": 任务计划行}
+decomposition_cache = ResponseCache()
+
+# 简单问答缓存：用户问题 -> 回答文本
+answer_cache = ResponseCache(similarity_threshold=ANSWER_SIMILARITY_THRESHOLD)
@@ -0,0 +1,50 @@
+"""
+步骤开销估算 - 识别可以合并到同一次执行器调用中的轻量步骤，并为步骤选择模型分级
+"""
+
+import os
+
+from .execution_context import estimate_tokens
+from .task_store import TaskRecord
+
+# 轻量步骤的标题和描述总token数上限
+LIGHT_STEP_MAX_TOKENS = int(os.getenv("LIGHT_STEP_MAX_TOKENS", "40"))
+
+# 标题和描述总token数达到该值的步骤使用最强的模型分级
+STRONG_STEP_MIN_TOKENS = int(os.getenv("STRONG_STEP_MIN_TOKENS", "200"))
+
+# 一次执行器调用最多合并的轻量步骤数，设为1时不合并
+DEFAULT_MAX_BATCH_SIZE = int(os.getenv("TASK_MAX_BATCH_SIZE", "4"))
+
+# 需要检索、多轮工具调用或较长输出的步骤，出现这些词时不视为轻量步骤
+HEAVY_STEP_KEYWORDS = (
+    "搜索", "调研", "研究", "分析", "比较", "对比", "评估", "撰写", "编写", "生成",
+    "设计", "开发", "实现", "报告", "文档", "表格", "网页", "网站", "下载", "抓取",
+    "word", "excel", "docx", "xlsx", "http",
+)
+
+
+def is_light_step(task: TaskRecord, max_tokens: int = LIGHT_STEP_MAX_TOKENS) -> bool:
+    """
+    判断步骤是否为轻量步骤，例如"获取当前时间"、"确认保存目录"
+
+    描述简短且不涉及检索、分析或生成较长内容的步骤视为轻量步骤
+    """
+    text = f"{task.title} {task.description}"
+    if estimate_tokens(text) > max_tokens:
+        return False
+    lowered = text.lower()
+    return not any(keyword in lowered for keyword in HEAVY_STEP_KEYWORDS)
+
+
+def step_tier(task: TaskRecord) -> str:
+    """
+    按步骤开销选择模型分级
+
+    轻量步骤使用最快的分级，描述很长的步骤使用最强的分级，其余使用标准分级
+    """
+    if is_light_step(task):
+        return "fast"
+    if estimate_tokens(f"{task.title} {task.description}") >= STRONG_STEP_MIN_TOKENS:
+        return "strong"
+    return "standard"
@@ -0,0 +1,66 @@
+"""
+任务执行结果 - 执行器上报的结构化任务结果记录
+"""
+
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional
+
+from .blob_store import load_text, offload_text
+
+# session.state中保存结构化任务结果的键，值为 {任务ID字符串: TaskResult字典}
+TASK_RESULTS_KEY = "task_results"
+
+TASK_RESULT_STATUSES = ("completed", "failed")
+
+# 执行器未上报结构化结果时，只有回复中明确出现这些声明才判定为失败
+EXPLICIT_FAILURE_PHRASES = ("无法完成任务", "不能完成任务")
+
+
+@dataclass
+class TaskResult:
+    """执行器通过report_task_result工具上报的任务结果"""
+
+    task_id: int
+    status: str
+    summary: str
+    failure_reason: str = ""
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为写入state的字典，较长的总结和失败原因转存到blob存储"""
+        data = asdict(self)
+        data["summary"] = offload_text(self.summary)
+        data["failure_reason"] = offload_text(self.failure_reason)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TaskResult":
+        return cls(
+            task_id=data["task_id"],
+            status=data["status"],
+            summary=load_text(data.get("summary", "")),
+            failure_reason=load_text(data.get("failure_reason", "")),
+        )
+
+
+def get_task_result(state, task_id: int) -> Optional[TaskResult]:
+    """读取指定任务的结构化结果，未上报时返回None"""
+    data = (state.get(TASK_RESULTS_KEY) or {}).get(str(task_id))
+    return TaskResult.from_dict(data) if data else None
+
+
+def save_task_result(state, result: TaskResult) -> None:
+    """保存结构化任务结果到session.state"""
+    results = dict(state.get(TASK_RESULTS_KEY) or {})
+    results[str(result.task_id)] = result.to_dict()
+    state[TASK_RESULTS_KEY] = results
+
+
+def infer_status_from_text(response_text: str) -> str:
+    """
+    执行器没有上报结构化结果时的回退判断
+
+    只识别明确的无法完成声明，避免解释文字中出现"失败"等字样时误判
+    """
+    if any(phrase in response_text for phrase in EXPLICIT_FAILURE_PHRASES):
+        return "failed"
+    return "completed"
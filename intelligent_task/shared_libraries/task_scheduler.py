@@ -0,0 +1,180 @@
+"""
+任务调度器 - 按依赖关系(DAG)并发调度任务列表
+"""
+
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from .plan_parser import PlanStream
+from .step_cost import DEFAULT_MAX_BATCH_SIZE, is_light_step
+from .task_store import TaskRecord, TaskStore
+from .tracing import tracer
+
+# 同时执行的任务数上限，可通过环境变量 TASK_MAX_CONCURRENCY 配置
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("TASK_MAX_CONCURRENCY", "4"))
+
+FINISHED_STATUSES = ("completed", "failed")
+
+
+class TaskScheduler:
+    """基于依赖关系的并发任务调度器"""
+
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY, max_batch_size: int = DEFAULT_MAX_BATCH_SIZE):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_batch_size = max(1, max_batch_size)
+
+    def _collect_batch(
+        self,
+        store: TaskStore,
+        first: TaskRecord,
+        is_light: Callable[[TaskRecord], bool],
+        unbatchable: Set[int],
+    ) -> List[TaskRecord]:
+        """
+        从一个可执行的轻量任务开始，合并其他轻量的待执行任务
+
+        被合并的任务的依赖必须已完成或在同一批次中，按任务ID从小到大加入，
+        因此既能合并互相独立的小步骤，也能合并前后相连的小步骤链
+        """
+        batch = [first]
+        if self.max_batch_size == 1 or first.id in unbatchable or not is_light(first):
+            return batch
+        batch_ids = {first.id}
+        completed = {task.id for task in store.with_status("completed")}
+        added = True
+        while added and len(batch) < self.max_batch_size:
+            added = False
+            for task in store.with_status("pending"):
+                if task.id in batch_ids or task.id in unbatchable or not is_light(task):
+                    continue
+                if all(dep in completed or dep in batch_ids for dep in task.depends_on):
+                    batch.append(task)
+                    batch_ids.add(task.id)
+                    added = True
+                    if len(batch) == self.max_batch_size:
+                        break
+        return batch
+
+    async def run(
+        self,
+        store: TaskStore,
+        execute_fn: Callable[[TaskRecord], Awaitable[str]],
+        state=None,
+        plan_stream: Optional[PlanStream] = None,
+        execute_batch_fn: Optional[Callable[[List[TaskRecord]], Awaitable[Dict[int, str]]]] = None,
+        is_light: Callable[[TaskRecord], bool] = is_light_step,
+    ) -> TaskStore:
+        """
+        并发执行任务存储中的任务，直到所有任务完成或出现失败任务
+
+        每当有任务结束就重新计算可执行任务集合，所有依赖满足的任务都会被
+        立即派发，同时执行的任务数受信号量限制。某个任务失败后不再派发新任务，
+        等待已在执行中的任务结束后返回。
+
+        Args:
+            store: 任务存储，任务状态会被原地更新
+            execute_fn: 执行单个任务的协程函数，返回任务状态 "completed" 或 "failed"
+            state: 提供时将任务状态变化增量写入session.state
+            plan_stream: 提供时边接收拆解出的步骤边执行，直到步骤流结束且所有任务完成
+            execute_batch_fn: 提供时将多个轻量任务合并为一次执行，返回 {任务ID: 状态}，
+                没有返回状态的任务重新放回待执行并改为单独执行
+            is_light: 判断任务是否为可合并执行的轻量任务
+
+        Returns:
+            更新状态后的任务存储
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        running: Dict[asyncio.Task, List[TaskRecord]] = {}
+        unbatchable: Set[int] = set()
+        failed = False
+
+        async def run_one(task: TaskRecord) -> Dict[int, str]:
+            queued_at = time.monotonic()
+            async with semaphore:
+                attributes = {
+                    "task.id": task.id,
+                    "task.title": task.title,
+                    "task.queue_ms": (time.monotonic() - queued_at) * 1000,
+                }
+                with tracer.start_as_current_span(f"task {task.id}", attributes=attributes):
+                    return {task.id: await execute_fn(task)}
+
+        async def run_batch(batch: List[TaskRecord]) -> Dict[int, str]:
+            queued_at = time.monotonic()
+            async with semaphore:
+                task_ids = [task.id for task in batch]
+                attributes = {
+                    "task.ids": task_ids,
+                    "task.queue_ms": (time.monotonic() - queued_at) * 1000,
+                }
+                with tracer.start_as_current_span(f"task batch {task_ids}", attributes=attributes):
+                    return await execute_batch_fn(batch)
+
+        next_step: Optional[asyncio.Future] = None
+
+        while True:
+            # 收取步骤流中已到达的新步骤
+            if plan_stream is not None:
+                if next_step is not None and next_step.done():
+                    if next_step.result() is not None:
+                        store.add(next_step.result(), state)
+                    next_step = None
+                while (task := plan_stream.next_nowait()) is not None:
+                    store.add(task, state)
+
+            if not failed:
+                for task in store.ready_tasks():
+                    if task.status != "pending":
+                        continue  # 已被合并到前面的批次中
+                    batch = [task]
+                    if execute_batch_fn is not None:
+                        batch = self._collect_batch(store, task, is_light, unbatchable)
+                    for batch_task in batch:
+                        store.set_status(batch_task.id, "running", state)
+                    future = run_batch(batch) if len(batch) > 1 else run_one(task)
+                    running[asyncio.ensure_future(future)] = batch
+
+            waiting = set(running)
+            if plan_stream is not None and not plan_stream.closed and not failed:
+                if next_step is None:
+                    next_step = asyncio.ensure_future(plan_stream.next())
+                waiting.add(next_step)
+
+            if not waiting:
+                break
+
+            try:
+                done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+            except BaseException:
+                # 调度被取消时一并取消执行中的任务，不留下无人等待的任务
+                for future in [*running, next_step]:
+                    if future is not None:
+                        future.cancel()
+                raise
+            for future in done:
+                if future is next_step:
+                    continue
+                batch = running.pop(future)
+                try:
+                    results = future.result()
+                except Exception as e:
+                    print(f"任务 {', '.join(str(task.id) for task in batch)} 执行异常: {e}")
+                    results = {task.id: "failed" for task in batch}
+                for task in batch:
+                    status = results.get(task.id)
+                    if status is None and len(batch) > 1:
+                        # 批次中没有上报结果的任务放回待执行，之后单独执行
+                        unbatchable.add(task.id)
+                        store.set_status(task.id, "pending", state)
+                        continue
+                    if status not in FINISHED_STATUSES:
+                        status = "failed"
+                    store.set_status(task.id, status, state)
+                    if status == "failed":
+                        failed = True
+
+        if next_step is not None:
+            next_step.cancel()
+        return store
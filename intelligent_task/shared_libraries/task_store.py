@@ -0,0 +1,167 @@
+"""
+任务存储 - 紧凑的任务记录、按ID索引和按状态分桶，支持增量写入session.state
+"""
+
+import uuid
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+# session.state中保存任务计划的键，值为 [[id, title, description, depends_on], ...]，拆解完成后只写入一次
+TASK_PLAN_KEY = "task_plan"
+
+# 每个任务计划的唯一ID，创建新计划时生成，用于保存和恢复执行检查点
+TASK_PLAN_ID_KEY = "task_plan_id"
+
+# 每个任务状态单独保存在 "task_status:<任务ID>" 键下，状态变化时只写入一个小键
+TASK_STATUS_KEY_PREFIX = "task_status:"
+
+TASK_STATUSES = ("pending", "running", "completed", "failed")
+
+
+def task_status_key(task_id: int) -> str:
+    return f"{TASK_STATUS_KEY_PREFIX}{task_id}"
+
+
+@dataclass
+class TaskRecord:
+    """任务记录"""
+
+    __slots__ = ("id", "title", "description", "depends_on", "status")
+
+    id: int
+    title: str
+    description: str
+    depends_on: List[int]
+    status: str
+
+    def to_row(self) -> list:
+        """转换为保存到任务计划中的紧凑行（不含状态）"""
+        return [self.id, self.title, self.description, list(self.depends_on)]
+
+
+class TaskStore:
+    """
+    任务存储
+
+    任务按ID索引，并按状态分桶，按ID查找任务和按状态筛选任务都不需要遍历整个
+    任务列表。任务计划在session.state中只写入一次，之后的状态变化只写入对应
+    任务的状态键。
+    """
+
+    __slots__ = ("_tasks", "_buckets")
+
+    def __init__(self, tasks: Iterable[TaskRecord] = ()):
+        self._tasks: Dict[int, TaskRecord] = {}
+        self._buckets: Dict[str, Set[int]] = {status: set() for status in TASK_STATUSES}
+        for task in tasks:
+            self._tasks[task.id] = task
+            self._buckets.setdefault(task.status, set()).add(task.id)
+
+    @staticmethod
+    def exists(state) -> bool:
+        """session.state中是否已有任务计划"""
+        return bool(state.get(TASK_PLAN_KEY))
+
+    @classmethod
+    def from_rows(cls, rows: List[list], state=None) -> "TaskStore":
+        """
+        从任务计划行构建任务存储
+
+        Args:
+            rows: [[id, title, description, depends_on], ...]
+            state: 提供时从中读取各任务的状态，否则全部为pending
+        """
+        return cls(
+            TaskRecord(
+                id=task_id,
+                title=title,
+                description=description,
+                depends_on=list(depends_on),
+                status=state.get(task_status_key(task_id), "pending") if state is not None else "pending",
+            )
+            for task_id, title, description, depends_on in rows
+        )
+
+    @classmethod
+    def from_state(cls, state) -> "TaskStore":
+        """从session.state加载任务存储"""
+        return cls.from_rows(state.get(TASK_PLAN_KEY) or [], state)
+
+    def to_rows(self) -> List[list]:
+        return [task.to_row() for task in self]
+
+    def save(self, state) -> None:
+        """将完整的任务计划和所有任务状态写入session.state，只在创建新计划时调用"""
+        state[TASK_PLAN_ID_KEY] = uuid.uuid4().hex
+        state[TASK_PLAN_KEY] = self.to_rows()
+        for task in self:
+            state[task_status_key(task.id)] = task.status
+
+    def add(self, task: TaskRecord, state=None) -> None:
+        """
+        向计划追加一个任务，用于边解析边执行的流式计划
+
+        任务行原地追加到已有的计划列表，不复制列表。state是会话State时，重新赋值会把
+        整个计划列表记入事件的state_delta，因此流式执行在普通字典形式的state副本上
+        追加任务，拆解结束时一次写回会话。
+
+        Args:
+            state: 提供时将任务追加到session.state中的任务计划，向空的任务存储
+                追加第一个任务时在state中开始一个新计划
+        """
+        is_new_plan = not self._tasks
+        self._tasks[task.id] = task
+        self._buckets.setdefault(task.status, set()).add(task.id)
+        if state is not None:
+            if is_new_plan:
+                state[TASK_PLAN_ID_KEY] = uuid.uuid4().hex
+                rows = []
+            else:
+                rows = state[TASK_PLAN_KEY]
+            # 原地追加新任务的行；重新赋值让会话State记录这个键的变化，记录的是整个列表
+            rows.append(task.to_row())
+            state[TASK_PLAN_KEY] = rows
+            state[task_status_key(task.id)] = task.status
+
+    def get(self, task_id: int) -> Optional[TaskRecord]:
+        return self._tasks.get(task_id)
+
+    def set_status(self, task_id: int, status: str, state=None) -> None:
+        """
+        更新任务状态
+
+        Args:
+            state: 提供时将状态变化增量写入session.state
+        """
+        task = self._tasks[task_id]
+        self._buckets[task.status].discard(task_id)
+        self._buckets.setdefault(status, set()).add(task_id)
+        task.status = status
+        if state is not None:
+            state[task_status_key(task_id)] = status
+
+    def with_status(self, *statuses: str) -> List[TaskRecord]:
+        """获取处于指定状态的任务，按任务ID排序"""
+        task_ids: Set[int] = set()
+        for status in statuses:
+            task_ids |= self._buckets.get(status, set())
+        return [self._tasks[task_id] for task_id in sorted(task_ids)]
+
+    def next_pending(self) -> Optional[TaskRecord]:
+        """获取ID最小的待执行任务"""
+        pending = self._buckets["pending"]
+        return self._tasks[min(pending)] if pending else None
+
+    def ready_tasks(self) -> List[TaskRecord]:
+        """获取所有依赖均已完成的待执行任务，按任务ID排序"""
+        completed = self._buckets["completed"]
+        return [
+            task for task in self.with_status("pending")
+            if all(dep in completed for dep in task.depends_on)
+        ]
+
+    def __iter__(self) -> Iterator[TaskRecord]:
+        return iter(self._tasks.values())
+
+    def __len__(self) -> int:
+        return len(self._tasks)
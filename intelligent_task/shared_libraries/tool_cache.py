@@ -0,0 +1,231 @@
+"""
+工具调用缓存 - 按工具名和归一化参数缓存MCP工具的调用结果，支持按工具设置过期时间和SQLite持久化
+"""
+
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+# 缓存条目数上限，可通过环境变量 TOOL_CACHE_SIZE 配置
+DEFAULT_TOOL_CACHE_SIZE = int(os.getenv("TOOL_CACHE_SIZE", "512"))
+
+# 持久化缓存的SQLite文件路径，未设置时只缓存在内存中
+TOOL_CACHE_PATH = os.getenv("TOOL_CACHE_PATH", "")
+
+# 各工具的缓存时间（秒），未列出的工具不缓存
+#
+# 缓存按工具名和参数共享，不区分用户：只能列出结果只由参数决定、与调用者身份无关的
+# 工具。这里的搜索和网页获取不携带用户凭据；文件系统工具读取的是服务进程
+# FILESYSTEM_ALLOWED_DIRS内所有用户共用的文件。使用用户凭据、按用户返回数据或有副作用的工具
+# 不能加入这里
+TOOL_TTLS: Dict[str, float] = {
+    # brave-search
+    "brave_web_search": 3600,
+    "brave_local_search": 3600,
+    # fetch
+    "fetch": 900,
+    # filesystem 只读工具，写入类工具调用时失效
+    "read_file": 300,
+    "read_text_file": 300,
+    "read_multiple_files": 300,
+    "list_directory": 300,
+    "directory_tree": 300,
+    "search_files": 300,
+    "get_file_info": 300,
+    # time 只缓存时区换算，get_current_time的结果每次都不同
+    "convert_time": 86400,
+}
+
+# 调用后会使文件系统缓存失效的写入类工具
+FILESYSTEM_WRITE_TOOLS = ("write_file", "edit_file", "create_directory", "move_file")
+
+FILESYSTEM_READ_TOOLS = (
+    "read_file", "read_text_file", "read_multiple_files", "list_directory",
+    "directory_tree", "search_files", "get_file_info",
+)
+
+
+def normalize_args(args: Dict[str, Any]) -> str:
+    """归一化工具参数：去掉字符串首尾空白，按键名排序后序列化"""
+    def normalize(value):
+        if isinstance(value, str):
+            return value.strip()
+        if isinstance(value, dict):
+            return {k: normalize(v) for k, v in value.items() if v is not None}
+        if isinstance(value, (list, tuple)):
+            return [normalize(v) for v in value]
+        return value
+    return json.dumps(normalize(args or {}), sort_keys=True, ensure_ascii=False, default=str)
+
+
+def tool_cache_key(tool_name: str, args: Dict[str, Any]) -> str:
+    return hashlib.sha256(f"{tool_name}\n{normalize_args(args)}".encode("utf-8")).hexdigest()
+
+
+def is_error_result(value: Any) -> bool:
+    """
+    工具结果是否表示调用失败：异常对象、带isError标记的MCP结果、带error键的字典
+    """
+    if isinstance(value, BaseException):
+        return True
+    if isinstance(value, dict):
+        return bool(value.get("isError")) or "error" in value
+    return bool(getattr(value, "isError", False))
+
+
+class ToolResultCache:
+    """
+    带LRU淘汰的工具调用结果缓存
+
+    内存中保存最近使用的结果；设置了SQLite路径时结果同时写入磁盘，
+    内存未命中时从磁盘读取，因此缓存可以跨进程和跨会话复用。磁盘上的条目在打开
+    和每次写入时清理过期条目，并同样受条目数上限约束。出错的工具结果不缓存。
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_TOOL_CACHE_SIZE,
+        ttls: Optional[Dict[str, float]] = None,
+        path: str = TOOL_CACHE_PATH,
+    ):
+        self.max_entries = max_entries
+        self.ttls = dict(TOOL_TTLS if ttls is None else ttls)
+        self._entries: "OrderedDict[str, Tuple[str, float, Any]]" = OrderedDict()
+        self._keys_by_tool: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS tool_cache "
+                "(key TEXT PRIMARY KEY, tool TEXT NOT NULL, expires_at REAL NOT NULL, value TEXT NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS tool_cache_expires_at ON tool_cache (expires_at)")
+            self._prune_db()
+            self._db.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def _prune_db(self) -> None:
+        """删除磁盘上已过期的条目，并只保留最近写入的max_entries条"""
+        self._db.execute("DELETE FROM tool_cache WHERE expires_at < ?", (time.time(),))
+        # INSERT OR REPLACE会为条目分配新的rowid，rowid越大写入越晚
+        self._db.execute(
+            "DELETE FROM tool_cache WHERE rowid NOT IN "
+            "(SELECT rowid FROM tool_cache ORDER BY rowid DESC LIMIT ?)",
+            (max(0, self.max_entries),),
+        )
+
+    def is_cacheable(self, tool_name: str) -> bool:
+        return self.ttls.get(tool_name, 0) > 0
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._keys_by_tool.get(entry[0], set()).discard(key)
+
+    def _store(self, key: str, tool_name: str, expires_at: float, value: Any) -> None:
+        self._remove(key)
+        self._entries[key] = (tool_name, expires_at, value)
+        self._keys_by_tool.setdefault(tool_name, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def _lookup(self, key: str, tool_name: str) -> Optional[Tuple[str, float, Any]]:
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is None and self._db is not None:
+            row = self._db.execute(
+                "SELECT expires_at, value FROM tool_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and row[0] >= now:
+                entry = (tool_name, row[0], json.loads(row[1]))
+                self._store(key, tool_name, row[0], entry[2])
+        if entry is not None and entry[1] < now:
+            self._remove(key)
+            entry = None
+        return entry
+
+    def get(self, tool_name: str, args: Dict[str, Any]) -> Optional[Any]:
+        """
+        查找工具调用的缓存结果
+
+        Returns:
+            缓存结果的副本，未命中或已过期时返回None
+        """
+        if not self.is_cacheable(tool_name):
+            return None
+        key = tool_cache_key(tool_name, args)
+        with self._lock:
+            entry = self._lookup(key, tool_name)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(entry[2])
+
+    def put(self, tool_name: str, args: Dict[str, Any], value: Any) -> None:
+        """缓存工具调用结果，超出容量时淘汰最久未使用的条目，失败的调用结果不缓存"""
+        if not self.is_cacheable(tool_name) or is_error_result(value):
+            return
+        key = tool_cache_key(tool_name, args)
+        expires_at = time.time() + self.ttls[tool_name]
+        with self._lock:
+            self._store(key, tool_name, expires_at, copy.deepcopy(value))
+            if self._db is not None:
+                try:
+                    serialized = json.dumps(value, ensure_ascii=False)
+                except (TypeError, ValueError):
+                    return
+                self._db.execute(
+                    "INSERT OR REPLACE INTO tool_cache (key, tool, expires_at, value) VALUES (?, ?, ?, ?)",
+                    (key, tool_name, expires_at, serialized),
+                )
+                self._prune_db()
+                self._db.commit()
+
+    def invalidate(self, *tool_names: str) -> None:
+        """清除指定工具的所有缓存结果"""
+        with self._lock:
+            for tool_name in tool_names:
+                for key in list(self._keys_by_tool.pop(tool_name, ())):
+                    self._entries.pop(key, None)
+            if self._db is not None and tool_names:
+                self._db.execute(
+                    f"DELETE FROM tool_cache WHERE tool IN ({','.join('?' * len(tool_names))})",
+                    tool_names,
+                )
+                self._db.commit()
+
+    def record_call(self, tool_name: str, args: Dict[str, Any], value: Any) -> None:
+        """
+        记录一次实际的工具调用：写入类文件系统工具使文件系统缓存失效，其余工具缓存结果
+        """
+        if tool_name in FILESYSTEM_WRITE_TOOLS:
+            self.invalidate(*FILESYSTEM_READ_TOOLS)
+        else:
+            self.put(tool_name, args, value)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_tool.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM tool_cache")
+                self._db.commit()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# 全局工具调用缓存，所有会话的执行器共享
+tool_cache = ToolResultCache()
@@ -0,0 +1,105 @@
+"""
+工具调用并发 - 按服务限制工具调用的并发数和超时时间
+"""
+
+import asyncio
+import os
+import time
+import weakref
+from typing import Any, Dict, Optional
+
+from google.adk.tools.base_tool import BaseTool
+from google.genai import types
+
+from .tracing import tracer
+
+# 单次工具调用的超时时间（秒）
+TOOL_CALL_TIMEOUT = float(os.getenv("TOOL_CALL_TIMEOUT", "60"))
+
+# 每个MCP服务同时进行的工具调用数上限，未单独配置的服务使用默认值
+DEFAULT_SERVER_CONCURRENCY = int(os.getenv("TOOL_SERVER_CONCURRENCY", "4"))
+SERVER_CONCURRENCY_LIMITS: Dict[str, int] = {
+    "brave-search": int(os.getenv("BRAVE_SEARCH_CONCURRENCY", "2")),
+}
+
+
+class BoundedTool(BaseTool):
+    """
+    限制并发和超时的工具包装
+
+    同一服务的调用共享一个并发上限；调用超时时返回错误结果而不是让整个任务
+    一直等待。同一模型响应中的多个调用由框架并发执行，这里只负责限流。
+    """
+
+    def __init__(self, tool: BaseTool, server_name: str, fanout: "ToolFanout"):
+        super().__init__(name=tool.name, description=tool.description)
+        self.tool = tool
+        self.server_name = server_name
+        self.fanout = fanout
+
+    def _get_declaration(self) -> Optional[types.FunctionDeclaration]:
+        return self.tool._get_declaration()
+
+    async def run_async(self, *, args: Dict[str, Any], tool_context) -> Any:
+        return await self.fanout.call(self, args, tool_context)
+
+
+class ToolFanout:
+    """工具调用并发控制"""
+
+    def __init__(
+        self,
+        timeout: float = TOOL_CALL_TIMEOUT,
+        default_concurrency: int = DEFAULT_SERVER_CONCURRENCY,
+        concurrency_limits: Optional[Dict[str, int]] = None,
+    ):
+        self.timeout = timeout
+        self.default_concurrency = max(1, default_concurrency)
+        self.concurrency_limits = dict(SERVER_CONCURRENCY_LIMITS if concurrency_limits is None else concurrency_limits)
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._tools: Dict[str, BoundedTool] = {}
+
+    def wrap(self, tool: BaseTool, server_name: str) -> BoundedTool:
+        """包装工具，同一个工具只包装一次"""
+        bounded = self._tools.get(tool.name)
+        if bounded is None or bounded.tool is not tool:
+            bounded = self._tools[tool.name] = BoundedTool(tool, server_name, self)
+        return bounded
+
+    def _semaphore(self, server_name: str) -> asyncio.Semaphore:
+        # 信号量绑定事件循环，每个事件循环各自创建
+        semaphores = self._semaphores.setdefault(asyncio.get_running_loop(), {})
+        semaphore = semaphores.get(server_name)
+        if semaphore is None:
+            limit = self.concurrency_limits.get(server_name, self.default_concurrency)
+            semaphore = semaphores[server_name] = asyncio.Semaphore(max(1, limit))
+        return semaphore
+
+    async def call(self, bounded: BoundedTool, args: Dict[str, Any], tool_context) -> Any:
+        """在服务并发上限和超时限制下执行一次工具调用"""
+        queued_at = time.monotonic()
+        async with self._semaphore(bounded.server_name):
+            attributes = {
+                "mcp.server": bounded.server_name,
+                "tool.name": bounded.name,
+                "tool.queue_ms": (time.monotonic() - queued_at) * 1000,
+            }
+            with tracer.start_as_current_span(f"mcp {bounded.name}", attributes=attributes) as span:
+                try:
+                    return await asyncio.wait_for(
+                        bounded.tool.run_async(args=args, tool_context=tool_context), self.timeout
+                    )
+                except asyncio.TimeoutError:
+                    span.set_attribute("tool.timed_out", True)
+                    print(f"工具调用超时: {bounded.name}")
+                    # 与MCP工具结果同样的结构，调用方和工具缓存可以按isError识别
+                    return {
+                        "content": [{"type": "text", "text": f"工具 {bounded.name} 调用超过{self.timeout:g}秒未返回"}],
+                        "isError": True,
+                    }
+
+
+# 全局工具调用并发控制，所有会话共享各服务的并发上限
+tool_fanout = ToolFanout()
@@ -0,0 +1,213 @@
+"""
+工具输出处理 - 大的工具结果经过正文提取、分段和按当前任务的相关性选取后才进入上下文，完整内容保存到blob存储
+"""
+
+import heapq
+import io
+import os
+import re
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from .blob_store import blob_store
+from .execution_context import estimate_tokens, truncate_to_tokens
+
+# 单次工具调用结果进入上下文的token上限，设为0时不限制
+TOOL_OUTPUT_MAX_TOKENS = int(os.getenv("TOOL_OUTPUT_MAX_TOKENS", "2000"))
+
+# 分段时每段的token上限
+TOOL_OUTPUT_CHUNK_TOKENS = int(os.getenv("TOOL_OUTPUT_CHUNK_TOKENS", "300"))
+
+# 截断说明预留的token数
+_NOTE_TOKENS = 120
+
+_HTML_MARKERS = re.compile(r"<(?:!doctype html|html|head|body|div|p|table|span|a)[\s>]", re.IGNORECASE)
+_TERMS = re.compile(r"[a-z0-9_]{2,}|[\u4e00-\u9fff]+")
+
+
+def looks_like_html(text: str) -> bool:
+    """内容开头出现多个常见HTML标签时视为HTML"""
+    return len(_HTML_MARKERS.findall(text[:4096])) >= 3
+
+
+def extract_text(text: str) -> str:
+    """HTML内容转换为正文文本，其他内容原样返回"""
+    if looks_like_html(text):
+        from .native_tools import html_to_text
+        return html_to_text(text)
+    return text
+
+
+def _split_line(line: str, chunk_tokens: int) -> Iterator[str]:
+    """把超过一段长度的单行按token上限切开"""
+    while line:
+        end = min(len(line), chunk_tokens * 4)
+        while end > 1 and estimate_tokens(line[:end]) > chunk_tokens:
+            end = int(end * 0.8)
+        yield line[:end]
+        line = line[end:]
+
+
+def iter_chunks(text: str, chunk_tokens: int = TOOL_OUTPUT_CHUNK_TOKENS) -> Iterator[str]:
+    """
+    按行流式切分文本，每段不超过chunk_tokens个token
+
+    尽量在行边界切分，超长的行单独切开
+    """
+    buffer: List[str] = []
+    size = 0
+    for line in io.StringIO(text):
+        tokens = estimate_tokens(line)
+        if tokens > chunk_tokens:
+            if buffer:
+                yield "".join(buffer)
+                buffer, size = [], 0
+            yield from _split_line(line, chunk_tokens)
+            continue
+        if size + tokens > chunk_tokens and buffer:
+            yield "".join(buffer)
+            buffer, size = [], 0
+        buffer.append(line)
+        size += tokens
+    if buffer:
+        yield "".join(buffer)
+
+
+def query_terms(query: str) -> Set[str]:
+    """提取相关性匹配用的词：英文和数字按单词，中文按相邻两字"""
+    terms = set()
+    for term in _TERMS.findall(query.lower()):
+        if term.isascii():
+            terms.add(term)
+        elif len(term) == 1:
+            terms.add(term)
+        else:
+            terms.update(term[i:i + 2] for i in range(len(term) - 1))
+    return terms
+
+
+def select_relevant_chunks(
+    chunks: Iterator[str],
+    query: str,
+    max_tokens: int,
+) -> Tuple[List[Tuple[int, str]], int]:
+    """
+    从分段中选取与查询最相关的段落，总长度不超过max_tokens
+
+    分段逐个处理，只在堆中保留当前得分最高的段落；得分相同时保留靠前的段落，
+    因此查询没有可匹配的词时等同于保留开头部分。
+
+    Returns:
+        ([(段序号, 段落)]按原顺序排列, 总段数)
+    """
+    terms = query_terms(query)
+    # 堆元素为 (得分, -段序号, token数, 段落)，堆顶是当前最不相关的段落
+    heap: List[Tuple[int, int, int, str]] = []
+    used = 0
+    total = 0
+    for index, chunk in enumerate(chunks):
+        total += 1
+        lowered = chunk.lower()
+        item = (sum(1 for term in terms if term in lowered), -index, estimate_tokens(chunk), chunk)
+        heapq.heappush(heap, item)
+        used += item[2]
+        while used > max_tokens and heap:
+            used -= heapq.heappop(heap)[2]
+    selected = sorted((-item[1], item[3]) for item in heap)
+    return selected, total
+
+
+def cap_text(text: str, query: str, max_tokens: int = TOOL_OUTPUT_MAX_TOKENS) -> str:
+    """
+    将文本限制在max_tokens个token内
+
+    超出上限时先提取HTML正文；仍然超出时把完整内容保存到blob存储，
+    按与查询的相关性选取段落，并附上blob ID供read_tool_output分段读取。
+    写入blob存储失败时只返回选取的段落，不附带ID
+    """
+    if max_tokens <= 0 or estimate_tokens(text) <= max_tokens:
+        return text
+    extracted = extract_text(text)
+    tokens = estimate_tokens(extracted)
+    if tokens <= max_tokens:
+        return extracted
+
+    def omitted(first: int, last: int) -> str:
+        span = f"第{first}段" if first == last else f"第{first}-{last}段"
+        return f"\n[... {span}已省略 ...]\n"
+
+    try:
+        output_id = blob_store.put(extracted)
+    except OSError as e:
+        print(f"写入blob存储失败，工具输出只保留选取的段落: {e}")
+        output_id = None
+    budget = max(1, max_tokens - _NOTE_TOKENS)
+    selected, total = select_relevant_chunks(iter_chunks(extracted), query, budget)
+    if not selected:
+        # 上限小于一段的长度时只保留第一段的开头
+        selected = [(0, truncate_to_tokens(next(iter_chunks(extracted)), budget))]
+    parts = []
+    previous = -1
+    for index, chunk in selected:
+        if index != previous + 1:
+            parts.append(omitted(previous + 2, index))
+        parts.append(chunk)
+        previous = index
+    if previous + 1 < total:
+        parts.append(omitted(previous + 2, total))
+    indexes = "、".join(str(index + 1) for index, _ in selected)
+    note = f"\n[内容约{tokens}个token，超过单次上限{max_tokens}，已按与当前任务的相关性选取第{indexes}段（共{total}段）。"
+    if output_id is None:
+        note += "完整内容未能保存，无法读取其他段落]"
+    else:
+        note += f"完整内容的output_id为 {output_id}，可调用read_tool_output读取其他段落]"
+    parts.append(note)
+    return "".join(parts)
+
+
+def cap_tool_response(tool_response: Any, query: str, max_tokens: int = TOOL_OUTPUT_MAX_TOKENS) -> Optional[Dict]:
+    """
+    限制MCP格式工具结果 {"content": [{"type": "text", "text": ...}]} 中文本的长度
+
+    多段文本平分token上限。不需要处理时返回None，否则返回新的结果，不修改原结果
+    """
+    if max_tokens <= 0 or not isinstance(tool_response, dict):
+        return None
+    content = tool_response.get("content")
+    if not isinstance(content, list):
+        return None
+    is_text = [isinstance(item, dict) and isinstance(item.get("text"), str) for item in content]
+    texts = [item["text"] for item, text in zip(content, is_text) if text]
+    if not texts or sum(estimate_tokens(text) for text in texts) <= max_tokens:
+        return None
+    budget = max(1, max_tokens // len(texts))
+    return {
+        **tool_response,
+        "content": [
+            {**item, "text": cap_text(item["text"], query, budget)} if text else item
+            for item, text in zip(content, is_text)
+        ],
+    }
+
+
+def read_output_chunks(output_id: str, start_chunk: int, max_tokens: int = TOOL_OUTPUT_MAX_TOKENS) -> Dict[str, Any]:
+    """
+    从第start_chunk段（从1开始）开始读取已保存的完整工具输出，总长度不超过max_tokens
+
+    Raises:
+        KeyError: output_id不存在
+    """
+    text = blob_store.get(output_id)
+    start_chunk = max(1, start_chunk)
+    parts: List[str] = []
+    used = 0
+    next_chunk = None
+    for index, chunk in enumerate(iter_chunks(text), 1):
+        if index < start_chunk:
+            continue
+        cost = estimate_tokens(chunk)
+        if parts and max_tokens > 0 and used + cost > max_tokens:
+            next_chunk = index
+            break
+        parts.append(chunk)
+        used += cost
+    return {"output_id": output_id, "start_chunk": start_chunk, "next_chunk": next_chunk, "text": "".join(parts)}
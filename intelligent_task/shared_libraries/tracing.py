@@ -0,0 +1,244 @@
+"""
+链路追踪 - 通过agent回调生成OpenTelemetry span，记录各阶段耗时、token数和排队时间，可导出为JSONL
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from opentelemetry import context, trace
+
+# span导出的JSONL文件路径，服务入口启动时调用setup_tracing启用本地导出
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "")
+
+# 未正常结束的span数上限，超出时结束最早的span
+MAX_OPEN_SPANS = 1024
+
+# 未配置TracerProvider时为无操作的tracer，应用配置的TracerProvider同样生效
+tracer = trace.get_tracer("intelligent_task")
+
+# 未结束的span及其设为当前上下文时返回的token
+_open_spans: "OrderedDict[Tuple, Tuple[trace.Span, object]]" = OrderedDict()
+_open_spans_lock = threading.Lock()
+_exporting_paths = set()
+
+
+def _span_to_dict(span) -> Dict[str, Any]:
+    context = span.get_span_context()
+    return {
+        "name": span.name,
+        "trace_id": format(context.trace_id, "032x"),
+        "span_id": format(context.span_id, "016x"),
+        "parent_span_id": format(span.parent.span_id, "016x") if span.parent else None,
+        "start_time": span.start_time,
+        "end_time": span.end_time,
+        "duration_ms": (span.end_time - span.start_time) / 1e6 if span.end_time else None,
+        "status": span.status.status_code.name,
+        "attributes": dict(span.attributes or {}),
+    }
+
+
+def setup_tracing(path: str = TRACE_EXPORT_PATH) -> bool:
+    """
+    将span导出到本地JSONL文件
+
+    导入本模块不会启用导出，由服务等入口在启动时调用。已配置SDK TracerProvider时
+    在其上追加导出器，否则创建新的TracerProvider；同一路径只添加一次导出器。
+
+    Returns:
+        是否启用了导出
+    """
+    if not path:
+        return False
+    if path in _exporting_paths:
+        return True
+
+    # SDK只在启用导出时才需要，延迟导入以加快agent的导入速度
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+
+    class JsonlSpanExporter(SpanExporter):
+        """每个span一行JSON"""
+
+        def __init__(self, export_path: str):
+            self._lock = threading.Lock()
+            self._file = open(export_path, "a", encoding="utf-8")
+
+        def export(self, spans) -> "SpanExportResult":
+            with self._lock:
+                for span in spans:
+                    self._file.write(json.dumps(_span_to_dict(span), ensure_ascii=False, default=str) + "\n")
+                self._file.flush()
+            return SpanExportResult.SUCCESS
+
+        def shutdown(self) -> None:
+            with self._lock:
+                self._file.close()
+
+    provider = trace.get_tracer_provider()
+    if not isinstance(provider, TracerProvider):
+        provider = TracerProvider()
+        trace.set_tracer_provider(provider)
+    provider.add_span_processor(BatchSpanProcessor(JsonlSpanExporter(path)))
+    _exporting_paths.add(path)
+    print(f"链路追踪已启用，span导出到 {path}")
+    return True
+
+
+def _start(key: Tuple, name: str, attributes: Dict[str, Any]) -> None:
+    """
+    开始span并设为当前上下文，之后开始的span（包括框架和工具内部的span）都嵌套在它下面
+    """
+    span = tracer.start_span(name, attributes=attributes)
+    token = context.attach(trace.set_span_in_context(span))
+    with _open_spans_lock:
+        previous = _open_spans.pop(key, None)
+        _open_spans[key] = (span, token)
+        evicted = [_open_spans.popitem(last=False)[1] for _ in range(len(_open_spans) - MAX_OPEN_SPANS)]
+    for stale, _ in filter(None, [previous, *evicted]):
+        # 未正常结束的span的上下文已被后来的span覆盖，只结束span
+        stale.set_status(trace.Status(trace.StatusCode.ERROR, "span未正常结束"))
+        stale.end()
+
+
+def _finish(
+    key: Tuple,
+    attributes: Dict[str, Any],
+    error: Optional[str] = None,
+    exception: Optional[BaseException] = None,
+) -> None:
+    with _open_spans_lock:
+        entry = _open_spans.pop(key, None)
+    if entry is None:
+        return
+    span, token = entry
+    span.set_attributes({k: v for k, v in attributes.items() if v is not None})
+    if exception is not None:
+        span.record_exception(exception)
+        error = error or f"{type(exception).__name__}: {exception}"
+    if error:
+        span.set_status(trace.Status(trace.StatusCode.ERROR, error))
+    span.end()
+    context.detach(token)
+
+
+def trace_agent_start(callback_context) -> None:
+    """before_agent_callback：开始一个agent轮次的span"""
+    _start(
+        ("agent", callback_context.invocation_id, callback_context.agent_name),
+        f"agent {callback_context.agent_name}",
+        {"agent.name": callback_context.agent_name, "invocation.id": callback_context.invocation_id},
+    )
+    return None
+
+
+def trace_agent_end(callback_context) -> None:
+    """after_agent_callback：结束agent轮次的span"""
+    _finish(("agent", callback_context.invocation_id, callback_context.agent_name), {})
+    return None
+
+
+def trace_model_start(callback_context, llm_request) -> None:
+    """
+    before_model_callback：开始一次模型调用的span
+
+    需放在before_model_callback列表的最后，被缓存等回调直接返回的请求不计为模型调用
+    """
+    _start(
+        ("model", callback_context.invocation_id, callback_context.agent_name),
+        f"model {callback_context.agent_name}",
+        {
+            "agent.name": callback_context.agent_name,
+            "llm.model": llm_request.model or "",
+            "llm.request.contents": len(llm_request.contents),
+            "llm.request.tools": len(llm_request.tools_dict),
+        },
+    )
+    return None
+
+
+def trace_model_end(callback_context, llm_response) -> None:
+    """
+    after_model_callback：记录token数并结束模型调用的span
+
+    需放在after_model_callback列表的最前，流式输出时记录首个分块的到达时间
+    """
+    key = ("model", callback_context.invocation_id, callback_context.agent_name)
+    if llm_response.partial:
+        with _open_spans_lock:
+            span = (_open_spans.get(key) or (None, None))[0]
+        start_time = getattr(span, "start_time", None)
+        if start_time and "llm.time_to_first_chunk_ms" not in span.attributes:
+            span.set_attribute("llm.time_to_first_chunk_ms", (time.time_ns() - start_time) / 1e6)
+        return None
+
+    usage = llm_response.usage_metadata
+    _finish(
+        key,
+        {
+            "llm.usage.prompt_tokens": usage.prompt_token_count if usage else None,
+            "llm.usage.completion_tokens": usage.candidates_token_count if usage else None,
+            "llm.usage.cached_tokens": usage.cached_content_token_count if usage else None,
+            "llm.usage.total_tokens": usage.total_token_count if usage else None,
+            "llm.finish_reason": llm_response.finish_reason.name if llm_response.finish_reason else None,
+        },
+        error=llm_response.error_message if llm_response.error_code else None,
+    )
+    return None
+
+
+def trace_model_error(callback_context, llm_request, error: Exception) -> None:
+    """
+    on_model_error_callback：模型调用抛出异常时记录异常并结束span
+
+    需放在on_model_error_callback列表的最前，不处理异常，错误照常抛出或由后面的回调处理
+    """
+    _finish(("model", callback_context.invocation_id, callback_context.agent_name), {}, exception=error)
+    return None
+
+
+def _tool_key(tool, tool_context) -> Tuple:
+    return ("tool", tool_context.invocation_id, tool_context.function_call_id or tool.name)
+
+
+def trace_tool_start(tool, args, tool_context) -> None:
+    """before_tool_callback：开始一次工具调用（包括AgentTool和MCP工具）的span"""
+    _start(
+        _tool_key(tool, tool_context),
+        f"tool {tool.name}",
+        {
+            "agent.name": tool_context.agent_name,
+            "tool.name": tool.name,
+            "tool.args_size": len(json.dumps(args or {}, ensure_ascii=False, default=str)),
+        },
+    )
+    return None
+
+
+def trace_tool_end(tool, args, tool_context, tool_response) -> None:
+    """after_tool_callback：结束工具调用的span，工具返回错误时标记为错误"""
+    error = None
+    if isinstance(tool_response, dict):
+        if tool_response.get("isError"):
+            error = "工具返回错误"
+        elif tool_response.get("error"):
+            error = str(tool_response["error"])
+    _finish(
+        _tool_key(tool, tool_context),
+        {"tool.response_size": len(json.dumps(tool_response, ensure_ascii=False, default=str))},
+        error=error,
+    )
+    return None
+
+
+def trace_tool_error(tool, args, tool_context, error: Exception) -> None:
+    """
+    on_tool_error_callback：工具调用抛出异常时记录异常并结束span
+
+    需放在on_tool_error_callback列表的最前，不处理异常，错误照常抛出或由后面的回调处理
+    """
+    _finish(_tool_key(tool, tool_context), {}, exception=error)
+    return None
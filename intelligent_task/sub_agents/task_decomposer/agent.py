@@ -2,17 +2,194 @@
 任务拆解子Agent - 专门处理复杂任务的拆解
 """
 
+import asyncio
 import json
-import re
-from typing import Optional
+import os
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
 from google.adk.agents import Agent
 from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import llm_request as llm_request_module
 from google.adk.models import llm_response as llm_response_module
-from google.adk.tools.mcp_tool.mcp_toolset import MCPToolset, StdioConnectionParams, StdioServerParameters
+from google.genai import types
 
 from . import prompt
+from ..task_monitor.agent import build_execution_report, execute_streaming_plan
+from ...shared_libraries.mcp_pool import LazyMCPToolset
+from ...shared_libraries.model_router import (
+    MODEL_USAGE_KEY,
+    TieredLlm,
+    apply_budget,
+    merge_model_usage,
+    model_for,
+    record_model_usage,
+)
+from ...shared_libraries.prompt_cache import account_prompt_tokens, account_usage_tokens
+from ...shared_libraries.plan_parser import IncrementalPlanParser, PlanStream
+from ...shared_libraries.response_cache import decomposition_cache
+from ...shared_libraries.task_store import TaskRecord, TaskStore
+from ...shared_libraries.tracing import (
+    trace_agent_end,
+    trace_agent_start,
+    trace_model_end,
+    trace_model_error,
+    trace_model_start,
+    trace_tool_end,
+    trace_tool_error,
+    trace_tool_start,
+)
 
-MODEL = "gemini-2.0-flash"
+MODEL = model_for("decomposer")
+
+# 流式输出中的拆解响应对应的增量解析器，按invocation_id区分，数量有上限防止异常中断的响应残留
+MAX_STREAMING_PLANS = 1024
+_plan_parsers: "OrderedDict[str, IncrementalPlanParser]" = OrderedDict()
+
+# 开启后拆解的同时执行已解析出的步骤，不再等待用户确认拆解结果，默认关闭。
+# 开启时拆解模型始终以流式输出，即使作为AgentTool非流式调用，每个步骤一解析出来就开始执行
+EXECUTE_WHILE_DECOMPOSING = os.getenv("EXECUTE_WHILE_DECOMPOSING", "0") == "1"
+
+# 订阅了步骤流的会话：会话ID -> 步骤流
+_plan_streams: Dict[str, PlanStream] = {}
+
+# 拆解时同时进行的计划执行：会话ID -> (执行任务, 执行使用的state, 执行开始时的state)
+_streaming_executions: Dict[str, Tuple["asyncio.Future[TaskStore]", dict, dict]] = {}
+
+
+def subscribe_plan_stream(session_id: str) -> PlanStream:
+    """
+    订阅会话中下一次任务拆解的步骤流
+
+    计划输出完毕或拆解结束时步骤流关闭并自动取消订阅，拆解没有给出任何步骤时也会关闭
+    """
+    plan_stream = _plan_streams[session_id] = PlanStream()
+    return plan_stream
+
+
+def notify_plan_steps(callback_context: CallbackContext, tasks: List[TaskRecord]) -> None:
+    """将新解析出的步骤推送到当前会话订阅的步骤流"""
+    plan_stream = _plan_streams.get(callback_context.session.id)
+    if plan_stream is not None:
+        for task in tasks:
+            plan_stream.push(task)
+
+
+def close_plan_stream(callback_context: CallbackContext) -> None:
+    """通知当前会话的步骤流计划已输出完毕，并取消订阅"""
+    plan_stream = _plan_streams.pop(callback_context.session.id, None)
+    if plan_stream is not None:
+        plan_stream.push(None)
+
+
+def start_streaming_execution(callback_context: CallbackContext) -> Optional[types.Content]:
+    """
+    before_agent_callback：开启EXECUTE_WHILE_DECOMPOSING时，订阅本次拆解的步骤流并在后台边接收步骤边执行
+
+    执行使用会话state的副本，拆解结束时由finish_streaming_execution写回会话。拆解模型
+    以流式输出，第一个步骤一解析出来就开始执行。拆解出错或运行拆解的任务结束时
+    后台执行仍未写回的，由abort_streaming_execution取消。
+    """
+    if not EXECUTE_WHILE_DECOMPOSING:
+        return None
+    session_id = callback_context.session.id
+    state = {k: v for k, v in callback_context.state.to_dict().items() if not k.startswith("_adk")}
+    plan_stream = subscribe_plan_stream(session_id)
+    execution = asyncio.ensure_future(execute_streaming_plan(plan_stream, state, callback_context.user_id))
+    _streaming_executions[session_id] = (execution, state, dict(state))
+    current_task = asyncio.current_task()
+    if current_task is not None:
+        current_task.add_done_callback(lambda _: abort_streaming_execution(session_id, execution))
+    return None
+
+
+def abort_streaming_execution(session_id: str, execution: "Optional[asyncio.Future[TaskStore]]" = None) -> None:
+    """
+    关闭会话的步骤流并取消拆解时开始的执行，执行结果不写回会话
+
+    Args:
+        session_id: 会话ID
+        execution: 提供时只在会话当前的执行仍是它时才取消
+    """
+    entry = _streaming_executions.get(session_id)
+    if entry is None or (execution is not None and entry[0] is not execution):
+        return
+    del _streaming_executions[session_id]
+    plan_stream = _plan_streams.pop(session_id, None)
+    if plan_stream is not None:
+        plan_stream.push(None)
+    if not entry[0].done():
+        entry[0].cancel()
+        print(f"任务拆解未正常结束，已取消会话 {session_id} 中拆解时开始的执行")
+
+
+def abort_execution_on_model_error(callback_context: CallbackContext, llm_request, error: Exception) -> None:
+    """on_model_error_callback：拆解模型调用出错时取消拆解时开始的执行，错误照常抛出"""
+    abort_streaming_execution(callback_context.session.id)
+    return None
+
+
+def abort_execution_on_tool_error(tool, args, tool_context, error: Exception) -> None:
+    """on_tool_error_callback：拆解中的工具调用出错时取消拆解时开始的执行，错误照常抛出"""
+    abort_streaming_execution(tool_context.session.id)
+    return None
+
+
+async def finish_streaming_execution(callback_context: CallbackContext) -> Optional[types.Content]:
+    """
+    after_agent_callback：关闭步骤流，等待拆解时开始的执行结束，并将执行结果写回会话
+
+    拆解给出了步骤时，以执行报告作为拆解agent的最终回复
+    """
+    close_plan_stream(callback_context)
+    execution = _streaming_executions.pop(callback_context.session.id, None)
+    if execution is None:
+        return None
+    future, state, initial = execution
+    store = await future
+    merge_model_usage(callback_context.state, initial.get(MODEL_USAGE_KEY), state.get(MODEL_USAGE_KEY))
+    for key, value in state.items():
+        if key != MODEL_USAGE_KEY and (key not in initial or value is not initial[key]):
+            callback_context.state[key] = value
+    if not len(store):
+        return None
+    return types.Content(role="model", parts=[types.Part(text=build_execution_report(state, store))])
+
+
+def get_request_text(callback_context: CallbackContext) -> str:
+    """获取触发本次拆解的请求文本"""
+    user_content = callback_context.user_content
+    if not user_content or not user_content.parts:
+        return ""
+    return "".join(part.text for part in user_content.parts if part.text)
+
+
+def load_cached_decomposition(
+    callback_context: CallbackContext,
+    llm_request: llm_request_module.LlmRequest,
+) -> Optional[llm_response_module.LlmResponse]:
+    """
+    相同或相似的请求已拆解过时，直接返回缓存的拆解结果并写入任务列表，跳过LLM调用
+    """
+    # 只在处理新请求时查找缓存：最后一条须是用户文本，工具调用返回后的后续轮次不处理
+    last = llm_request.contents[-1] if llm_request.contents else None
+    if last is None or last.role != "user" or not last.parts:
+        return None
+    if any(part.function_response for part in last.parts) or not any(part.text for part in last.parts):
+        return None
+    request_text = get_request_text(callback_context)
+    cached = decomposition_cache.get(request_text) if request_text else None
+    if cached is None:
+        return None
+    
+    store = TaskStore.from_rows(cached["tasks"])
+    store.save(callback_context.state)
+    callback_context.state["task_decomposition_complete"] = True
+    notify_plan_steps(callback_context, list(store))
+    close_plan_stream(callback_context)
+    print(f"命中任务拆解缓存，共{len(cached['tasks'])}个任务")
+    return llm_response_module.LlmResponse(
+        content=types.Content(role="model", parts=[types.Part(text=cached["response_text"])])
+    )
 
 
 def save_confirmed_tasks_to_state(
@@ -21,63 +198,65 @@ def save_confirmed_tasks_to_state(
 ) -> Optional[llm_response_module.LlmResponse]:
     """
     检查LLM响应中是否包含用户确认的任务列表，并将其保存到session.state中
+
+    流式输出时每个部分响应只解析新到达的文本，步骤一完整就通知监听器；
+    部分响应的state变化不会被保存，因此任务计划在最终响应时统一写入。
     """
-    if not llm_response.content or not llm_response.content.parts:
+    invocation_id = callback_context.invocation_id
+    response_text = ""
+    if llm_response.content and llm_response.content.parts:
+        for part in llm_response.content.parts:
+            if hasattr(part, 'text') and part.text is not None:
+                response_text += part.text
+
+    if llm_response.partial:
+        parser = _plan_parsers.get(invocation_id)
+        if parser is None:
+            parser = _plan_parsers[invocation_id] = IncrementalPlanParser()
+            while len(_plan_parsers) > MAX_STREAMING_PLANS:
+                _plan_parsers.popitem(last=False)
+        notify_plan_steps(callback_context, parser.feed(response_text))
         return None
+
+    # 最终响应：流式输出时文本已由部分响应输入，非流式时一次性解析完整文本
+    parser = _plan_parsers.pop(invocation_id, None) or IncrementalPlanParser()
+    new_tasks = parser.feed(response_text) if not parser.received_text else []
+    new_tasks += parser.finish()
+    notify_plan_steps(callback_context, new_tasks)
+    # 没有函数调用的最终响应结束本次拆解，无论是否给出了步骤都关闭步骤流
+    parts = llm_response.content.parts if llm_response.content and llm_response.content.parts else []
+    if not any(part.function_call for part in parts):
+        close_plan_stream(callback_context)
+
+    if parser.tasks:
+        store = TaskStore(parser.tasks)
         
-    response_text = ""
-    for part in llm_response.content.parts:
-        if hasattr(part, 'text') and part.text is not None:
-            response_text += part.text
-    
-    # 检查是否包含确认的任务列表（查找"## 执行步骤"部分）
-    if "## 执行步骤" in response_text:
-        # 提取执行步骤
-        steps_section = response_text.split("## 执行步骤")[1]
+        # 保存到session.state
+        store.save(callback_context.state)
+        callback_context.state["task_decomposition_complete"] = True
         
-        # 使用正则表达式提取步骤
-        step_pattern = r'\d+\.\s*\*\*([^*]+)\*\*:\s*([^\n]+)'
-        matches = re.findall(step_pattern, steps_section)
+        # 缓存拆解结果，相同或相似的请求可以直接复用
+        request_text = get_request_text(callback_context)
+        if request_text:
+            decomposition_cache.put(request_text, {"response_text": response_text, "tasks": store.to_rows()})
         
-        if matches:
-            # 构建任务列表
-            tasks = []
-            for i, (step_title, step_description) in enumerate(matches, 1):
-                task = {
-                    "id": i,
-                    "title": step_title.strip(),
-                    "description": step_description.strip(),
-                    "status": "pending",  # 初始状态为待完成
-                    "confirmed": True  # 标记为用户已确认
-                }
-                tasks.append(task)
-            
-            # 保存到session.state
-            callback_context.state["confirmed_task_list"] = tasks
-            callback_context.state["task_decomposition_complete"] = True
-            
-            print(f"任务列表已保存到session.state，共{len(tasks)}个任务")
+        print(f"任务列表已保存到session.state，共{len(store)}个任务")
     
     return None
 
 
 task_decomposer_agent = Agent(
     name="task_decomposer_agent",
-    model=MODEL,
+    model=TieredLlm(model=MODEL, stream_responses=EXECUTE_WHILE_DECOMPOSING),
     description="专门用于将复杂任务拆解为可执行的步骤序列",
-    instruction=prompt.TASK_DECOMPOSER_PROMPT,
-    tools=[
-        MCPToolset(
-            connection_params=StdioConnectionParams(
-                server_params=StdioServerParameters(
-                    command='npx',
-                    args=[
-                        "-y",
-                        "@modelcontextprotocol/server-sequential-thinking"
-                    ],
-                ),
-            ),
-        )
-    ],
-    after_model_callback=save_confirmed_tasks_to_state,
+    static_instruction=prompt.TASK_DECOMPOSER_PROMPT,
+    tools=[LazyMCPToolset("sequential-thinking")],
+    before_agent_callback=[trace_agent_start, start_streaming_execution],
+    after_agent_callback=[trace_agent_end, finish_streaming_execution],
+    before_model_callback=[load_cached_decomposition, apply_budget, account_prompt_tokens, trace_model_start],
+    after_model_callback=[trace_model_end, account_usage_tokens, record_model_usage, save_confirmed_tasks_to_state],
+    on_model_error_callback=[trace_model_error, abort_execution_on_model_error],
+    before_tool_callback=trace_tool_start,
+    after_tool_callback=trace_tool_end,
+    on_tool_error_callback=[trace_tool_error, abort_execution_on_tool_error],
 )
\ No newline at end of file
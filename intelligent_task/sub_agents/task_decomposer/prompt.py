@@ -24,9 +24,13 @@ TASK_DECOMPOSER_PROMPT = """
 输出格式要求：
 
 ## 执行步骤
-1. **步骤1**: [具体描述和要点]
-2. **步骤2**: [具体描述和要点]
-3. **步骤3**: [具体描述和要点]
+1. **步骤1**: [具体描述和要点]（依赖: 无）
+2. **步骤2**: [具体描述和要点]（依赖: 1）
+3. **步骤3**: [具体描述和要点]（依赖: 1, 2）
 [继续列出所有必要步骤...]
 
+依赖标注要求：
+- 每个步骤末尾用"（依赖: 步骤编号）"标明必须先完成的步骤，没有前置步骤时写"（依赖: 无）"
+- 只标注真正需要其结果作为输入的步骤，互不依赖的步骤会被并行执行
+
 """
\ No newline at end of file
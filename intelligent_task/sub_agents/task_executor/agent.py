@@ -4,235 +4,318 @@
 
 import json
 import re
-from typing import Optional
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
 from google.adk.agents import Agent
 from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import llm_request as llm_request_module
 from google.adk.models import llm_response as llm_response_module
-from google.adk.tools.mcp_tool.mcp_toolset import MCPToolset, StdioConnectionParams, StdioServerParameters
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.tool_context import ToolContext
+from google.genai import types
 
 from . import prompt
+from ...shared_libraries.execution_context import build_previous_context
+from ...shared_libraries.mcp_pool import LazyMCPToolset
+from ...shared_libraries.model_router import TIER_ORDER, TieredLlm, model_for, record_model_usage, select_model
+from ...shared_libraries.prompt_cache import account_prompt_tokens, account_usage_tokens
+from ...shared_libraries.step_cost import step_tier
+from ...shared_libraries.task_result import TASK_RESULTS_KEY, TASK_RESULT_STATUSES, TaskResult, save_task_result
+from ...shared_libraries.task_store import TaskRecord, TaskStore, task_status_key
+from ...shared_libraries.tool_cache import tool_cache
+from ...shared_libraries.tool_output import cap_tool_response, read_output_chunks
+from ...shared_libraries.tracing import (
+    trace_agent_end,
+    trace_agent_start,
+    trace_model_end,
+    trace_model_error,
+    trace_model_start,
+    trace_tool_end,
+    trace_tool_error,
+    trace_tool_start,
+)
 
-MODEL = "gemini-2.0-flash"
+MODEL = model_for("executor")
 
+# 多个轻量任务合并为一次执行时，由调度器写入本批次的任务ID列表
+CURRENT_BATCH_KEY = "current_batch_task_ids"
 
-def update_task_execution_status(
+# 按invocation_id缓存的任务存储，同一次执行中的指令、回调和工具共享，数量有上限
+MAX_CACHED_STORES = 256
+_invocation_stores: "OrderedDict[str, TaskStore]" = OrderedDict()
+
+
+def route_step_model(
     callback_context: CallbackContext,
-    llm_response: llm_response_module.LlmResponse,
+    llm_request: llm_request_module.LlmRequest,
 ) -> Optional[llm_response_module.LlmResponse]:
     """
-    更新任务执行状态和结果
+    按本次执行的步骤开销选择模型分级，合并执行多个步骤时取其中最高的分级
     """
-    if not llm_response.content or not llm_response.content.parts:
+    current_tasks = get_current_tasks(callback_context)
+    if not current_tasks:
         return None
-        
-    response_text = ""
-    for part in llm_response.content.parts:
-        if hasattr(part, 'text') and part.text is not None:
-            response_text += part.text
+    tier = max((step_tier(task) for task in current_tasks), key=TIER_ORDER.index)
+    llm_request.model = select_model(callback_context.state, tier)
+    return None
+
+
+def report_task_result(task_id: int, status: str, summary: str, failure_reason: str, tool_context: ToolContext) -> dict:
+    """
+    上报一个任务的最终执行结果。每个任务完成或确定无法完成时调用一次，调用后该任务结束。
+
+    Args:
+        task_id: 要上报结果的任务ID
+        status: "completed" 表示任务已完成，"failed" 表示无法完成任务
+        summary: 执行结果总结，后续步骤会以此作为输入和参考
+        failure_reason: 无法完成任务时的具体原因，任务完成时传空字符串
+
+    Returns:
+        上报结果
+    """
+    if status not in TASK_RESULT_STATUSES:
+        return {"error": f"status必须是 {' 或 '.join(TASK_RESULT_STATUSES)}"}
     
-    # 首先设置当前执行的任务ID（如果还没设置）
-    task_list = callback_context.state.get("confirmed_task_list", [])
-    current_task_id = callback_context.state.get("current_executing_task_id")
+    current_tasks = get_current_tasks(tool_context)
+    if not current_tasks:
+        return {"error": "没有找到正在执行的任务"}
     
-    if not current_task_id and task_list:
-        # 找到第一个待执行的任务并设置为当前执行任务
-        for task in task_list:
-            if task.get("status") == "pending":
-                callback_context.state["current_executing_task_id"] = task["id"]
-                current_task_id = task["id"]
-                print(f"开始执行任务 {current_task_id}: {task.get('title', '')}")
-                break
+    current_task = next((task for task in current_tasks if task.id == task_id), None)
+    if current_task is None:
+        if len(current_tasks) > 1:
+            task_ids = ", ".join(str(task.id) for task in current_tasks)
+            return {"error": f"task_id必须是本次执行的任务之一: {task_ids}"}
+        # 只执行一个任务时以当前任务为准
+        current_task = current_tasks[0]
     
-    # 检查是否包含任务完成或失败标识
-    if current_task_id and task_list:
-        task_completed = "任务完成" in response_text or "任务已完成" in response_text or "✅" in response_text
-        task_failed = "无法完成任务" in response_text or "不能完成" in response_text or "失败" in response_text
-        
-        if task_completed or task_failed:
-            # 更新对应任务的状态
-            for task in task_list:
-                if task["id"] == current_task_id:
-                    task["status"] = "completed" if task_completed else "failed"
-                    task["execution_result"] = response_text[:500]  # 保存前500字符的执行结果
-                    status_text = "执行完成" if task_completed else "执行失败"
-                    print(f"任务 {current_task_id} {status_text}")
-                    break
-            
-            # 更新session.state
-            callback_context.state["confirmed_task_list"] = task_list
-            # 清除当前执行任务ID
-            callback_context.state["current_executing_task_id"] = None
+    save_task_result(tool_context.state, TaskResult(
+        task_id=current_task.id,
+        status=status,
+        summary=summary,
+        failure_reason=failure_reason,
+    ))
+    # 只增量写入该任务的状态
+    tool_context.state[task_status_key(current_task.id)] = status
     
+    # 本次的任务都已上报或有任务失败时结束执行，结果已结构化保存，无需再调用模型总结工具结果
+    reported = tool_context.state.get(TASK_RESULTS_KEY) or {}
+    if status == "failed" or all(str(task.id) in reported for task in current_tasks):
+        tool_context.actions.skip_summarization = True
+    status_text = "执行完成" if status == "completed" else "执行失败"
+    print(f"任务 {current_task.id} {status_text}")
+    return {"recorded": True, "task_id": current_task.id, "status": status}
+
+
+# 本次由缓存直接返回结果的工具调用ID，after_tool_callback中不再重复缓存
+_cached_tool_calls = set()
+
+
+def load_cached_tool_result(
+    tool: BaseTool,
+    args: Dict[str, Any],
+    tool_context: ToolContext,
+) -> Optional[dict]:
+    """
+    相同参数的工具调用已有未过期的缓存结果时直接返回，跳过实际调用
+    """
+    cached = tool_cache.get(tool.name, args)
+    if cached is not None:
+        _cached_tool_calls.add(tool_context.function_call_id)
+        print(f"命中工具调用缓存: {tool.name}")
+    return cached
+
+
+def cache_tool_result(
+    tool: BaseTool,
+    args: Dict[str, Any],
+    tool_context: ToolContext,
+    tool_response: Any,
+) -> Optional[dict]:
+    """
+    缓存工具调用结果，写入类文件系统工具调用后清除文件系统缓存
+    """
+    if tool_context.function_call_id in _cached_tool_calls:
+        _cached_tool_calls.discard(tool_context.function_call_id)
+        return None
+    tool_cache.record_call(tool.name, args, tool_response)
     return None
 
 
+def limit_tool_output(
+    tool: BaseTool,
+    args: Dict[str, Any],
+    tool_context: ToolContext,
+    tool_response: Any,
+) -> Optional[dict]:
+    """
+    限制工具结果进入上下文的长度，超长的结果按与当前任务的相关性选取段落
+
+    需放在cache_tool_result之后，缓存中保存完整结果
+    """
+    current_tasks = get_current_tasks(tool_context)
+    query = " ".join(f"{task.title} {task.description}" for task in current_tasks)
+    capped = cap_tool_response(tool_response, query)
+    if capped is not None:
+        print(f"工具 {tool.name} 的结果过长，已按相关性截取")
+    return capped
+
+
+def read_tool_output(output_id: str, start_chunk: int) -> dict:
+    """
+    分段读取过长而被截取的工具结果的完整内容
+
+    Args:
+        output_id: 截取说明中给出的output_id
+        start_chunk: 从第几段开始读取，从1开始
+
+    Returns:
+        读取的内容，next_chunk为下一次读取的起始段，已读到末尾时为null
+    """
+    try:
+        return read_output_chunks(output_id, start_chunk)
+    except (KeyError, OSError) as e:
+        return {"error": str(e)}
+
+
+# 执行器使用的MCP服务、显示名称及任务中引用该服务的关键词
+# 关键词为None表示始终可用（搜索是执行任务时的通用手段）
+EXECUTOR_MCP_SERVERS = [
+    ("brave-search", "BraveSearch", None),
+    ("fetch", "Fetch", ["网页", "网站", "链接", "url", "http", "抓取", "下载"]),
+    ("filesystem", "FileSystem", ["文件", "目录", "文件夹", "保存", "读取", "写入", "file"]),
+    ("time", "Time", ["时间", "日期", "时区", "今天", "现在", "time", "date"]),
+    ("office-word", "Office Word", ["word", "文档", "docx", "报告"]),
+    ("office-excel", "Office Excel", ["excel", "表格", "xlsx", "电子表格"]),
+]
+
+
+def get_task_store(context) -> TaskStore:
+    """
+    获取本次执行的任务存储
+
+    每次执行只从state构建一次，之后的指令、回调和工具调用直接复用。执行期间任务状态由
+    监控agent在父会话中更新，执行器会话中的任务计划和状态不会变化
+    """
+    store = _invocation_stores.get(context.invocation_id)
+    if store is None:
+        store = _invocation_stores[context.invocation_id] = TaskStore.from_state(context.state)
+        while len(_invocation_stores) > MAX_CACHED_STORES:
+            _invocation_stores.popitem(last=False)
+    return store
+
+
+def release_task_store(callback_context: CallbackContext) -> Optional[types.Content]:
+    """after_agent_callback：执行结束后释放本次执行缓存的任务存储"""
+    _invocation_stores.pop(callback_context.invocation_id, None)
+    return None
+
+
+def get_current_task(context) -> Optional[TaskRecord]:
+    """
+    获取当前要执行的任务
+
+    并发调度时由调度器通过current_executing_task_id指定任务，否则取第一个待执行的任务
+    """
+    store = get_task_store(context)
+    current_task_id = context.state.get("current_executing_task_id")
+    if current_task_id is not None:
+        return store.get(current_task_id)
+    return store.next_pending()
+
+
+def get_current_tasks(context) -> List[TaskRecord]:
+    """获取本次要执行的所有任务，合并执行轻量任务时返回整个批次"""
+    batch_ids = context.state.get(CURRENT_BATCH_KEY)
+    if batch_ids:
+        store = get_task_store(context)
+        return [task for task in map(store.get, batch_ids) if task is not None]
+    current_task = get_current_task(context)
+    return [current_task] if current_task is not None else []
+
+
+def _task_references(keywords):
+    """生成判断当前任务是否引用了某个MCP服务的函数"""
+
+    def should_load(readonly_context) -> bool:
+        current_tasks = get_current_tasks(readonly_context)
+        if not current_tasks:
+            return True
+        task_text = " ".join(f"{task.title} {task.description}" for task in current_tasks).lower()
+        return any(keyword in task_text for keyword in keywords)
+
+    return should_load
+
+
 # 创建MCP工具集
 def create_mcp_toolsets():
-    """创建所有MCP工具集"""
+    """
+    创建所有MCP工具集
+
+    工具集延迟初始化：首次被使用时才从进程级服务池获取并启动服务进程，
+    并且只向执行器暴露当前任务引用到的服务。time、filesystem和fetch默认
+    使用进程内的原生工具，不启动服务进程
+    """
     toolsets = []
     
-    # BraveSearch工具
-    try:
-        brave_search_toolset = MCPToolset(
-            connection_params=StdioConnectionParams(
-                server_params=StdioServerParameters(
-                    command="npx",
-                    args=["@modelcontextprotocol/server-brave-search"]
-                )
-            )
-        )
-        toolsets.append(brave_search_toolset)
-    except Exception as e:
-        print(f"BraveSearch工具初始化失败: {e}")
-    
-    # Fetch工具
-    try:
-        fetch_toolset = MCPToolset(
-            connection_params=StdioConnectionParams(
-                server_params=StdioServerParameters(
-                    command="npx",
-                    args=["@modelcontextprotocol/server-fetch"]
-                )
-            )
-        )
-        toolsets.append(fetch_toolset)
-    except Exception as e:
-        print(f"Fetch工具初始化失败: {e}")
-    
-    # FileSystem工具
-    try:
-        filesystem_toolset = MCPToolset(
-            connection_params=StdioConnectionParams(
-                server_params=StdioServerParameters(
-                    command="npx",
-                    args=["@modelcontextprotocol/server-filesystem"]
-                )
-            )
-        )
-        toolsets.append(filesystem_toolset)
-    except Exception as e:
-        print(f"FileSystem工具初始化失败: {e}")
-    
-    # Time工具
-    try:
-        time_toolset = MCPToolset(
-            connection_params=StdioConnectionParams(
-                server_params=StdioServerParameters(
-                    command="npx",
-                    args=["@modelcontextprotocol/server-time"]
-                )
-            )
-        )
-        toolsets.append(time_toolset)
-    except Exception as e:
-        print(f"Time工具初始化失败: {e}")
-    
-    # Office Word工具
-    try:
-        office_word_toolset = MCPToolset(
-            connection_params=StdioConnectionParams(
-                server_params=StdioServerParameters(
-                    command="npx",
-                    args=["@modelcontextprotocol/server-office-word"]
-                )
-            )
-        )
-        toolsets.append(office_word_toolset)
-    except Exception as e:
-        print(f"Office Word工具初始化失败: {e}")
-    
-    # Office Excel工具
-    try:
-        office_excel_toolset = MCPToolset(
-            connection_params=StdioConnectionParams(
-                server_params=StdioServerParameters(
-                    command="npx",
-                    args=["@modelcontextprotocol/server-office-excel"]
-                )
-            )
-        )
-        toolsets.append(office_excel_toolset)
-    except Exception as e:
-        print(f"Office Excel工具初始化失败: {e}")
+    for server_name, display_name, keywords in EXECUTOR_MCP_SERVERS:
+        try:
+            toolsets.append(LazyMCPToolset(
+                server_name,
+                should_load=_task_references(keywords) if keywords else None,
+            ))
+        except Exception as e:
+            print(f"{display_name}工具初始化失败: {e}")
     
     return toolsets
 
 
-def get_task_executor_instruction(context) -> str:
+def get_batch_instruction(state, tasks: List[TaskRecord]) -> str:
     """
-    动态生成任务执行指令，包含前面步骤的上下文
+    生成合并执行多个轻量任务的指令
+
+    前面步骤的上下文只包含批次外的依赖任务，批次内前面任务的结果在本次对话中可见
     """
-    # 从task_monitor传递的当前任务信息中获取任务
-    # 这里我们需要从用户的调用上下文中解析当前任务
-    task_list = context.state.get("confirmed_task_list", [])
+    batch_ids = {task.id for task in tasks}
+    outside_deps = sorted({dep for task in tasks for dep in task.depends_on} - batch_ids)
+    previous_context = build_previous_context(
+        state, TaskRecord(id=0, title="", description="", depends_on=outside_deps, status="running")
+    )
+    task_lines = "\n".join(f"- 任务{task.id}: {task.title} - {task.description}" for task in tasks)
     
-    if not task_list:
+    return f"""**当前任务**（都很简单，请按顺序执行，每个任务分别上报结果）:
+{task_lines}
+
+{previous_context}""".rstrip()
+
+
+def get_task_executor_instruction(context) -> str:
+    """
+    动态生成当前任务和前面步骤上下文的指令
+
+    不变的执行要求和工具说明在静态指令TASK_EXECUTOR_STATIC_PROMPT中，这里只生成随任务变化的部分
+    """
+    if not TaskStore.exists(context.state):
         return "没有找到需要执行的任务列表。"
     
-    # 找到第一个待执行的任务
-    current_task = None
-    for task in task_list:
-        if task.get("status") == "pending":
-            current_task = task
-            break
+    current_tasks = get_current_tasks(context)
     
-    if not current_task:
+    if not current_tasks:
         return "没有找到待执行的任务。"
+    if len(current_tasks) > 1:
+        return get_batch_instruction(context.state, current_tasks)
+    current_task = current_tasks[0]
     
-    # 注意：在指令函数中不能修改只读的context.state
-    # current_executing_task_id 将在回调函数中设置
+    # 获取当前任务依赖的前面步骤执行结果作为上下文（已按token预算截断）
+    previous_context = build_previous_context(context.state, current_task)
     
-    # 获取前面步骤的执行结果作为上下文
-    execute_results = context.state.get("execute_result", [])
-    previous_context = ""
-    if execute_results:
-        previous_context = "\\n\\n**前面步骤的执行结果上下文**：\\n"
-        for i, result in enumerate(execute_results, 1):
-            status_icon = "✅" if result.get("status") == "completed" else "❌"
-            previous_context += f"步骤{i} - {result.get('task_title', '')} {status_icon}:\\n"
-            previous_context += f"执行结果: {result.get('execution_result', '')[:300]}...\\n\\n"
-    
-    instruction = f"""现在需要执行以下任务：
-
-**当前任务**:
-- 任务标题: {current_task['title']}
-- 任务描述: {current_task['description']}
-- 任务ID: {current_task['id']}
-
-{previous_context}
-
-**执行要求**：
-请按照Think-Act-Observe的循环模式来执行这个任务：
-
-1. **🤔 思考阶段**：
-   - 仔细分析当前任务的具体要求
-   - 考虑前面步骤的执行结果和上下文
-   - 制定合适的执行策略和步骤
-
-2. **🚀 行动阶段**：
-   - 使用合适的工具执行具体操作
-   - 根据需要搜索信息、处理文件等
-   - 如果需要用户补充信息，请直接询问
-
-3. **👀 观察阶段**：
-   - 评估执行结果是否满足任务要求
-   - 判断任务是否已经完成
-   - 决定是否需要继续循环
-
-**可用工具**：
-- braveSearch: 搜索网络信息
-- fetch: 获取网页内容
-- fileSystem: 文件操作
-- time: 时间相关操作
-- office_word: Word文档处理
-- office_excel: Excel表格处理
-
-**重要说明**：
-- 如果你判断无法完成这个任务，请明确说明"无法完成任务"并详细解释原因
-- 如果任务完成，请明确说明"任务已完成"并总结执行结果
-- 请充分利用前面步骤的执行结果作为当前任务的输入和参考"""
+    instruction = f"""**当前任务**:
+- 任务标题: {current_task.title}
+- 任务描述: {current_task.description}
+- 任务ID: {current_task.id}
+
+{previous_context}"""
     
-    return instruction
+    return instruction.rstrip()
 
 
 # 创建任务执行agent
@@ -241,19 +324,36 @@ try:
     
     task_executor_agent = Agent(
         name="task_executor_agent",
-        model=MODEL,
+        model=TieredLlm(model=MODEL),
         description="基于Think-Act-Observe模式的任务执行器，能够使用多种工具执行具体任务",
+        static_instruction=prompt.TASK_EXECUTOR_STATIC_PROMPT,
         instruction=get_task_executor_instruction,
-        tools=mcp_toolsets,
-        after_model_callback=update_task_execution_status,
+        tools=[*mcp_toolsets, read_tool_output, report_task_result],
+        before_agent_callback=trace_agent_start,
+        after_agent_callback=[trace_agent_end, release_task_store],
+        before_model_callback=[route_step_model, account_prompt_tokens, trace_model_start],
+        after_model_callback=[trace_model_end, account_usage_tokens, record_model_usage],
+        on_model_error_callback=trace_model_error,
+        before_tool_callback=[trace_tool_start, load_cached_tool_result],
+        after_tool_callback=[trace_tool_end, cache_tool_result, limit_tool_output],
+        on_tool_error_callback=trace_tool_error,
     )
 except Exception as e:
     print(f"创建task_executor_agent失败: {e}")
     # 创建没有工具的基础版本
     task_executor_agent = Agent(
         name="task_executor_agent",
-        model=MODEL,
+        model=TieredLlm(model=MODEL),
         description="基于Think-Act-Observe模式的任务执行器",
+        static_instruction=prompt.TASK_EXECUTOR_STATIC_PROMPT,
         instruction=get_task_executor_instruction,
-        after_model_callback=update_task_execution_status,
+        tools=[report_task_result],
+        before_agent_callback=trace_agent_start,
+        after_agent_callback=[trace_agent_end, release_task_store],
+        before_model_callback=[route_step_model, account_prompt_tokens, trace_model_start],
+        after_model_callback=[trace_model_end, account_usage_tokens, record_model_usage],
+        on_model_error_callback=trace_model_error,
+        before_tool_callback=trace_tool_start,
+        after_tool_callback=trace_tool_end,
+        on_tool_error_callback=trace_tool_error,
     )
\ No newline at end of file
@@ -1,139 +1,272 @@
 """
-任务监控子Agent - 自动执行任务列表中的任务
+任务监控子Agent - 不经过模型，直接按依赖关系调度任务列表中的任务并调用执行器执行
 """
 
-import json
-from typing import Optional
-from google.adk.agents import Agent
-from google.adk.agents.callback_context import CallbackContext
-from google.adk.models import llm_response as llm_response_module
-from google.adk.tools.agent_tool import AgentTool
+from typing import AsyncGenerator, Dict, List, Optional
+from google.adk.agents import BaseAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event, EventActions
+from google.adk.sessions.state import State
+from google.genai import types
 
-from . import prompt
-from ..task_executor.agent import task_executor_agent
+from ..task_executor.agent import CURRENT_BATCH_KEY, task_executor_agent
+from ...shared_libraries.blob_store import load_text, offload_text
+from ...shared_libraries.checkpoint import checkpoint_plan, checkpoint_task, restore_checkpoint
+from ...shared_libraries.execution_context import EXECUTION_CONTEXT_KEY, record_task_summary
+from ...shared_libraries.model_router import MODEL_USAGE_KEY, merge_model_usage
+from ...shared_libraries.plan_parser import PlanStream
+from ...shared_libraries.prompt_cache import create_agent_app
+from ...shared_libraries.task_result import TASK_RESULTS_KEY, get_task_result, infer_status_from_text, save_task_result
+from ...shared_libraries.task_scheduler import TaskScheduler
+from ...shared_libraries.task_store import TaskRecord, TaskStore
+from ...shared_libraries.tool_output import cap_text
+from ...shared_libraries.tracing import trace_agent_end, trace_agent_start
 
-MODEL = "gemini-2.0-flash"
 
-
-def update_execution_results(
-    callback_context: CallbackContext,
-    llm_response: llm_response_module.LlmResponse,
-) -> Optional[llm_response_module.LlmResponse]:
+async def run_executor_for_tasks(tasks: List[TaskRecord], parent_state, user_id: str) -> Dict[int, str]:
     """
-    更新任务执行结果到session.state
+    在独立会话中运行task_executor_agent执行一个或多个任务
+
+    子会话复制父会话的state，并通过current_executing_task_id指定要执行的任务，
+    因此多个任务可以同时执行而互不干扰。多个轻量任务合并执行时通过
+    current_batch_task_ids指定整个批次，执行器为每个任务分别上报结果。
+    每个任务的执行结果分别写回父会话的execute_result，较长的结果只保存blob引用。
+
+    Args:
+        tasks: 要执行的任务，多个任务时按顺序在同一次执行中完成
+        parent_state: 父会话的state，可以是session.state或普通字典
+        user_id: 运行子会话的用户ID
+
+    Returns:
+        {任务ID: 状态}，只执行一个任务时总有结果，合并执行时不包含未上报结果的任务
     """
-    if not llm_response.content or not llm_response.content.parts:
-        return None
-        
+    # Runner只在真正执行任务时才需要，延迟导入以加快agent的导入速度
+    from google.adk.runners import Runner
+    from google.adk.sessions import InMemorySessionService
+
+    runner = Runner(
+        app=create_agent_app(task_executor_agent.name, task_executor_agent),
+        session_service=InMemorySessionService(),
+    )
+    parent_items = parent_state.to_dict() if hasattr(parent_state, "to_dict") else parent_state
+    state = {
+        k: v for k, v in parent_items.items()
+        if not k.startswith("_adk")
+    }
+    task_ids = {str(task.id) for task in tasks}
+    state["current_executing_task_id"] = tasks[0].id
+    if len(tasks) > 1:
+        state[CURRENT_BATCH_KEY] = [task.id for task in tasks]
+    # 去掉这些任务以前上报的结果，避免重新执行时读到旧结果
+    state[TASK_RESULTS_KEY] = {
+        k: v for k, v in (state.get(TASK_RESULTS_KEY) or {}).items() if k not in task_ids
+    }
+    usage_before = state.get(MODEL_USAGE_KEY)
+    session = await runner.session_service.create_session(
+        app_name=task_executor_agent.name, user_id=user_id, state=state
+    )
+
+    if len(tasks) > 1:
+        print(f"开始合并执行任务 {', '.join(str(task.id) for task in tasks)}")
+        request = "请依次执行以下任务:\n" + "\n".join(
+            f"任务 {task.id}: {task.title} - {task.description}" for task in tasks
+        )
+    else:
+        print(f"开始执行任务 {tasks[0].id}: {tasks[0].title}")
+        request = f"请执行任务 {tasks[0].id}: {tasks[0].title} - {tasks[0].description}"
     response_text = ""
-    for part in llm_response.content.parts:
-        if hasattr(part, 'text') and part.text is not None:
-            response_text += part.text
-    
-    # 获取当前执行的任务ID
-    current_task_id = callback_context.state.get("current_executing_task_id")
-    task_list = callback_context.state.get("confirmed_task_list", [])
-    
-    if current_task_id and task_list:
-        # 初始化execute_result数组如果不存在
-        if "execute_result" not in callback_context.state:
-            callback_context.state["execute_result"] = []
-        
-        # 创建执行结果记录
+    async for event in runner.run_async(
+        user_id=user_id,
+        session_id=session.id,
+        new_message=types.Content(role="user", parts=[types.Part(text=request)]),
+    ):
+        if event.content and event.content.parts:
+            text = "".join(part.text for part in event.content.parts if part.text)
+            if text:
+                response_text = text
+
+    # 读取执行器通过report_task_result上报的结构化结果
+    session = await runner.session_service.get_session(
+        app_name=task_executor_agent.name, user_id=user_id, session_id=session.id
+    )
+    merge_model_usage(parent_state, usage_before, session.state.get(MODEL_USAGE_KEY))
+    statuses = {}
+    for task in tasks:
+        task_result = get_task_result(session.state, task.id)
+        if task_result is not None:
+            save_task_result(parent_state, task_result)
+            status = task_result.status
+            result_text = task_result.summary
+            if task_result.failure_reason:
+                result_text += f"\n失败原因: {task_result.failure_reason}"
+        elif len(tasks) == 1:
+            status = infer_status_from_text(response_text)
+            # 没有结构化结果时只保存与任务相关的部分，完整回复保存在blob存储中
+            result_text = cap_text(response_text, f"{task.title} {task.description}")
+        else:
+            continue
+
         execution_record = {
-            "task_id": current_task_id,
-            "task_title": "",
-            "task_description": "",
-            "execution_result": response_text,
-            "status": "completed",
-            "timestamp": None  # 可以添加时间戳
+            "task_id": task.id,
+            "task_title": task.title,
+            "task_description": task.description,
+            # 较长的执行结果转存到blob存储，state中只保留引用
+            "execution_result": offload_text(result_text),
+            "status": status,
+            "timestamp": None
         }
-        
-        # 找到对应的任务并获取详细信息
-        for task in task_list:
-            if task["id"] == current_task_id:
-                execution_record["task_title"] = task.get("title", "")
-                execution_record["task_description"] = task.get("description", "")
-                task["status"] = "completed"
-                break
-        
-        # 检查是否任务执行失败
-        if "无法完成" in response_text or "不能完成" in response_text or "失败" in response_text:
-            execution_record["status"] = "failed"
-            # 更新对应任务状态
-            for task in task_list:
-                if task["id"] == current_task_id:
-                    task["status"] = "failed"
-                    break
-        
-        # 添加到执行结果数组
-        callback_context.state["execute_result"].append(execution_record)
-        
-        # 更新任务列表
-        callback_context.state["confirmed_task_list"] = task_list
-        
-        print(f"任务 {current_task_id} 执行结果已保存")
-    
-    return None
-
-
-def get_task_monitor_instruction(context) -> str:
+        execute_results = list(parent_state.get("execute_result") or [])
+        execute_results.append(execution_record)
+        parent_state["execute_result"] = execute_results
+        record_task_summary(parent_state, task, status, result_text)
+        checkpoint_task(parent_state, task.id, status, execution_record)
+        print(f"任务 {task.id} 执行结果已保存")
+        statuses[task.id] = status
+    return statuses
+
+
+async def run_executor_for_task(task: TaskRecord, parent_state, user_id: str) -> str:
+    """
+    在独立会话中运行task_executor_agent执行单个任务
+
+    Returns:
+        任务状态 "completed" 或 "failed"
+    """
+    statuses = await run_executor_for_tasks([task], parent_state, user_id)
+    return statuses[task.id]
+
+
+async def execute_plan(state, user_id: str, plan_id: Optional[str] = None) -> TaskStore:
+    """
+    按依赖关系并发执行任务计划中所有待执行的任务
+
+    先从检查点恢复已完成的任务，只执行剩余任务。依赖已满足的任务会同时派发给
+    任务执行器，任务完成后立即派发新解锁的任务，相邻的多个轻量任务合并为一次执行，
+    直到全部任务完成或有任务失败。
+
+    Args:
+        state: 保存任务计划、任务状态和执行结果的state
+        user_id: 运行执行器子会话的用户ID
+        plan_id: 要恢复的计划ID，为None时使用state中的计划ID
+
+    Returns:
+        更新状态后的任务存储
+    """
+    restore_checkpoint(state, plan_id)
+    if not TaskStore.exists(state):
+        raise KeyError(f"没有找到任务计划 {plan_id} 的检查点")
+    checkpoint_plan(state)
+    store = TaskStore.from_state(state)
+
+    async def execute_fn(task: TaskRecord) -> str:
+        return await run_executor_for_task(task, state, user_id)
+
+    async def execute_batch_fn(tasks: List[TaskRecord]) -> Dict[int, str]:
+        return await run_executor_for_tasks(tasks, state, user_id)
+
+    # 调度器在每个任务状态变化时增量写入state
+    return await TaskScheduler().run(store, execute_fn, state, execute_batch_fn=execute_batch_fn)
+
+
+async def resume_plan(plan_id: str, state, user_id: str) -> TaskStore:
+    """
+    从检查点继续执行任务计划
+
+    进程崩溃或重启后调用，已完成的任务不会重新执行，失败和中断的任务重新执行。
+
+    Args:
+        plan_id: 任务计划ID（state中的task_plan_id）
+        state: 恢复到的state，可以是session.state或普通字典
+        user_id: 运行执行器子会话的用户ID
+
+    Returns:
+        更新状态后的任务存储
+    """
+    return await execute_plan(state, user_id, plan_id)
+
+
+async def execute_streaming_plan(plan_stream: PlanStream, state, user_id: str) -> TaskStore:
+    """
+    边接收任务拆解输出的步骤边执行
+
+    步骤的依赖一满足就派发执行，不必等待整个计划输出完毕。开启
+    EXECUTE_WHILE_DECOMPOSING时由任务拆解agent在拆解开始时订阅步骤流并调用。
+
+    Args:
+        plan_stream: 任务步骤流
+        state: 保存任务计划、任务状态和执行结果的state
+        user_id: 运行执行器子会话的用户ID
+
+    Returns:
+        更新状态后的任务存储
     """
-    动态生成任务监控指令 - 现在负责自动执行任务
+    async def execute_fn(task: TaskRecord) -> str:
+        # 计划边接收边增长，执行任务前保存当前已知的计划
+        checkpoint_plan(state)
+        return await run_executor_for_task(task, state, user_id)
+
+    async def execute_batch_fn(tasks: List[TaskRecord]) -> Dict[int, str]:
+        checkpoint_plan(state)
+        return await run_executor_for_tasks(tasks, state, user_id)
+
+    return await TaskScheduler().run(
+        TaskStore(), execute_fn, state, plan_stream=plan_stream, execute_batch_fn=execute_batch_fn
+    )
+
+
+def build_execution_report(state, store: TaskStore) -> str:
+    """生成任务执行情况报告，作为监控agent的回复返回给协调器"""
+    summaries = state.get(EXECUTION_CONTEXT_KEY) or {}
+    failed_tasks = store.with_status("failed")
+    unfinished_tasks = store.with_status("pending", "running")
+
+    lines = []
+    if failed_tasks:
+        lines.append("❌ 有任务执行失败，已终止执行流程：")
+    elif unfinished_tasks:
+        lines.append("⚠️ 部分任务未能执行：")
+    else:
+        lines.append("🎉 恭喜！所有任务都已执行完成：")
+    for i, task in enumerate(store.with_status("completed", "failed", "pending", "running"), 1):
+        status_icon = {"completed": "✅", "failed": "❌"}.get(task.status, "⏸️")
+        lines.append(f"{i}. {status_icon} {task.title}")
+        summary = load_text((summaries.get(str(task.id)) or {}).get("summary"))
+        if summary and task.status in ("completed", "failed"):
+            lines.append(f"   执行结果: {summary}")
+    lines.append(f"\n执行进度: 已完成 {len(store.with_status('completed'))} 个任务，共 {len(store)} 个任务")
+    return "\n".join(lines)
+
+
+class TaskExecutionController(BaseAgent):
+    """
+    确定性的任务执行控制器
+
+    任务调度不需要推理，因此不调用模型：直接读取任务计划，按依赖关系调用
+    task_executor_agent执行任务，任务失败时终止执行流程。执行结果与之前一样
+    写入execute_result，所有state变化通过一个事件写回会话。
     """
-    task_list = context.state.get("confirmed_task_list", [])
-    
-    if not task_list:
-        return "没有找到需要执行的任务列表。请先使用任务拆解功能创建任务。"
-    
-    # 找到第一个未完成的任务
-    pending_tasks = [task for task in task_list if task.get("status") == "pending"]
-    completed_tasks = [task for task in task_list if task.get("status") in ["completed", "failed"]]
-    
-    if not pending_tasks:
-        # 所有任务都完成了
-        completion_report = "🎉 恭喜！所有任务都已执行完成：\\n"
-        for i, task in enumerate(completed_tasks, 1):
-            status_icon = "✅" if task.get("status") == "completed" else "❌"
-            completion_report += f"{i}. {status_icon} {task['title']}\\n"
-        completion_report += "\\n任务执行完毕！您可以查看详细的执行结果。"
-        return completion_report
-    
-    # 获取下一个要执行的任务
-    current_task = pending_tasks[0]
-    
-    # 获取之前的执行结果作为上下文
-    execute_results = context.state.get("execute_result", [])
-    previous_context = ""
-    if execute_results:
-        previous_context = "\\n\\n前面步骤的执行结果上下文：\\n"
-        for i, result in enumerate(execute_results, 1):
-            previous_context += f"步骤{i} ({result['task_title']}): {result['execution_result'][:200]}...\\n"
-    
-    instruction = f"""现在开始自动执行任务列表中的下一个任务。
-
-**当前任务**:
-- 任务ID: {current_task['id']}
-- 任务标题: {current_task['title']}
-- 任务描述: {current_task['description']}
-
-**执行进度**: 正在执行第 {len(completed_tasks) + 1} 个任务，共 {len(task_list)} 个任务
-
-{previous_context}
-
-请调用task_executor_agent来执行这个任务。task_executor会使用Think-Act-Observe模式来完成任务。
-
-如果task_executor判断无法完成任务，将终止整个执行流程并向用户说明情况。"""
-    
-    return instruction
-
-
-# 创建任务监控agent，现在集成task_executor作为子agent
-task_monitor_agent = Agent(
-    name="task_monitor_agent", 
-    model=MODEL,
-    description="任务监控和自动执行器，负责循环执行任务列表中的每个任务",
-    instruction=get_task_monitor_instruction,
-    tools=[AgentTool(agent=task_executor_agent)],
-    after_model_callback=update_execution_results,
-)
\ No newline at end of file
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        state_delta: Dict = {}
+        state = State(value=ctx.session.state, delta=state_delta)
+        if TaskStore.exists(state):
+            store = await execute_plan(state, ctx.user_id)
+            report = build_execution_report(state, store)
+        else:
+            report = "没有找到需要执行的任务列表。请先使用任务拆解功能创建任务。"
+        yield Event(
+            invocation_id=ctx.invocation_id,
+            author=self.name,
+            branch=ctx.branch,
+            content=types.Content(role="model", parts=[types.Part(text=report)]),
+            actions=EventActions(state_delta=state_delta),
+        )
+
+
+# 创建任务监控agent，直接调度task_executor执行任务
+task_monitor_agent = TaskExecutionController(
+    name="task_monitor_agent",
+    description="任务监控和自动执行器，负责按依赖关系执行任务列表中的所有任务并报告执行结果",
+    before_agent_callback=trace_agent_start,
+    after_agent_callback=trace_agent_end,
+)
@@ -0,0 +1,82 @@
+"""
+blob存储测试：state文本转存与读取、blob丢失时的标记、写入失败时保留原文本和过期清理
+"""
+
+import os
+import time
+
+import pytest
+
+from intelligent_task.shared_libraries.blob_store import (
+    BLOB_REF_KEY,
+    BlobStore,
+    is_blob_ref,
+    load_text,
+    offload_text,
+)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BlobStore(root=str(tmp_path / "blobs"), retention=60, gc_interval=3600)
+
+
+def test_put_is_content_addressed(store):
+    blob_id = store.put("相同内容")
+    assert store.put("相同内容".encode("utf-8")) == blob_id
+    assert store.get(blob_id) == "相同内容"
+    assert store.read_bytes(blob_id, 0, 3) == "相".encode("utf-8")
+    assert store.exists(blob_id)
+    assert not store.exists("../etc/passwd")
+
+
+def test_offload_and_load_round_trip(store):
+    text = "执行结果" * 500
+    ref = offload_text(text, min_bytes=1024, store=store)
+    assert is_blob_ref(ref)
+    assert ref["size"] == len(text.encode("utf-8"))
+    assert text.startswith(ref["preview"])
+    assert load_text(ref, store=store) == text
+
+
+def test_small_text_and_other_values_stay_inline(store):
+    assert offload_text("短", min_bytes=1024, store=store) == "短"
+    assert offload_text(None, store=store) is None
+    assert load_text("短", store=store) == "短"
+
+
+def test_missing_blob_returns_preview_with_marker(store):
+    ref = offload_text("执行结果" * 500, min_bytes=1024, store=store)
+    os.unlink(store._path(ref[BLOB_REF_KEY]))
+    loaded = load_text(ref, store=store)
+    assert loaded.startswith(ref["preview"])
+    assert ref[BLOB_REF_KEY] in loaded
+    assert "无法读取" in loaded
+
+
+def test_write_failure_keeps_text_inline(store, monkeypatch):
+    def fail(data):
+        raise OSError("磁盘已满")
+
+    monkeypatch.setattr(store, "put", fail)
+    text = "执行结果" * 500
+    assert offload_text(text, min_bytes=1024, store=store) == text
+
+
+def test_gc_removes_only_expired_blobs(store):
+    old_id = store.put("旧内容")
+    new_id = store.put("新内容")
+    past = time.time() - 120
+    os.utime(store._path(old_id), (past, past))
+    assert store.gc() == 1
+    assert not store.exists(old_id)
+    assert store.exists(new_id)
+
+
+def test_rewriting_refreshes_retention(store):
+    blob_id = store.put("内容")
+    past = time.time() - 120
+    os.utime(store._path(blob_id), (past, past))
+    store.put("内容")
+    assert store.gc() == 0
+    assert store.exists(blob_id)
@@ -0,0 +1,99 @@
+"""
+执行检查点测试：崩溃后从检查点恢复已完成的任务
+"""
+
+import pytest
+
+from intelligent_task.shared_libraries import checkpoint
+from intelligent_task.shared_libraries.checkpoint import (
+    CheckpointStore,
+    SQLiteCheckpointStore,
+    checkpoint_plan,
+    checkpoint_task,
+    restore_checkpoint,
+)
+from intelligent_task.shared_libraries.execution_context import EXECUTION_CONTEXT_KEY, record_task_summary
+from intelligent_task.shared_libraries.task_store import TASK_PLAN_ID_KEY, TaskRecord, TaskStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteCheckpointStore(str(tmp_path / "checkpoints.db"))
+    previous = checkpoint.get_checkpoint_store()
+    checkpoint.set_checkpoint_store(store)
+    yield store
+    checkpoint.set_checkpoint_store(previous)
+
+
+def finish(state, task_store, task_id, status):
+    task_store.set_status(task_id, status, state)
+    record_task_summary(state, task_store.get(task_id), status, f"任务{task_id}的结果")
+    checkpoint_task(state, task_id, status, {"task_id": task_id, "execution_result": f"任务{task_id}的结果", "status": status})
+
+
+def test_restores_completed_tasks_into_new_state(store):
+    state = {}
+    task_store = TaskStore(TaskRecord(i, f"任务{i}", "", [i - 1] if i > 1 else [], "pending") for i in range(1, 5))
+    task_store.save(state)
+    checkpoint_plan(state)
+    finish(state, task_store, 1, "completed")
+    finish(state, task_store, 2, "failed")
+    task_store.set_status(3, "running", state)
+    checkpoint_task(state, 3, "running")
+
+    # 进程崩溃后只剩计划ID
+    restored_state = {}
+    assert restore_checkpoint(restored_state, state[TASK_PLAN_ID_KEY]) == [1]
+    assert restored_state[TASK_PLAN_ID_KEY] == state[TASK_PLAN_ID_KEY]
+    assert TaskStore.from_state(restored_state).to_rows() == task_store.to_rows()
+    # 失败和执行中的任务恢复为待执行，会被重新执行
+    assert [task.status for task in TaskStore.from_state(restored_state)] == ["completed", "pending", "pending", "pending"]
+    assert restored_state[EXECUTION_CONTEXT_KEY]["1"]["summary"] == "任务1的结果"
+    assert [record["task_id"] for record in restored_state["execute_result"]] == [1]
+
+
+def test_running_tasks_in_existing_state_become_pending(store):
+    state = {}
+    task_store = TaskStore(TaskRecord(i, f"任务{i}", "", [], "pending") for i in (1, 2))
+    task_store.save(state)
+    checkpoint_plan(state)
+    finish(state, task_store, 1, "completed")
+    task_store.set_status(2, "running", state)
+
+    assert restore_checkpoint(state) == []
+    assert state["task_status:2"] == "pending"
+
+
+def test_unknown_plan_restores_nothing(store):
+    assert restore_checkpoint({}, "missing") == []
+
+
+def test_without_store_restores_nothing():
+    previous = checkpoint.get_checkpoint_store()
+    checkpoint.set_checkpoint_store(None)
+    try:
+        assert restore_checkpoint({}, "any") == []
+    finally:
+        checkpoint.set_checkpoint_store(previous)
+
+
+def test_checkpoint_store_is_abstract():
+    with pytest.raises(TypeError):
+        CheckpointStore()
+
+
+def test_failed_tasks_in_existing_state_are_retried(store):
+    state = {}
+    task_store = TaskStore(TaskRecord(i, f"任务{i}", "", [], "pending") for i in (1, 2))
+    task_store.save(state)
+    checkpoint_plan(state)
+    finish(state, task_store, 1, "completed")
+    finish(state, task_store, 2, "failed")
+    state["execute_result"] = [{"task_id": 1}, {"task_id": 2}]
+
+    assert restore_checkpoint(state) == []
+    assert state["task_status:1"] == "completed"
+    assert state["task_status:2"] == "pending"
+    # 失败留下的结果被去掉，重新执行后再写入
+    assert [record["task_id"] for record in state["execute_result"]] == [1]
+    assert list(state[EXECUTION_CONTEXT_KEY]) == ["1"]
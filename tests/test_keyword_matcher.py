@@ -0,0 +1,38 @@
+"""
+Aho-Corasick关键词匹配器测试：与逐个关键词查找的结果对比
+"""
+
+import random
+
+from intelligent_task.shared_libraries.keyword_matcher import KeywordAutomaton
+
+
+def brute_force(keywords, text):
+    lowered = text.lower()
+    return {index for index, (keyword, _, _) in enumerate(keywords) if keyword in lowered}
+
+
+def test_matches_brute_force_on_random_text():
+    rng = random.Random(0)
+    alphabet = "abAB任务拆解"
+    for _ in range(200):
+        keywords = [
+            ("".join(rng.choice(alphabet) for _ in range(rng.randint(1, 4))), rng.choice("xy"), 1.0)
+            for _ in range(rng.randint(1, 12))
+        ]
+        automaton = KeywordAutomaton(keywords)
+        for _ in range(10):
+            text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 30)))
+            assert automaton.find(text) == brute_force(automaton.keywords, text), (keywords, text)
+
+
+def test_overlapping_and_nested_keywords():
+    automaton = KeywordAutomaton([("he", "a", 1), ("she", "a", 1), ("his", "b", 1), ("hers", "b", 1)])
+    assert automaton.find("ushers") == {0, 1, 3}
+    assert automaton.find("UsHeRs") == {0, 1, 3}
+    assert automaton.find("") == set()
+
+
+def test_scores_count_each_keyword_once():
+    automaton = KeywordAutomaton([("分析", "complex", 2.0), ("什么", "simple", 1.0), ("报告", "complex", 1.5)])
+    assert automaton.scores("分析分析，写报告") == {"complex": 3.5}
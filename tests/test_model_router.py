@@ -0,0 +1,95 @@
+"""
+模型分级路由测试：按分级的首个响应超时和降级、实际模型和用量记录、会话预算
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+from intelligent_task.shared_libraries import model_router
+from intelligent_task.shared_libraries.model_router import MODEL_TIERS, TieredLlm
+
+FAST, STANDARD, STRONG = MODEL_TIERS["fast"], MODEL_TIERS["standard"], MODEL_TIERS["strong"]
+
+
+class DelayedLlm(BaseLlm):
+    """等待delay秒后返回模型名作为回答"""
+
+    delay: float = 0
+
+    async def generate_content_async(self, llm_request, stream=False):
+        await asyncio.sleep(self.delay)
+        yield LlmResponse(
+            content=types.Content(role="model", parts=[types.Part(text=self.model)]),
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=1000, candidates_token_count=100,
+            ),
+        )
+
+
+@pytest.fixture
+def llms(monkeypatch):
+    monkeypatch.setattr(model_router, "_llms", {
+        FAST: DelayedLlm(model=FAST, delay=0),
+        STANDARD: DelayedLlm(model=STANDARD, delay=0.2),
+        STRONG: DelayedLlm(model=STRONG, delay=0.2),
+    })
+    monkeypatch.setattr(model_router, "MODEL_TIMEOUTS", {"fast": 0, "standard": 0.05, "strong": 0})
+
+
+def _generate(model):
+    async def run():
+        llm = TieredLlm(model=model)
+        return [response async for response in llm.generate_content_async(LlmRequest(model=model))]
+
+    return asyncio.run(run())
+
+
+def test_standard_tier_falls_back_after_its_timeout(llms):
+    (response,) = _generate(STANDARD)
+    assert response.content.parts[0].text == FAST
+    assert response.custom_metadata["model"] == FAST
+
+
+def test_strong_tier_is_not_cut_off_by_default(llms):
+    (response,) = _generate(STRONG)
+    assert response.content.parts[0].text == STRONG
+    assert response.custom_metadata["latency_s"] >= 0.2
+
+
+def test_strong_tier_timeout_can_be_configured(llms, monkeypatch):
+    monkeypatch.setitem(model_router.MODEL_TIMEOUTS, "strong", 0.05)
+    monkeypatch.setitem(model_router.MODEL_TIMEOUTS, "standard", 0)
+    (response,) = _generate(STRONG)
+    assert response.content.parts[0].text == STANDARD
+
+
+def test_timeout_for_unknown_model_is_unlimited():
+    assert model_router.timeout_for("unknown-model") == 0
+    assert model_router.fallback_model("unknown-model") is None
+    assert model_router.fallback_model(FAST) is None
+
+
+def test_records_actual_model_usage(llms):
+    (response,) = _generate(FAST)
+    context = SimpleNamespace(state={}, agent_name="task_executor_agent")
+    model_router.record_model_usage(context, response)
+    usage = context.state[model_router.MODEL_USAGE_KEY]
+    assert usage["calls"] == 1
+    input_price, output_price = model_router.MODEL_PRICES.get(FAST, (0.0, 0.0))
+    assert usage["cost"] == pytest.approx((1000 * input_price + 100 * output_price) / 1e6)
+
+
+def test_over_budget_sessions_use_fast_tier(monkeypatch):
+    monkeypatch.setattr(model_router, "SESSION_COST_BUDGET", 0.01)
+    context = SimpleNamespace(state={model_router.MODEL_USAGE_KEY: {"cost": 0.02}}, agent_name="coordinator")
+    request = LlmRequest(model=STRONG)
+    model_router.apply_budget(context, request)
+    assert request.model == FAST
+    assert model_router.select_model(context.state, "strong") == FAST
+    assert model_router.select_model({}, "strong") == STRONG
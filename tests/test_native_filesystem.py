@@ -0,0 +1,76 @@
+"""
+原生文件系统工具测试：允许目录的沙箱限制和未配置目录时的错误
+"""
+
+import asyncio
+import os
+
+import pytest
+
+from intelligent_task.shared_libraries import native_tools
+
+
+def _tool(name):
+    return next(tool for tool in native_tools.create_filesystem_toolset().tools if tool.name == name)
+
+
+def _call(name, **args):
+    return asyncio.run(_tool(name).run_async(args=args, tool_context=None))
+
+
+def _text(result):
+    return result["content"][0]["text"]
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    root = tmp_path / "workspace"
+    root.mkdir()
+    monkeypatch.setattr(native_tools, "FILESYSTEM_ALLOWED_DIRS", [os.path.realpath(root)])
+    return root
+
+
+def test_unconfigured_dirs_reject_every_call(tmp_path, monkeypatch):
+    monkeypatch.setattr(native_tools, "FILESYSTEM_ALLOWED_DIRS", [])
+    (tmp_path / "a.txt").write_text("内容")
+    for name, args in [
+        ("read_file", {"path": str(tmp_path / "a.txt")}),
+        ("write_file", {"path": "b.txt", "content": "x"}),
+        ("list_directory", {"path": str(tmp_path)}),
+        ("list_allowed_directories", {}),
+    ]:
+        result = _call(name, **args)
+        assert result["isError"], name
+        assert "FILESYSTEM_ALLOWED_DIRS" in _text(result)
+    assert not (tmp_path / "b.txt").exists()
+
+
+def test_relative_paths_resolve_inside_first_allowed_dir(workspace):
+    assert _call("create_directory", path="notes")["isError"] is False
+    assert _call("write_file", path="notes/a.txt", content="第一行\n第二行\n")["isError"] is False
+    assert (workspace / "notes" / "a.txt").read_text(encoding="utf-8") == "第一行\n第二行\n"
+    assert _text(_call("read_file", path="notes/a.txt", tail=1)) == "第二行\n"
+
+
+@pytest.mark.parametrize("path", ["../outside.txt", "/etc/passwd", "notes/../../outside.txt"])
+def test_paths_outside_allowed_dirs_are_rejected(workspace, path):
+    result = _call("read_file", path=path)
+    assert result["isError"]
+    assert "拒绝访问" in _text(result)
+
+
+def test_symlink_escape_is_rejected(workspace, tmp_path):
+    secret = tmp_path / "secret.txt"
+    secret.write_text("机密")
+    (workspace / "link.txt").symlink_to(secret)
+    assert _call("read_file", path="link.txt")["isError"]
+    assert _call("write_file", path="link.txt", content="覆盖")["isError"]
+    assert secret.read_text() == "机密"
+
+
+def test_move_file_checks_both_paths(workspace, tmp_path):
+    (workspace / "a.txt").write_text("内容")
+    assert _call("move_file", source="a.txt", destination=str(tmp_path / "a.txt"))["isError"]
+    assert (workspace / "a.txt").exists()
+    assert _call("move_file", source="a.txt", destination="b.txt")["isError"] is False
+    assert (workspace / "b.txt").read_text() == "内容"
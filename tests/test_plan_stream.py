@@ -0,0 +1,231 @@
+"""
+任务步骤流测试：拆解结束时无论是否给出步骤都关闭步骤流
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.sessions.state import State
+from google.genai import types
+
+from intelligent_task.shared_libraries import model_router
+from intelligent_task.shared_libraries.model_router import TieredLlm
+from intelligent_task.shared_libraries.plan_parser import PlanStream
+from intelligent_task.shared_libraries.task_scheduler import TaskScheduler
+from intelligent_task.shared_libraries.task_store import TaskRecord, TaskStore
+from intelligent_task.sub_agents.task_decomposer import agent as decomposer
+
+PLAN_TEXT = "## 执行步骤\n1. **调研**: 收集资料\n2. **分析**: 整理资料\n3. **汇总**: 编写报告\n"
+
+
+def make_context(session_id: str) -> SimpleNamespace:
+    return SimpleNamespace(
+        invocation_id=f"invocation-{session_id}",
+        session=SimpleNamespace(id=session_id),
+        state={},
+        user_content=None,
+    )
+
+
+def text_response(text: str, partial: bool = False) -> LlmResponse:
+    return LlmResponse(content=types.Content(role="model", parts=[types.Part(text=text)]), partial=partial)
+
+
+def drain(plan_stream: PlanStream):
+    steps = []
+    while (task := plan_stream.next_nowait()) is not None:
+        steps.append(task.id)
+    return steps
+
+
+def test_reply_without_steps_closes_stream():
+    context = make_context("no-steps")
+    plan_stream = decomposer.subscribe_plan_stream("no-steps")
+    decomposer.save_confirmed_tasks_to_state(context, text_response("请问您希望调研哪个行业？"))
+    assert drain(plan_stream) == []
+    assert plan_stream.closed
+    assert "no-steps" not in decomposer._plan_streams
+    assert "task_plan" not in context.state
+
+
+def test_plan_reply_pushes_steps_then_closes():
+    context = make_context("plan")
+    plan_stream = decomposer.subscribe_plan_stream("plan")
+    decomposer.save_confirmed_tasks_to_state(context, text_response(PLAN_TEXT))
+    assert drain(plan_stream) == [1, 2, 3]
+    assert plan_stream.closed
+    assert "plan" not in decomposer._plan_streams
+    assert [row[0] for row in context.state["task_plan"]] == [1, 2, 3]
+
+
+def test_partial_responses_push_steps_as_they_complete():
+    context = make_context("partial")
+    plan_stream = decomposer.subscribe_plan_stream("partial")
+    first, rest = PLAN_TEXT[:PLAN_TEXT.index("2.")], PLAN_TEXT[PLAN_TEXT.index("2."):]
+    decomposer.save_confirmed_tasks_to_state(context, text_response(first, partial=True))
+    assert drain(plan_stream) == [1]
+    assert not plan_stream.closed
+    decomposer.save_confirmed_tasks_to_state(context, text_response(rest, partial=True))
+    decomposer.save_confirmed_tasks_to_state(context, text_response(PLAN_TEXT))
+    assert drain(plan_stream) == [2, 3]
+    assert plan_stream.closed
+
+
+def test_function_call_response_keeps_stream_open():
+    context = make_context("tool-call")
+    plan_stream = decomposer.subscribe_plan_stream("tool-call")
+    response = LlmResponse(content=types.Content(role="model", parts=[
+        types.Part(function_call=types.FunctionCall(name="sequentialthinking", args={})),
+    ]))
+    decomposer.save_confirmed_tasks_to_state(context, response)
+    assert not plan_stream.closed
+    assert decomposer._plan_streams["tool-call"] is plan_stream
+    decomposer.save_confirmed_tasks_to_state(context, text_response("无法拆解该任务"))
+    assert drain(plan_stream) == []
+    assert plan_stream.closed
+
+
+def test_streams_are_isolated_by_session():
+    other = decomposer.subscribe_plan_stream("other-session")
+    plan_stream = decomposer.subscribe_plan_stream("this-session")
+    decomposer.save_confirmed_tasks_to_state(make_context("this-session"), text_response(PLAN_TEXT))
+    assert drain(plan_stream) == [1, 2, 3]
+    assert drain(other) == [] and not other.closed
+    decomposer.close_plan_stream(make_context("other-session"))
+    assert drain(other) == []
+    assert other.closed
+
+
+def test_next_returns_none_after_close():
+    async def scenario():
+        plan_stream = PlanStream()
+        plan_stream.push(None)
+        plan_stream.push(SimpleNamespace(id=1))
+        return await plan_stream.next(), await plan_stream.next(), plan_stream.closed
+
+    assert asyncio.run(scenario()) == (None, None, True)
+
+
+def test_plan_stream_tasks_are_executed_as_they_arrive():
+    async def scenario():
+        plan_stream = PlanStream()
+        store = TaskStore()
+        state = {}
+        executed = []
+
+        async def execute(task: TaskRecord) -> str:
+            executed.append(task.id)
+            return "completed"
+
+        run_task = asyncio.ensure_future(TaskScheduler().run(store, execute, state, plan_stream))
+        plan_stream.push(TaskRecord(1, "任务1", "", [], "pending"))
+        await asyncio.sleep(0.01)
+        # 第一个步骤在计划输出完毕之前就已执行
+        assert executed == [1]
+        plan_stream.push(TaskRecord(2, "任务2", "", [1], "pending"))
+        plan_stream.push(None)
+        await asyncio.wait_for(run_task, 5)
+        return executed, state
+
+    executed, state = asyncio.run(scenario())
+    assert executed == [1, 2]
+    assert [row[0] for row in state["task_plan"]] == [1, 2]
+
+
+def test_empty_plan_stream_returns_when_closed():
+    async def scenario():
+        plan_stream = PlanStream()
+        run_task = asyncio.ensure_future(TaskScheduler().run(TaskStore(), None, plan_stream=plan_stream))
+        await asyncio.sleep(0.01)
+        assert not run_task.done()
+        plan_stream.push(None)
+        return await asyncio.wait_for(run_task, 5)
+
+    assert len(asyncio.run(scenario())) == 0
+
+
+class RecordingLlm(BaseLlm):
+    """记录是否以流式调用的模型"""
+
+    model: str = "recording"
+    streamed: list = []
+
+    async def generate_content_async(self, llm_request, stream=False):
+        self.streamed.append(stream)
+        yield text_response("完成")
+
+
+def test_tiered_llm_can_always_stream(monkeypatch):
+    llm = RecordingLlm(streamed=[])
+    monkeypatch.setitem(model_router._llms, "recording", llm)
+
+    async def call(tiered):
+        return [r async for r in tiered.generate_content_async(LlmRequest(model="recording"), stream=False)]
+
+    asyncio.run(call(TieredLlm(model="recording")))
+    asyncio.run(call(TieredLlm(model="recording", stream_responses=True)))
+    assert llm.streamed == [False, True]
+
+
+def streaming_context(session_id: str) -> SimpleNamespace:
+    context = make_context(session_id)
+    context.state = State({}, {})
+    context.user_id = "user"
+    return context
+
+
+async def wait_for_stream(plan_stream, state, user_id):
+    while await plan_stream.next() is not None:
+        pass
+    return TaskStore()
+
+
+def test_model_error_cancels_streaming_execution(monkeypatch):
+    monkeypatch.setattr(decomposer, "EXECUTE_WHILE_DECOMPOSING", True)
+    monkeypatch.setattr(decomposer, "execute_streaming_plan", wait_for_stream)
+
+    async def scenario():
+        context = streaming_context("model-error")
+        decomposer.start_streaming_execution(context)
+        execution = decomposer._streaming_executions["model-error"][0]
+        decomposer.abort_execution_on_model_error(context, None, RuntimeError("模型断开"))
+        await asyncio.sleep(0)
+        return execution
+
+    execution = asyncio.run(scenario())
+    assert execution.cancelled()
+    assert "model-error" not in decomposer._streaming_executions
+    assert "model-error" not in decomposer._plan_streams
+
+
+def test_unfinished_execution_is_cancelled_when_task_ends(monkeypatch):
+    monkeypatch.setattr(decomposer, "EXECUTE_WHILE_DECOMPOSING", True)
+    monkeypatch.setattr(decomposer, "execute_streaming_plan", wait_for_stream)
+
+    async def decompose_and_fail():
+        decomposer.start_streaming_execution(streaming_context("task-ends"))
+        raise RuntimeError("拆解出错")
+
+    async def scenario():
+        task = asyncio.ensure_future(decompose_and_fail())
+        await asyncio.gather(task, return_exceptions=True)
+        assert "task-ends" not in decomposer._streaming_executions
+        assert "task-ends" not in decomposer._plan_streams
+
+    asyncio.run(scenario())
+
+
+def test_finished_execution_is_merged_into_state(monkeypatch):
+    monkeypatch.setattr(decomposer, "EXECUTE_WHILE_DECOMPOSING", True)
+    monkeypatch.setattr(decomposer, "execute_streaming_plan", wait_for_stream)
+
+    async def scenario():
+        context = streaming_context("finished")
+        decomposer.start_streaming_execution(context)
+        return await decomposer.finish_streaming_execution(context)
+
+    assert asyncio.run(scenario()) is None
+    assert "finished" not in decomposer._streaming_executions
@@ -0,0 +1,96 @@
+"""
+响应缓存测试：精确和相似匹配、数字与否定词保护、拆解缓存只处理新请求
+"""
+
+import time
+from types import SimpleNamespace
+
+import pytest
+from google.genai import types
+
+from intelligent_task.shared_libraries import response_cache
+from intelligent_task.shared_libraries.response_cache import ResponseCache, answer_cache
+from intelligent_task.sub_agents.task_decomposer import agent as decomposer_agent
+
+REQUEST = "帮我整理一下北京到上海的高铁班次信息，并按出发时间排序后输出表格"
+
+
+def test_exact_match_ignores_case_whitespace_and_punctuation():
+    cache = ResponseCache(similarity_threshold=1)
+    cache.put("Hello, World!", "回答")
+    assert cache.get("  hello world ") == "回答"
+    assert cache.get("hello there") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_similar_request_hits():
+    cache = ResponseCache()
+    cache.put(REQUEST, "拆解结果")
+    assert cache.get(REQUEST + "吧") == "拆解结果"
+
+
+@pytest.mark.parametrize("cached, asked", [
+    ("帮我查询3月5日北京到上海的高铁班次信息，并按出发时间排序后输出表格",
+     "帮我查询3月6日北京到上海的高铁班次信息，并按出发时间排序后输出表格"),
+    ("请帮我确认这份合同里的违约条款是否可以由甲方单方面解除并说明理由",
+     "请帮我确认这份合同里的违约条款是否不可以由甲方单方面解除并说明理由"),
+    ("Please check whether the deployment can be rolled back safely tonight",
+     "Please check whether the deployment can not be rolled back safely tonight"),
+])
+def test_digit_or_negation_change_blocks_similar_match(cached, asked):
+    cache = ResponseCache(similarity_threshold=0.8)
+    cache.put(cached, "缓存的回答")
+    assert cache.get(asked) is None
+    assert cache.get(cached) == "缓存的回答"
+
+
+def test_answer_cache_only_matches_exactly():
+    assert answer_cache.similarity_threshold >= 1
+    cache = ResponseCache(similarity_threshold=response_cache.ANSWER_SIMILARITY_THRESHOLD)
+    cache.put(REQUEST, "回答")
+    assert cache.get(REQUEST + "吧") is None
+    assert cache.get(REQUEST) == "回答"
+
+
+def test_expired_entries_and_lru_eviction():
+    cache = ResponseCache(max_entries=2, ttl_seconds=60)
+    cache.put("第一个问题", 1)
+    cache.put("第二个问题", 2)
+    cache.get("第一个问题")
+    cache.put("第三个问题", 3)
+    assert cache.get("第二个问题") is None
+    assert len(cache) == 2
+
+    cache = ResponseCache(ttl_seconds=0.01)
+    cache.put("第一个问题", 1)
+    time.sleep(0.02)
+    assert cache.get("第一个问题") is None
+    assert len(cache) == 0
+
+
+def test_returns_copies():
+    cache = ResponseCache()
+    cache.put(REQUEST, {"tasks": [{"id": 1}]})
+    cache.get(REQUEST)["tasks"].clear()
+    assert cache.get(REQUEST) == {"tasks": [{"id": 1}]}
+
+
+def _request(*contents):
+    return SimpleNamespace(contents=list(contents))
+
+
+def test_decomposition_cache_skips_tool_responses(monkeypatch):
+    lookups = []
+    monkeypatch.setattr(decomposer_agent, "get_request_text", lambda context: REQUEST)
+    monkeypatch.setattr(decomposer_agent.decomposition_cache, "get", lambda text: lookups.append(text))
+    context = SimpleNamespace(state={})
+
+    tool_response = types.Content(role="user", parts=[
+        types.Part(function_response=types.FunctionResponse(name="search", response={"result": "ok"})),
+    ])
+    assert decomposer_agent.load_cached_decomposition(context, _request(tool_response)) is None
+    assert lookups == []
+
+    user_text = types.Content(role="user", parts=[types.Part(text=REQUEST)])
+    assert decomposer_agent.load_cached_decomposition(context, _request(user_text)) is None
+    assert lookups == [REQUEST]
@@ -0,0 +1,71 @@
+"""
+进程内顺序思考引擎测试：思考记录、分支、按会话隔离、参数校验和工具契约
+"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from intelligent_task.shared_libraries.mcp_pool import MCPServerPool
+from intelligent_task.shared_libraries.native_tools import NativeToolset, SequentialThinking, ToolError
+
+
+def thought(number, total, next_needed=True, **extra):
+    return {"thought": f"第{number}步", "thoughtNumber": number, "totalThoughts": total, "nextThoughtNeeded": next_needed, **extra}
+
+
+def test_records_thoughts_and_branches():
+    engine = SequentialThinking()
+    assert engine.process("s1", thought(1, 3)) == {
+        "thoughtNumber": 1, "totalThoughts": 3, "nextThoughtNeeded": True, "branches": [], "thoughtHistoryLength": 1,
+    }
+    result = engine.process("s1", thought(2, 3, branchFromThought=1, branchId="方案B"))
+    assert result["branches"] == ["方案B"]
+    assert result["thoughtHistoryLength"] == 2
+    assert engine.process("s1", thought(2, 3, isRevision=True, revisesThought=2))["thoughtHistoryLength"] == 3
+
+
+def test_total_grows_with_thought_number():
+    engine = SequentialThinking()
+    assert engine.process("s1", thought(5, 3, next_needed=False))["totalThoughts"] == 5
+
+
+def test_sessions_are_isolated_and_bounded():
+    engine = SequentialThinking(max_sessions=2)
+    engine.process("s1", thought(1, 2))
+    engine.process("s2", thought(1, 2))
+    assert engine.process("s2", thought(2, 2))["thoughtHistoryLength"] == 2
+    engine.process("s3", thought(1, 2))
+    # s1最久未使用，被丢弃后从头开始
+    assert engine.process("s1", thought(1, 2))["thoughtHistoryLength"] == 1
+    engine.clear("s1")
+    assert engine.process("s1", thought(1, 2))["thoughtHistoryLength"] == 1
+
+
+@pytest.mark.parametrize("bad", [
+    {"thought": ""},
+    {"thoughtNumber": 0},
+    {"totalThoughts": "3"},
+    {"nextThoughtNeeded": "yes"},
+])
+def test_rejects_invalid_arguments(bad):
+    with pytest.raises(ToolError):
+        SequentialThinking().process("s1", {**thought(1, 3), **bad})
+
+
+def test_tool_matches_mcp_contract():
+    toolset = MCPServerPool()._create_toolset("sequential-thinking")
+    assert isinstance(toolset, NativeToolset)
+    (tool,) = toolset.tools
+    assert tool.name == "sequentialthinking"
+    assert tool._get_declaration().parameters.required == ["thought", "nextThoughtNeeded", "thoughtNumber", "totalThoughts"]
+
+    context = SimpleNamespace(session=SimpleNamespace(id="tool-session"))
+    result = asyncio.run(tool.run_async(args=thought(1, 2), tool_context=context))
+    assert result["isError"] is False
+    assert json.loads(result["content"][0]["text"])["thoughtHistoryLength"] == 1
+
+    error = asyncio.run(tool.run_async(args={**thought(1, 2), "thought": ""}, tool_context=context))
+    assert error["isError"] is True
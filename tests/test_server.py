@@ -0,0 +1,176 @@
+"""
+多会话服务测试：准入控制、排队背压、同一会话串行执行和优雅停机
+"""
+
+import asyncio
+
+import pytest
+from google.adk.agents import BaseAgent
+from google.adk.events import Event
+from google.genai import types
+
+from intelligent_task import server as server_module
+from intelligent_task.server import AgentServer, ServerBusyError, ServerDrainingError, create_app
+
+
+class EchoAgent(BaseAgent):
+    """等待release后回复用户消息，消息含boom时抛出异常"""
+
+    model_config = {"arbitrary_types_allowed": True, "extra": "allow"}
+
+    async def _run_async_impl(self, ctx):
+        text = ctx.user_content.parts[0].text
+        self.started.append(text)
+        await self.release.wait()
+        if "boom" in text:
+            raise ValueError("执行失败")
+        yield Event(
+            author=self.name,
+            invocation_id=ctx.invocation_id,
+            content=types.Content(role="model", parts=[types.Part(text=f"回复: {text}")]),
+        )
+
+
+@pytest.fixture(autouse=True)
+def no_side_effects(monkeypatch):
+    # 不为测试agent包装模型，也不启动和关闭真实的MCP服务池
+    monkeypatch.setattr(server_module, "install_model_limits", lambda agent: None)
+    monkeypatch.setattr(server_module.mcp_pool, "start_health_check", lambda: None)
+
+    async def close_all():
+        return None
+
+    monkeypatch.setattr(server_module.mcp_pool, "close_all", close_all)
+
+
+def _server(**kwargs):
+    agent = EchoAgent(name="echo")
+    agent.started = []
+    agent.release = asyncio.Event()
+    return AgentServer(agent=agent, **kwargs), agent
+
+
+async def _until(condition):
+    for _ in range(200):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("条件未在限时内满足")
+
+
+def test_run_before_start_is_rejected():
+    async def main():
+        server, _ = _server()
+        with pytest.raises(RuntimeError):
+            await server.run("u", "你好")
+
+    asyncio.run(main())
+
+
+def test_admission_and_backpressure():
+    async def main():
+        server, agent = _server(max_active=1, max_queue=1)
+        await server.start()
+        first = asyncio.create_task(server.run("u1", "第一条"))
+        second = asyncio.create_task(server.run("u2", "第二条"))
+        await _until(lambda: server.active == 1 and server.waiting == 1)
+
+        with pytest.raises(ServerBusyError):
+            await server.run("u3", "第三条")
+        assert agent.started == ["第一条"]
+
+        agent.release.set()
+        results = await asyncio.gather(first, second)
+        assert [result["response"] for result in results] == ["回复: 第一条", "回复: 第二条"]
+        assert server.stats() == {
+            "active": 0, "waiting": 0, "completed": 2, "failed": 0, "rejected": 1, "draining": False,
+        }
+
+    asyncio.run(main())
+
+
+def test_same_session_requests_run_in_order():
+    async def main():
+        server, agent = _server(max_active=4, max_queue=4)
+        await server.start()
+        agent.release.set()
+        first = await server.run("u", "准备")
+        agent.release.clear()
+        session_id = first["session_id"]
+        tasks = [asyncio.create_task(server.run("u", f"消息{i}", session_id)) for i in range(3)]
+        await _until(lambda: server.active == 1)
+        await asyncio.sleep(0.05)
+        assert server.active == 1 and agent.started == ["准备", "消息0"]
+        agent.release.set()
+        await asyncio.gather(*tasks)
+        assert agent.started == ["准备", "消息0", "消息1", "消息2"]
+
+    asyncio.run(main())
+
+
+def test_failures_are_counted_and_drain_waits_for_requests():
+    async def main():
+        server, agent = _server(max_active=2, max_queue=2)
+        await server.start()
+        ok = asyncio.create_task(server.run("u1", "正常"))
+        boom = asyncio.create_task(server.run("u2", "boom"))
+        await _until(lambda: server.active == 2)
+
+        drain = asyncio.create_task(server.drain(timeout=5))
+        await asyncio.sleep(0.01)
+        assert not drain.done()
+        with pytest.raises(ServerDrainingError):
+            await server.run("u3", "停机后的请求")
+
+        agent.release.set()
+        assert (await ok)["response"] == "回复: 正常"
+        with pytest.raises(ValueError):
+            await boom
+        assert await drain is True
+        stats = server.stats()
+        assert (stats["completed"], stats["failed"], stats["draining"]) == (1, 1, True)
+
+    asyncio.run(main())
+
+
+def test_drain_times_out_with_stuck_requests():
+    async def main():
+        server, agent = _server()
+        await server.start()
+        stuck = asyncio.create_task(server.run("u", "卡住"))
+        await _until(lambda: server.active == 1)
+        assert await server.drain(timeout=0.05) is False
+        agent.release.set()
+        await stuck
+
+    asyncio.run(main())
+
+
+def test_http_status_codes():
+    from fastapi.testclient import TestClient
+
+    class StubServer:
+        async def start(self):
+            pass
+
+        async def drain(self):
+            pass
+
+        async def run(self, user_id, message, session_id):
+            if message == "busy":
+                raise ServerBusyError("排队请求数已达上限")
+            if message == "draining":
+                raise ServerDrainingError("服务正在停机")
+            return {"session_id": "s1", "response": message}
+
+        def stats(self):
+            return {"active": 0}
+
+    with TestClient(create_app(StubServer())) as client:
+        assert client.post("/run", json={"user_id": "u", "message": "你好"}).json() == {
+            "session_id": "s1", "response": "你好",
+        }
+        busy = client.post("/run", json={"user_id": "u", "message": "busy"})
+        assert busy.status_code == 429 and busy.headers["Retry-After"] == "1"
+        assert client.post("/run", json={"user_id": "u", "message": "draining"}).status_code == 503
+        assert client.get("/health").json() == {"active": 0}
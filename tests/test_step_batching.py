@@ -0,0 +1,71 @@
+"""
+轻量步骤合并执行测试：轻量步骤识别、模型分级、批次组成和未上报结果的任务单独重试
+"""
+
+import asyncio
+from typing import Dict, List
+
+from intelligent_task.shared_libraries.step_cost import is_light_step, step_tier
+from intelligent_task.shared_libraries.task_scheduler import TaskScheduler
+from intelligent_task.shared_libraries.task_store import TaskRecord, TaskStore
+
+
+def task(task_id, title, depends_on=(), description=""):
+    return TaskRecord(id=task_id, title=title, description=description, depends_on=list(depends_on), status="pending")
+
+
+def test_light_and_heavy_steps():
+    assert is_light_step(task(1, "获取当前时间"))
+    assert not is_light_step(task(2, "搜索最新的行业报告"))
+    assert not is_light_step(task(3, "确认目录", description="很长的说明" * 20))
+    assert step_tier(task(1, "获取当前时间")) == "fast"
+    assert step_tier(task(2, "搜索最新的行业报告")) == "standard"
+    assert step_tier(task(4, "分析需求", description="详细说明" * 200)) == "strong"
+
+
+def run(store: TaskStore, unreported=(), max_batch_size=4) -> List[List[int]]:
+    """执行调度，返回每次执行器调用处理的任务ID"""
+    calls = []
+
+    async def execute(record: TaskRecord) -> str:
+        calls.append([record.id])
+        return "completed"
+
+    async def execute_batch(records: List[TaskRecord]) -> Dict[int, str]:
+        calls.append([record.id for record in records])
+        return {record.id: "completed" for record in records if record.id not in unreported}
+
+    scheduler = TaskScheduler(max_concurrency=4, max_batch_size=max_batch_size)
+    asyncio.run(asyncio.wait_for(scheduler.run(store, execute, execute_batch_fn=execute_batch), 5))
+    return calls
+
+
+def test_merges_light_steps_and_chains():
+    store = TaskStore([
+        task(1, "获取当前时间"),
+        task(2, "确认保存目录"),
+        task(3, "记录时间", [1]),
+        task(4, "搜索最新的行业报告", [3]),
+    ])
+    calls = run(store)
+    assert calls == [[1, 2, 3], [4]]
+    assert all(record.status == "completed" for record in store)
+
+
+def test_respects_max_batch_size():
+    store = TaskStore(task(i, f"确认参数{i}") for i in range(1, 6))
+    calls = run(store, max_batch_size=2)
+    assert sorted(len(call) for call in calls) == [1, 2, 2]
+    assert sorted(i for call in calls for i in call) == [1, 2, 3, 4, 5]
+
+
+def test_unreported_tasks_run_again_alone():
+    store = TaskStore([task(1, "获取当前时间"), task(2, "确认保存目录")])
+    calls = run(store, unreported={2})
+    assert calls == [[1, 2], [2]]
+    assert store.get(2).status == "completed"
+
+
+def test_batching_disabled_with_size_one():
+    store = TaskStore([task(1, "获取当前时间"), task(2, "确认保存目录")])
+    assert sorted(run(store, max_batch_size=1)) == [[1], [2]]
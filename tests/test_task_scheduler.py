@@ -0,0 +1,81 @@
+"""
+任务调度器测试：失败后停止派发、缺失依赖和循环依赖
+"""
+
+import asyncio
+from typing import List
+
+from intelligent_task.shared_libraries.task_scheduler import TaskScheduler
+from intelligent_task.shared_libraries.task_store import TaskRecord, TaskStore
+
+
+def make_store(*deps: List[int]) -> TaskStore:
+    """按顺序创建任务1..n，deps[i]为任务i+1的依赖"""
+    return TaskStore(
+        TaskRecord(id=i, title=f"任务{i}", description="", depends_on=list(dep), status="pending")
+        for i, dep in enumerate(deps, 1)
+    )
+
+
+def run(store: TaskStore, failing=(), delays=None, **kwargs) -> List[int]:
+    """执行调度，返回实际执行的任务ID"""
+    executed = []
+
+    async def execute(task: TaskRecord) -> str:
+        executed.append(task.id)
+        await asyncio.sleep((delays or {}).get(task.id, 0))
+        return "failed" if task.id in failing else "completed"
+
+    asyncio.run(asyncio.wait_for(TaskScheduler(max_concurrency=4).run(store, execute, **kwargs), 5))
+    return executed
+
+
+def test_runs_dependencies_before_dependents():
+    store = make_store([], [1], [1], [2, 3])
+    executed = run(store, delays={2: 0.02})
+    assert executed.index(1) < executed.index(2) < executed.index(4)
+    assert executed.index(3) < executed.index(4)
+    assert all(task.status == "completed" for task in store)
+
+
+def test_stops_dispatching_after_failure():
+    # 任务1失败时任务2已在执行，应等待其完成；依赖任务2的任务3不再派发
+    store = make_store([], [], [2], [1])
+    executed = run(store, failing={1}, delays={2: 0.05})
+    assert sorted(executed) == [1, 2]
+    assert store.get(1).status == "failed"
+    assert store.get(2).status == "completed"
+    assert store.get(3).status == "pending"
+    assert store.get(4).status == "pending"
+
+
+def test_exception_marks_task_failed():
+    store = make_store([], [1])
+
+    async def execute(task: TaskRecord) -> str:
+        raise RuntimeError("执行出错")
+
+    asyncio.run(TaskScheduler().run(store, execute))
+    assert store.get(1).status == "failed"
+    assert store.get(2).status == "pending"
+
+
+def test_missing_dependency_leaves_task_pending():
+    store = make_store([], [99], [2])
+    executed = run(store)
+    assert executed == [1]
+    assert [task.status for task in store] == ["completed", "pending", "pending"]
+
+
+def test_cycle_leaves_tasks_pending():
+    store = make_store([2], [1], [])
+    executed = run(store)
+    assert executed == [3]
+    assert [task.status for task in store] == ["pending", "pending", "completed"]
+
+
+def test_writes_status_changes_to_state():
+    store = make_store([], [1])
+    state = {}
+    run(store, state=state)
+    assert state == {"task_status:1": "completed", "task_status:2": "completed"}
@@ -0,0 +1,58 @@
+"""
+任务存储测试：按状态索引、增量追加和每次执行只构建一次的任务存储
+"""
+
+from types import SimpleNamespace
+
+from intelligent_task.shared_libraries.task_store import TASK_PLAN_ID_KEY, TASK_PLAN_KEY, TaskRecord, TaskStore
+from intelligent_task.sub_agents.task_executor import agent as executor
+
+
+def record(task_id, depends_on=(), status="pending"):
+    return TaskRecord(task_id, f"任务{task_id}", "", list(depends_on), status)
+
+
+def test_status_buckets_follow_updates():
+    store = TaskStore([record(1), record(2, [1]), record(3)])
+    store.set_status(1, "completed")
+    assert [task.id for task in store.with_status("pending")] == [2, 3]
+    assert [task.id for task in store.ready_tasks()] == [2, 3]
+    assert store.next_pending().id == 2
+
+
+def test_round_trip_through_state():
+    state = {}
+    store = TaskStore([record(1), record(2, [1])])
+    store.save(state)
+    store.set_status(1, "completed", state)
+    loaded = TaskStore.from_state(state)
+    assert loaded.to_rows() == store.to_rows()
+    assert loaded.get(1).status == "completed"
+
+
+def test_add_appends_rows_in_place_and_starts_new_plan():
+    state = {TASK_PLAN_KEY: [[9, "旧任务", "", []]], TASK_PLAN_ID_KEY: "old"}
+    store = TaskStore()
+    store.add(record(1), state)
+    rows = state[TASK_PLAN_KEY]
+    assert state[TASK_PLAN_ID_KEY] != "old"
+    store.add(record(2, [1]), state)
+    assert state[TASK_PLAN_KEY] is rows
+    assert [row[0] for row in rows] == [1, 2]
+    assert state["task_status:2"] == "pending"
+
+
+def test_executor_builds_store_once_per_invocation(monkeypatch):
+    state = {}
+    TaskStore([record(1), record(2), record(3)]).save(state)
+    state[executor.CURRENT_BATCH_KEY] = [2, 3]
+    calls = []
+    from_state = TaskStore.from_state.__func__
+    monkeypatch.setattr(TaskStore, "from_state", classmethod(lambda cls, s: calls.append(1) or from_state(cls, s)))
+
+    context = SimpleNamespace(invocation_id="executor-invocation", state=state)
+    for _ in range(5):
+        assert [task.id for task in executor.get_current_tasks(context)] == [2, 3]
+    assert len(calls) == 1
+    executor.release_task_store(context)
+    assert "executor-invocation" not in executor._invocation_stores
@@ -0,0 +1,97 @@
+"""
+工具调用缓存测试：过期、容量上限、错误结果和SQLite持久化
+"""
+
+import asyncio
+import sqlite3
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from intelligent_task.shared_libraries.tool_cache import ToolResultCache, is_error_result
+from intelligent_task.shared_libraries.tool_fanout import ToolFanout
+
+OK = {"content": [{"type": "text", "text": "结果"}], "isError": False}
+
+
+def test_hit_after_put_with_normalized_args():
+    cache = ToolResultCache(ttls={"fetch": 60})
+    cache.put("fetch", {"url": " https://example.com ", "max_length": None}, OK)
+    assert cache.get("fetch", {"url": "https://example.com"}) == OK
+    assert (cache.hits, cache.misses) == (1, 0)
+
+
+def test_returns_copies():
+    cache = ToolResultCache(ttls={"fetch": 60})
+    cache.put("fetch", {}, OK)
+    cache.get("fetch", {})["content"].clear()
+    assert cache.get("fetch", {}) == OK
+
+
+def test_uncached_tools_and_expired_entries_miss():
+    cache = ToolResultCache(ttls={"fetch": 0.01})
+    cache.put("write_file", {}, OK)
+    assert cache.get("write_file", {}) is None
+    cache.put("fetch", {}, OK)
+    time.sleep(0.02)
+    assert cache.get("fetch", {}) is None
+
+
+def test_evicts_least_recently_used():
+    cache = ToolResultCache(max_entries=2, ttls={"fetch": 60})
+    cache.put("fetch", {"url": "a"}, OK)
+    cache.put("fetch", {"url": "b"}, OK)
+    cache.get("fetch", {"url": "a"})
+    cache.put("fetch", {"url": "c"}, OK)
+    assert cache.get("fetch", {"url": "a"}) == OK
+    assert cache.get("fetch", {"url": "b"}) is None
+
+
+@pytest.mark.parametrize("value", [
+    {"content": [{"type": "text", "text": "失败"}], "isError": True},
+    {"error": "工具调用超时"},
+    RuntimeError("连接断开"),
+    SimpleNamespace(isError=True, content=[]),
+])
+def test_error_results_are_not_cached(value):
+    cache = ToolResultCache(ttls={"fetch": 60})
+    assert is_error_result(value)
+    cache.put("fetch", {}, value)
+    assert cache.get("fetch", {}) is None
+
+
+def test_tool_timeout_result_is_not_cached():
+    class Slow:
+        name = "fetch"
+        description = ""
+
+        async def run_async(self, *, args, tool_context):
+            await asyncio.sleep(1)
+
+    bounded = ToolFanout(timeout=0.01).wrap(Slow(), "fetch")
+    result = asyncio.run(bounded.run_async(args={}, tool_context=SimpleNamespace(invocation_id="i")))
+    cache = ToolResultCache(ttls={"fetch": 60})
+    cache.record_call("fetch", {}, result)
+    assert cache.get("fetch", {}) is None
+
+
+def test_filesystem_writes_invalidate_reads():
+    cache = ToolResultCache(ttls={"read_file": 60})
+    cache.put("read_file", {"path": "a.txt"}, OK)
+    cache.record_call("write_file", {"path": "a.txt"}, OK)
+    assert cache.get("read_file", {"path": "a.txt"}) is None
+
+
+def test_sqlite_persists_and_prunes(tmp_path):
+    path = str(tmp_path / "tool_cache.db")
+    cache = ToolResultCache(max_entries=2, ttls={"fetch": 60, "convert_time": 0.01}, path=path)
+    cache.put("convert_time", {}, OK)
+    time.sleep(0.02)
+    for url in ("a", "b", "c"):
+        cache.put("fetch", {"url": url}, OK)
+    assert sqlite3.connect(path).execute("SELECT COUNT(*) FROM tool_cache").fetchone()[0] == 2
+
+    reopened = ToolResultCache(max_entries=2, ttls={"fetch": 60}, path=path)
+    assert reopened.get("fetch", {"url": "c"}) == OK
+    assert reopened.get("fetch", {"url": "a"}) is None
@@ -0,0 +1,72 @@
+"""
+工具调用并发控制测试：按服务的并发上限和超时
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+from google.adk.tools.base_tool import BaseTool
+
+from intelligent_task.shared_libraries.tool_fanout import ToolFanout
+
+
+class SlowTool(BaseTool):
+    """等待指定时间后返回MCP格式结果，并记录同时进行的调用数"""
+
+    def __init__(self, name: str = "fetch", delay: float = 0.0):
+        super().__init__(name=name, description="测试工具")
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+
+    async def run_async(self, *, args, tool_context):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        return {"content": [{"type": "text", "text": "ok"}], "isError": False}
+
+
+TOOL_CONTEXT = SimpleNamespace(invocation_id="invocation")
+
+
+def test_timeout_returns_mcp_error_result():
+    fanout = ToolFanout(timeout=0.01)
+    bounded = fanout.wrap(SlowTool(delay=1), "fetch")
+    result = asyncio.run(bounded.run_async(args={"url": "https://example.com"}, tool_context=TOOL_CONTEXT))
+    assert result["isError"] is True
+    assert result["content"][0]["type"] == "text"
+    assert "fetch" in result["content"][0]["text"]
+
+
+def test_calls_within_timeout_pass_through():
+    fanout = ToolFanout(timeout=1)
+    bounded = fanout.wrap(SlowTool(), "fetch")
+    result = asyncio.run(bounded.run_async(args={}, tool_context=TOOL_CONTEXT))
+    assert result == {"content": [{"type": "text", "text": "ok"}], "isError": False}
+
+
+def test_per_server_concurrency_limit():
+    fanout = ToolFanout(timeout=1, default_concurrency=4, concurrency_limits={"brave-search": 1})
+    search = SlowTool("brave_web_search", delay=0.02)
+    fetch = SlowTool("fetch", delay=0.02)
+    bounded_search = fanout.wrap(search, "brave-search")
+    bounded_fetch = fanout.wrap(fetch, "fetch")
+
+    async def scenario():
+        await asyncio.gather(
+            *(bounded_search.run_async(args={"query": str(i)}, tool_context=TOOL_CONTEXT) for i in range(3)),
+            *(bounded_fetch.run_async(args={"url": str(i)}, tool_context=TOOL_CONTEXT) for i in range(3)),
+        )
+
+    asyncio.run(scenario())
+    assert search.max_active == 1
+    assert fetch.max_active == 3
+
+
+def test_wrap_reuses_wrapper_for_same_tool():
+    fanout = ToolFanout()
+    tool = SlowTool()
+    assert fanout.wrap(tool, "fetch") is fanout.wrap(tool, "fetch")
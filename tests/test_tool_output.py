@@ -0,0 +1,69 @@
+"""
+工具输出限制测试：按相关性选取段落、blob写入失败时的降级和分段读取
+"""
+
+import re
+
+import pytest
+
+from intelligent_task.shared_libraries import tool_output
+from intelligent_task.shared_libraries.blob_store import BlobStore
+from intelligent_task.shared_libraries.execution_context import estimate_tokens
+from intelligent_task.shared_libraries.tool_output import cap_text, cap_tool_response, read_output_chunks
+
+
+def _document(lines=400):
+    rows = [f"第{i}行 普通内容 filler text number {i}\n" for i in range(lines)]
+    rows[300] = "第300行 关键结论 quarterly revenue grew 12%\n"
+    return "".join(rows)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = BlobStore(root=str(tmp_path / "blobs"))
+    monkeypatch.setattr(tool_output, "blob_store", store)
+    return store
+
+
+def test_short_text_is_unchanged(store):
+    assert cap_text("短内容", "revenue", max_tokens=100) == "短内容"
+    assert cap_tool_response({"content": [{"type": "text", "text": "短内容"}]}, "revenue", 100) is None
+
+
+def test_caps_to_relevant_chunks_and_saves_full_text(store):
+    text = _document()
+    capped = cap_text(text, "quarterly revenue", max_tokens=500)
+    assert estimate_tokens(capped) < estimate_tokens(text)
+    assert "quarterly revenue grew 12%" in capped
+    assert "已省略" in capped
+    output_id = re.search(r"output_id为 ([0-9a-f]{64})", capped).group(1)
+    assert store.get(output_id) == text
+
+
+def test_blob_write_failure_returns_capped_text_without_id(store, monkeypatch):
+    def fail(data):
+        raise PermissionError("只读文件系统")
+
+    monkeypatch.setattr(store, "put", fail)
+    capped = cap_text(_document(), "quarterly revenue", max_tokens=500)
+    assert "quarterly revenue grew 12%" in capped
+    assert "output_id" not in capped
+    assert "完整内容未能保存" in capped
+
+
+def test_read_output_chunks_pages_through_saved_output(store):
+    text = _document()
+    output_id = store.put(text)
+    pages, start = [], 1
+    while start is not None:
+        page = read_output_chunks(output_id, start, max_tokens=800)
+        assert page["output_id"] == output_id
+        pages.append(page["text"])
+        start = page["next_chunk"]
+    assert len(pages) > 1
+    assert "".join(pages) == text
+
+
+def test_read_output_chunks_unknown_id(store):
+    with pytest.raises(KeyError):
+        read_output_chunks("0" * 64, 1)
@@ -0,0 +1,80 @@
+"""
+链路追踪测试：正常结束和出错时span的状态、异常记录和上下文恢复
+"""
+
+from types import SimpleNamespace
+
+import pytest
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from intelligent_task.shared_libraries import tracing
+
+
+@pytest.fixture
+def exporter(monkeypatch):
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    monkeypatch.setattr(tracing, "tracer", provider.get_tracer("test"))
+    return exporter
+
+
+def _callback_context():
+    return SimpleNamespace(invocation_id="inv-1", agent_name="task_executor_agent")
+
+
+def _llm_request():
+    return SimpleNamespace(model="test-model", contents=[], tools_dict={})
+
+
+def _tool_context():
+    return SimpleNamespace(invocation_id="inv-1", agent_name="task_executor_agent", function_call_id="call-1")
+
+
+def test_model_error_records_exception_and_restores_context(exporter):
+    outer = trace.get_current_span()
+    context = _callback_context()
+    tracing.trace_model_start(context, _llm_request())
+    assert trace.get_current_span() is not outer
+
+    assert tracing.trace_model_error(context, _llm_request(), TimeoutError("模型响应超时")) is None
+    assert trace.get_current_span() is outer
+    assert not tracing._open_spans
+
+    (span,) = exporter.get_finished_spans()
+    assert span.status.status_code == trace.StatusCode.ERROR
+    assert "TimeoutError" in span.status.description
+    assert [event.name for event in span.events] == ["exception"]
+
+
+def test_tool_error_records_exception_and_restores_context(exporter):
+    outer = trace.get_current_span()
+    tool = SimpleNamespace(name="fetch")
+    tracing.trace_tool_start(tool, {"url": "https://example.com"}, _tool_context())
+
+    assert tracing.trace_tool_error(tool, {}, _tool_context(), ConnectionError("连接断开")) is None
+    assert trace.get_current_span() is outer
+    assert not tracing._open_spans
+
+    (span,) = exporter.get_finished_spans()
+    assert span.name == "tool fetch"
+    assert span.status.status_code == trace.StatusCode.ERROR
+    assert span.events[0].attributes["exception.message"] == "连接断开"
+
+
+def test_tool_error_response_marks_span_without_exception(exporter):
+    tool = SimpleNamespace(name="fetch")
+    tracing.trace_tool_start(tool, {}, _tool_context())
+    tracing.trace_tool_end(tool, {}, _tool_context(), {"content": [], "isError": True})
+
+    (span,) = exporter.get_finished_spans()
+    assert span.status.status_code == trace.StatusCode.ERROR
+    assert not span.events
+
+
+def test_error_without_open_span_is_ignored(exporter):
+    tracing.trace_model_error(_callback_context(), _llm_request(), RuntimeError("x"))
+    assert not exporter.get_finished_spans()